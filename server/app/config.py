@@ -1,15 +1,20 @@
+import logging
 import os
 from typing import List, Set
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 # Constants
 MAX_SEARCH_RESULTS = 20
+# Supplier data shipped with the service, found relative to the package rather than the working directory
+SUPPLIERS_DIR = Path(__file__).resolve().parent.parent / "suppliers"
 
 class Config:
     """Configuration management for the supplier extraction service."""
     
     def __init__(self):
-        self.ignore_list_file = os.getenv("SUPPLIER_IGNORE_LIST_FILE", "suppliers/supplier_ignore_list.txt")
+        self.ignore_list_file = os.getenv("SUPPLIER_IGNORE_LIST_FILE", str(SUPPLIERS_DIR / "supplier_ignore_list.txt"))
         self._ignored_suppliers: Set[str] = set()
         self._load_ignore_list()
     
@@ -23,17 +28,25 @@ class Config:
                         supplier_name = line.strip()
                         if supplier_name and not supplier_name.startswith('#'):
                             self._ignored_suppliers.add(supplier_name.lower())
-                print(f"Loaded {len(self._ignored_suppliers)} suppliers to ignore")
+                logger.info("Loaded %d suppliers to ignore", len(self._ignored_suppliers))
             else:
-                print(f"Ignore list file not found: {ignore_file_path}")
+                logger.warning("Ignore list file not found: %s", ignore_file_path)
         except Exception as e:
-            print(f"Error loading ignore list: {e}")
+            logger.error("Error loading ignore list: %s", e)
     
     def reload_ignore_list(self):
         """Reload the ignore list from file."""
         self._ignored_suppliers.clear()
         self._load_ignore_list()
     
+    def get_ignored_suppliers(self) -> Set[str]:
+        """Get a copy of the loaded (lowercased) ignore set."""
+        return set(self._ignored_suppliers)
+    
+    def load_ignored_suppliers(self, supplier_names: List[str]):
+        """Replace the loaded ignore set, e.g. from a warm-start snapshot."""
+        self._ignored_suppliers = {name.lower() for name in supplier_names}
+    
     def is_supplier_ignored(self, supplier_name: str) -> bool:
         """Check if a supplier should be ignored."""
         return supplier_name.lower() in self._ignored_suppliers
@@ -47,7 +60,7 @@ class Config:
             self._ignored_suppliers.add(supplier_name.lower())
             return True
         except Exception as e:
-            print(f"Error adding to ignore list: {e}")
+            logger.error("Error adding to ignore list: %s", e)
             return False
     
     def remove_from_ignore_list(self, supplier_name: str) -> bool:
@@ -70,7 +83,7 @@ class Config:
             self._ignored_suppliers.discard(supplier_name.lower())
             return True
         except Exception as e:
-            print(f"Error removing from ignore list: {e}")
+            logger.error("Error removing from ignore list: %s", e)
             return False
     
     def get_ignore_list(self) -> List[str]:
@@ -83,7 +96,7 @@ class Config:
             with open(ignore_file_path, 'r', encoding='utf-8') as f:
                 return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
         except Exception as e:
-            print(f"Error reading ignore list: {e}")
+            logger.error("Error reading ignore list: %s", e)
             return []
 
 # Global configuration instance
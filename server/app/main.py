@@ -1,10 +1,21 @@
+import logging
 import os
 import time
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 
-from app.models.schemas import (
+from app.utils.log import configure_logging, debug_payload, logging_stats
+
+# Load environment variables and configure logging before importing the modules below:
+# app.config reads .env settings and logs the ignore list it loads while being imported
+load_dotenv()
+configure_logging()
+
+from app.models.schemas import (  # noqa: E402
     SupplierExtractionRequest, 
     SupplierExtractionResponse, 
     Supplier,
@@ -13,19 +24,78 @@ from app.models.schemas import (
     IgnoreListActionRequest,
     IgnoreListActionResponse
 )
-from app.services.search import GoogleSearchService
-from app.services.extraction import VertexAIExtractionService
-from app.services.storage import FirestoreService
-from app.utils.deduplication import SupplierDeduplicator
-from app.config import config
+from app.services.search import GoogleSearchService  # noqa: E402
+from app.services.extraction import VertexAIExtractionService  # noqa: E402
+from app.services.storage import FirestoreService  # noqa: E402
+from app.services.clients import warm_up_firestore  # noqa: E402
+from app.services.providers import provider_stats  # noqa: E402
+from app.services.quota import QuotaExhaustedError, SearchOutcome  # noqa: E402
+from app.services.rate_limit import ThrottledError, rate_limiter_stats  # noqa: E402
+from app.services.snapshot import snapshot_path, read_snapshot, restore_snapshot, export_snapshot  # noqa: E402
+from app.utils.deduplication import SupplierDeduplicator  # noqa: E402
+from app.utils.early_stop import EarlyStopPolicy  # noqa: E402
+from app.utils.metrics import (  # noqa: E402
+    DEDUP_GROUP_SIZE, REGISTRY, RequestMetricsMiddleware, observe_trace, register_endpoints
+)
+from app.config import config  # noqa: E402
+from app.utils.tokens import TokenUsage  # noqa: E402
+from app.utils.tracing import span, start_trace  # noqa: E402
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+async def load_warm_start_snapshot():
+    """Restore the hot cache, ignore list and canonical-name memo saved by the previous instance."""
+    path = snapshot_path()
+    if not storage_service or not path:
+        return
+    try:
+        snapshot = read_snapshot(path)
+        if snapshot:
+            restored = restore_snapshot(snapshot, storage_service, config)
+            logger.info("Restored %d cache entries from %s", restored, path)
+    except Exception as e:
+        logger.warning("Failed to load snapshot from %s: %s", path, e)
+
+async def save_warm_start_snapshot():
+    """Save the hot in-process state so the next instance starts warm."""
+    path = snapshot_path()
+    if not storage_service or not path:
+        return
+    try:
+        exported = export_snapshot(path, storage_service, config)
+        logger.info("Saved %d cache entries to %s", exported, path)
+    except Exception as e:
+        logger.warning("Failed to save snapshot to %s: %s", path, e)
+
+async def flush_cache_accesses():
+    """Write the cache access times buffered since the last eviction pass."""
+    if storage_service:
+        try:
+            await asyncio.to_thread(storage_service.flush_cache_accesses)
+        except Exception as e:
+            logger.warning("Failed to flush cache accesses: %s", e)
+
+async def warm_up_clients():
+    """Open upstream connections before the first request arrives."""
+    if storage_service and os.getenv("FIRESTORE_WARM_UP", "true").lower() == "true":
+        warm_up_time = await asyncio.to_thread(warm_up_firestore, storage_service.project_id)
+        if warm_up_time is not None:
+            logger.info("Firestore channel warmed up in %.2fs", warm_up_time)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start warm from the previous instance's snapshot; save it and pending cache writes on shutdown."""
+    await load_warm_start_snapshot()
+    await warm_up_clients()
+    yield
+    await save_warm_start_snapshot()
+    await flush_cache_accesses()
 
 app = FastAPI(
     title="Lazy Logistics - Supplier Extraction API",
     description="Extract supplier information for companies using GCP and Vertex AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -37,6 +107,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestMetricsMiddleware)
+
+early_stop_policy = EarlyStopPolicy.from_env()
+
 # Initialize services
 try:
     search_service = GoogleSearchService()
@@ -44,7 +118,7 @@ try:
     storage_service = FirestoreService()
     deduplicator = SupplierDeduplicator()
 except Exception as e:
-    print(f"Failed to initialize services: {e}")
+    logger.error("Failed to initialize services: %s", e)
     search_service = None
     extraction_service = None
     storage_service = None
@@ -56,17 +130,40 @@ async def health_check():
     return HealthResponse(status="healthy")
 
 @app.post("/extract-suppliers", response_model=SupplierExtractionResponse)
-async def extract_suppliers(request: SupplierExtractionRequest):
-    """Extract supplier information for a given company."""
+def extract_suppliers(request: SupplierExtractionRequest):
+    """Extract supplier information for a given company.
+
+    Defined without async so FastAPI runs it in the threadpool: the search and model calls
+    block, including while backing off from upstream rate limits. Each request is traced;
+    with include_timings the response carries the time spent in each stage.
+    """
     
     if not all([search_service, extraction_service, storage_service, deduplicator]):
         raise HTTPException(status_code=500, detail="Services not properly initialized")
     
+    # Observed once the trace has closed, so the root span has its duration
+    trace = None
+    try:
+        with start_trace("extract_suppliers", company_name=request.company_name,
+                         max_results=request.max_results, deep=request.deep) as trace:
+            response = _extract_suppliers(request)
+    finally:
+        if trace is not None:
+            observe_trace(trace)
+    
+    if request.include_timings:
+        response.timings = {"trace_id": trace.trace_id, "stages": trace.stage_timings()}
+    return response
+
+def _extract_suppliers(request: SupplierExtractionRequest) -> SupplierExtractionResponse:
     start_time = time.time()
     
     try:
         # Check cache first
-        cached_result = storage_service.get_cached_result(request.company_name)
+        with span("cache_lookup") as lookup_span:
+            cached_result = storage_service.get_cached_result(request.company_name, request.max_results, request.deep)
+            if lookup_span:
+                lookup_span.set_attribute("hit", bool(cached_result))
         if cached_result:
             return SupplierExtractionResponse(
                 company_name=request.company_name,
@@ -75,12 +172,54 @@ async def extract_suppliers(request: SupplierExtractionRequest):
                 processing_time=cached_result["processing_time"]
             )
         
-        # Search for company information
-        search_results = search_service.search_company_suppliers(
+        # Search lazily, one page of results at a time, and extract each page as it arrives.
+        # Stop fetching and extracting once the early-stop policy says further pages are
+        # unlikely to add suppliers.
+        search_outcome = SearchOutcome()
+        token_usage = TokenUsage()
+        yield_tracker = early_stop_policy.tracker()
+        search_results = []
+        raw_suppliers = []
+        group_sizes = []
+        for page in search_service.iter_search_pages(
             request.company_name, 
-            request.max_results
-        )
-        print("[DEBUG] Google Search Results:", search_results)
+            request.max_results,
+            outcome=search_outcome
+        ):
+            search_results.extend(page)
+            debug_payload(logger, "Search results page", page, company_name=request.company_name)
+            
+            # In deep mode, read the result pages themselves. The page text is passed to
+            # extraction only, never stored with the search results.
+            extraction_input = page
+            if request.deep:
+                with span("fetch.documents", urls=len(page)):
+                    documents = search_service.get_documents(r.get("link", "") for r in page)
+                extraction_input = [{**r, "content": documents.get(r.get("link", ""), "")} for r in page]
+            
+            # Extract suppliers from search results
+            with span("extraction.page", results=len(page)) as extraction_span:
+                page_suppliers = extraction_service.extract_suppliers_from_search_results(
+                    request.company_name, 
+                    extraction_input,
+                    usage=token_usage
+                )
+                if extraction_span:
+                    extraction_span.set_attribute("suppliers", len(page_suppliers))
+            debug_payload(logger, "Extracted suppliers", page_suppliers, company_name=request.company_name)
+            raw_suppliers.extend(page_suppliers)
+            
+            # Deduplicate suppliers found so far
+            with span("dedup", suppliers=len(raw_suppliers)) as dedup_span:
+                group_sizes = []
+                deduplicated_suppliers = deduplicator.deduplicate_suppliers(raw_suppliers, group_sizes=group_sizes)
+                if dedup_span:
+                    dedup_span.set_attribute("unique", len(deduplicated_suppliers))
+            debug_payload(logger, "Deduplicated suppliers", deduplicated_suppliers, company_name=request.company_name)
+            if yield_tracker.record_page(len(deduplicated_suppliers)):
+                logger.info("Stopping search for %s after %d pages (%s, %d suppliers)", request.company_name,
+                            yield_tracker.pages, yield_tracker.stop_reason, len(deduplicated_suppliers))
+                break
         
         if not search_results:
             return SupplierExtractionResponse(
@@ -90,18 +229,9 @@ async def extract_suppliers(request: SupplierExtractionRequest):
                 processing_time=time.time() - start_time
             )
         
-        # Extract suppliers from search results
-        print("[DEBUG] Extraction input:", search_results)
-        raw_suppliers = extraction_service.extract_suppliers_from_search_results(
-            request.company_name, 
-            search_results
-        )
-        print("[DEBUG] Extraction output:", raw_suppliers)
-        
-        # Deduplicate suppliers
-        print("[DEBUG] Deduplication input:", raw_suppliers)
-        deduplicated_suppliers = deduplicator.deduplicate_suppliers(raw_suppliers)
-        print("[DEBUG] Deduplication output:", deduplicated_suppliers)
+        # Group sizes of the final dedup pass only; earlier passes saw a subset of the mentions
+        for size in group_sizes:
+            DEDUP_GROUP_SIZE.observe(size)
         
         # Convert to Pydantic models
         supplier_models = [Supplier(**s) for s in deduplicated_suppliers]
@@ -109,27 +239,50 @@ async def extract_suppliers(request: SupplierExtractionRequest):
         processing_time = time.time() - start_time
         
         # Store result for audit trail
-        storage_service.store_extraction_result(
-            request.company_name,
-            [s.model_dump() for s in supplier_models],
-            processing_time,
-            search_results
-        )
+        with span("storage.audit_write"):
+            storage_service.store_extraction_result(
+                request.company_name,
+                [s.model_dump() for s in supplier_models],
+                processing_time,
+                search_results,
+                token_usage.as_dict()
+            )
         
-        # Cache result
-        storage_service.cache_result(
-            request.company_name,
-            [s.model_dump() for s in supplier_models],
-            processing_time
-        )
+        # Cache result, unless the search was cut short by the daily quota
+        if not search_outcome.quota_limited:
+            with span("storage.cache_write"):
+                storage_service.cache_result(
+                    request.company_name,
+                    [s.model_dump() for s in supplier_models],
+                    processing_time,
+                    request.max_results,
+                    [r.get("link", "") for r in search_results],
+                    request.deep
+                )
         
         return SupplierExtractionResponse(
             company_name=request.company_name,
             suppliers=supplier_models,
             total_suppliers=len(supplier_models),
-            processing_time=processing_time
+            processing_time=processing_time,
+            token_usage=token_usage.as_dict()
         )
         
+    except ThrottledError as e:
+        # Nothing is cached, so the client can retry once the upstream recovers
+        retry_after = max(1, round(e.retry_after)) if e.retry_after else 30
+        raise HTTPException(
+            status_code=503,
+            detail=f"Upstream rate limit reached ({e.api}), retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+    except QuotaExhaustedError as e:
+        retry_after = max(1, round(e.retry_after)) if e.retry_after else 3600
+        raise HTTPException(
+            status_code=503,
+            detail=f"Daily {e.api} quota exhausted, retry after it resets",
+            headers={"Retry-After": str(retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
 
@@ -155,10 +308,31 @@ async def get_statistics():
     
     try:
         stats = storage_service.get_statistics()
+        if extraction_service and extraction_service.extraction_cache:
+            stats["extraction_cache"] = extraction_service.extraction_cache.stats()
+        if extraction_service and extraction_service.cascade:
+            stats["model_cascade"] = [tier.stats() for tier in extraction_service.cascade]
+        if extraction_service and extraction_service.prefilter:
+            stats["prefilter"] = extraction_service.prefilter.stats()
+        if search_service and search_service.quota_scheduler:
+            stats["search_quota"] = search_service.quota_scheduler.stats()
+        if search_service and search_service.search_cache:
+            stats["search_cache"] = search_service.search_cache.stats()
+        stats["early_stop"] = early_stop_policy.stats()
+        providers = provider_stats()
+        if providers:
+            stats["providers"] = providers
+        stats["rate_limits"] = rate_limiter_stats()
+        stats["logging"] = logging_stats()
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get statistics: {str(e)}")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Request, pipeline-stage, cache, model and search metrics in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type=REGISTRY.CONTENT_TYPE)
+
 # Ignore List Management Endpoints
 
 @app.get("/ignore-list", response_model=IgnoreListResponse)
@@ -216,6 +390,9 @@ async def reload_ignore_list():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to reload ignore list: {str(e)}")
 
+# Every route's metric children exist before the first request
+register_endpoints(route.path for route in app.routes)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -1,10 +1,12 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime, UTC
 
 class SupplierExtractionRequest(BaseModel):
     company_name: str = Field(..., description="Name of the company to extract suppliers for")
     max_results: int = Field(default=20, description="Maximum number of search results to process")
+    deep: bool = Field(default=False, description="Fetch and read each result page, not just its snippet (slower)")
+    include_timings: bool = Field(default=False, description="Include the time spent in each pipeline stage in the response")
     
     @field_validator('company_name')
     @classmethod
@@ -17,13 +19,26 @@ class Supplier(BaseModel):
     name: str = Field(..., description="Supplier company name")
     confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score for extraction")
     source_url: Optional[str] = Field(None, description="Source URL where supplier was mentioned")
+    source_urls: Optional[List[str]] = Field(None, description="Every URL where the supplier's source text appeared")
     context: Optional[str] = Field(None, description="Context snippet where supplier was found")
 
+class TokenUsageSummary(BaseModel):
+    calls: int = Field(..., description="Model calls made")
+    cached_calls: int = Field(0, description="Model calls answered from the extraction cache")
+    prompt_tokens: int = Field(..., description="Input tokens sent to the model")
+    output_tokens: int = Field(..., description="Tokens generated by the model")
+    total_tokens: int = Field(..., description="Input plus output tokens")
+    cached_prompt_tokens: int = Field(0, description="Input tokens served from the model's prefix cache")
+    estimated: bool = Field(False, description="Whether any counts are local estimates")
+    avg_time_to_first_token_ms: Optional[float] = Field(None, description="Mean time to first streamed token per model call")
+
 class SupplierExtractionResponse(BaseModel):
     company_name: str
     suppliers: List[Supplier]
     total_suppliers: int
     processing_time: float
+    token_usage: Optional[TokenUsageSummary] = Field(None, description="Model token usage for this request (absent for cached results)")
+    timings: Optional[Dict[str, Any]] = Field(None, description="Trace id and per-stage count and total_ms, when include_timings is set")
     timestamp: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
 class HealthResponse(BaseModel):
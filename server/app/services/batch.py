@@ -0,0 +1,278 @@
+import logging
+import os
+import json
+import time
+import hashlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.models.schemas import Supplier
+from app.services.extraction import EXTRACTION_SYSTEM_INSTRUCTION
+from app.utils.response_parser import SUPPLIER_RESPONSE_SCHEMA, parse_supplier_response
+from app.utils.log import debug_payload
+from app.utils.tokens import TokenUsage, usage_from_response
+
+logger = logging.getLogger(__name__)
+
+# Generation settings for batch requests, matching the online extraction config
+BATCH_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": SUPPLIER_RESPONSE_SCHEMA,
+    "temperature": 0.0
+}
+
+DEFAULT_POLL_SECONDS = 60
+
+def prompt_key(prompt: str) -> str:
+    """Identifies a batch line by its prompt, since output order is not guaranteed."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+def batch_request_line(prompt: str) -> Dict[str, Any]:
+    """One line of a Gemini batch-prediction input file."""
+    return {
+        "request": {
+            "systemInstruction": {"parts": [{"text": EXTRACTION_SYSTEM_INSTRUCTION}]},
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": BATCH_GENERATION_CONFIG
+        }
+    }
+
+def _request_prompt(line: Dict[str, Any]) -> str:
+    parts = line.get("request", {}).get("contents", [{}])[0].get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+def _response_text(line: Dict[str, Any]) -> Optional[str]:
+    candidates = (line.get("response") or {}).get("candidates") or []
+    if not candidates:
+        return None
+    return "".join(part.get("text", "") for part in candidates[0].get("content", {}).get("parts", []))
+
+def _response_usage(line: Dict[str, Any], prompt: str, text: str) -> Dict[str, Any]:
+    metadata = (line.get("response") or {}).get("usageMetadata") or {}
+    response = SimpleNamespace(usage_metadata=SimpleNamespace(
+        prompt_token_count=metadata.get("promptTokenCount"),
+        candidates_token_count=metadata.get("candidatesTokenCount")
+    ))
+    return usage_from_response(response, f"{EXTRACTION_SYSTEM_INSTRUCTION}{prompt}", text)
+
+class BatchPredictionBackend(ABC):
+    """Runs a JSONL file of model requests and returns the path of the JSONL results."""
+
+    @abstractmethod
+    def run(self, input_path: Path, model_name: str, output_dir: Path) -> Path:
+        """Run every request in input_path and return the path of the results file."""
+
+class LocalBatchBackend(BatchPredictionBackend):
+    """Answers each request with a local function. For tests and dry runs."""
+
+    def __init__(self, generate: Callable[[str], str]):
+        self.generate = generate
+
+    def run(self, input_path: Path, model_name: str, output_dir: Path) -> Path:
+        output_path = output_dir / "predictions.jsonl"
+        with open(input_path, encoding="utf-8") as source, open(output_path, "w", encoding="utf-8") as sink:
+            for raw in source:
+                line = json.loads(raw)
+                try:
+                    text = self.generate(_request_prompt(line))
+                    line["response"] = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+                    line["status"] = ""
+                except Exception as e:
+                    line["status"] = str(e)
+                sink.write(json.dumps(line) + "\n")
+        return output_path
+
+class VertexBatchBackend(BatchPredictionBackend):
+    """Vertex AI batch prediction, staging input and output in a Cloud Storage bucket."""
+
+    def __init__(self, bucket: str, poll_seconds: int = DEFAULT_POLL_SECONDS):
+        self.bucket = bucket.replace("gs://", "").rstrip("/")
+        self.poll_seconds = poll_seconds
+
+    @classmethod
+    def from_env(cls) -> "VertexBatchBackend":
+        bucket = os.getenv("BATCH_PREDICTION_BUCKET")
+        if not bucket:
+            raise ValueError("BATCH_PREDICTION_BUCKET must be set")
+        return cls(bucket, int(os.getenv("BATCH_PREDICTION_POLL_SECONDS", DEFAULT_POLL_SECONDS)))
+
+    def run(self, input_path: Path, model_name: str, output_dir: Path) -> Path:
+        from google.cloud import storage
+        from vertexai.batch_prediction import BatchPredictionJob
+
+        client = storage.Client()
+        bucket = client.bucket(self.bucket)
+        prefix = f"supplier-batches/{input_path.parent.name}"
+        bucket.blob(f"{prefix}/input.jsonl").upload_from_filename(str(input_path))
+
+        job = BatchPredictionJob.submit(
+            source_model=model_name,
+            input_dataset=f"gs://{self.bucket}/{prefix}/input.jsonl",
+            output_uri_prefix=f"gs://{self.bucket}/{prefix}/output"
+        )
+        logger.info("Submitted batch prediction job %s", job.resource_name)
+        while not job.has_ended:
+            time.sleep(self.poll_seconds)
+            job.refresh()
+        if not job.has_succeeded:
+            raise RuntimeError(f"Batch prediction job failed: {job.error}")
+
+        output_path = output_dir / "predictions.jsonl"
+        output_prefix = job.output_location.replace(f"gs://{self.bucket}/", "")
+        with open(output_path, "wb") as sink:
+            for blob in client.list_blobs(self.bucket, prefix=output_prefix):
+                if blob.name.endswith(".jsonl"):
+                    shard = blob.download_as_bytes()
+                    sink.write(shard)
+                    # Keep the last line of a shard from running into the first of the next
+                    if shard and not shard.endswith(b"\n"):
+                        sink.write(b"\n")
+        return output_path
+
+class BatchExtractionPipeline:
+    """Offline extraction for many companies through one batch-prediction job.
+
+    ``prepare`` writes a JSONL line for every chunk the extraction cache cannot already
+    answer, ``run`` submits it, and ``ingest`` parses the results into the extraction cache
+    and then through the usual deduplication, audit-store and result-cache stages.
+    """
+
+    def __init__(self, extraction_service, storage_service, deduplicator,
+                 backend: BatchPredictionBackend, work_dir: str = "batches"):
+        self.extraction_service = extraction_service
+        self.storage_service = storage_service
+        self.deduplicator = deduplicator
+        self.backend = backend
+        self.work_dir = Path(work_dir)
+
+    def prepare(self, search_results_by_company: Dict[str, List[Dict[str, Any]]],
+                max_results: int, batch_name: Optional[str] = None) -> Path:
+        """Write the batch input and a manifest to a new batch directory. Returns the directory."""
+        service = self.extraction_service
+        batch_dir = self.work_dir / (batch_name or time.strftime("%Y%m%d-%H%M%S"))
+        batch_dir.mkdir(parents=True, exist_ok=True)
+
+        manifest = {"max_results": max_results, "model": service.model_name, "companies": {}}
+        lines = {}
+        for company_name, search_results in search_results_by_company.items():
+            chunks = []
+            for result in service.result_deduplicator.deduplicate_results(search_results):
+                content = service.result_content(company_name, result)
+                if content is None:
+                    continue
+                source_url = result.get("link", "")
+                for chunk in service.chunk_content(company_name, content, source_url):
+                    prompt = service._build_extraction_prompt(company_name, chunk, source_url)
+                    key = prompt_key(prompt)
+                    cache_key = service.cache_key_for(company_name, chunk)
+                    chunks.append({
+                        "key": key,
+                        "cache_key": cache_key,
+                        "source_url": source_url,
+                        "source_urls": result.get("source_urls") or [source_url]
+                    })
+                    # Chunks the extraction cache can answer are not sent again
+                    if not (cache_key and service.extraction_cache.get(cache_key) is not None):
+                        lines[key] = batch_request_line(prompt)
+            manifest["companies"][company_name] = {"search_results": search_results, "chunks": chunks}
+
+        with open(batch_dir / "input.jsonl", "w", encoding="utf-8") as f:
+            for line in lines.values():
+                f.write(json.dumps(line) + "\n")
+        (batch_dir / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+        logger.info("Prepared %d batch requests for %d companies in %s", len(lines), len(search_results_by_company), batch_dir)
+        return batch_dir
+
+    def run(self, batch_dir: Path) -> Path:
+        """Submit the batch and wait for its results.
+
+        When the extraction cache answered every chunk there is nothing to submit, and an
+        empty predictions file is returned for ``ingest``.
+        """
+        input_path = batch_dir / "input.jsonl"
+        if input_path.stat().st_size == 0:
+            logger.info("No batch requests in %s; every chunk was cached", batch_dir)
+            output_path = batch_dir / "predictions.jsonl"
+            output_path.write_bytes(b"")
+            return output_path
+        manifest = json.loads((batch_dir / "manifest.json").read_text(encoding="utf-8"))
+        return self.backend.run(input_path, manifest["model"], batch_dir)
+
+    def ingest(self, batch_dir: Path, output_path: Path) -> Dict[str, int]:
+        """Store batch results. Returns the number of suppliers stored per company.
+
+        Every company gets an audit record, but a company with a failed, missing or
+        unparsed chunk is not cached, so its incomplete supplier list is not served for
+        the cache's full TTL.
+        """
+        service = self.extraction_service
+        manifest = json.loads((batch_dir / "manifest.json").read_text(encoding="utf-8"))
+
+        outputs = {}
+        with open(output_path, encoding="utf-8") as f:
+            for raw in f:
+                line = json.loads(raw)
+                prompt = _request_prompt(line)
+                text = _response_text(line)
+                if text is None:
+                    logger.warning("Batch request failed: %s", line.get('status') or 'no response')
+                    continue
+                outputs[prompt_key(prompt)] = (text, _response_usage(line, prompt, text))
+
+        stored = {}
+        for company_name, entry in manifest["companies"].items():
+            started = time.time()
+            usage = TokenUsage()
+            raw_suppliers = []
+            degraded_chunks = 0
+            for chunk in entry["chunks"]:
+                suppliers, complete = self._chunk_suppliers(chunk, outputs, usage)
+                degraded_chunks += not complete
+                for supplier in suppliers:
+                    supplier["source_url"] = chunk["source_url"]
+                    supplier["source_urls"] = chunk["source_urls"]
+                raw_suppliers.extend(suppliers)
+
+            supplier_models = [Supplier(**s) for s in self.deduplicator.deduplicate_suppliers(raw_suppliers)]
+            suppliers = [s.model_dump() for s in supplier_models]
+            processing_time = time.time() - started
+            search_results = entry["search_results"]
+            self.storage_service.store_extraction_result(
+                company_name, suppliers, processing_time, search_results, usage.as_dict()
+            )
+            if degraded_chunks:
+                logger.warning("Not caching %s: %d of %d chunks failed or did not parse",
+                               company_name, degraded_chunks, len(entry["chunks"]))
+            else:
+                self.storage_service.cache_result(
+                    company_name, suppliers, processing_time, manifest["max_results"],
+                    [r.get("link", "") for r in search_results]
+                )
+            stored[company_name] = len(suppliers)
+        return stored
+
+    def _chunk_suppliers(self, chunk: Dict[str, Any], outputs: Dict[str, Any],
+                         usage: TokenUsage) -> Tuple[List[Dict[str, Any]], bool]:
+        """A chunk's suppliers, and whether they are complete: False when its batch line
+        failed or its response did not fully parse."""
+        cache = self.extraction_service.extraction_cache
+        if chunk["key"] in outputs:
+            text, call_usage = outputs[chunk["key"]]
+            usage.record_call(**call_usage)
+            suppliers, complete = parse_supplier_response(text)
+            if suppliers is None:
+                logger.warning("Failed to parse batch response (%d chars)", len(text))
+                debug_payload(logger, "Unparsed batch response", text)
+                return [], False
+            if chunk["cache_key"] and complete:
+                cache.set(chunk["cache_key"], suppliers)
+            return [dict(s) for s in suppliers], complete
+
+        # Answered from the extraction cache when the batch was prepared
+        cached = cache.get(chunk["cache_key"]) if chunk["cache_key"] else None
+        if cached is not None:
+            usage.record_cached()
+            return [dict(s) for s in cached], True
+        return [], False
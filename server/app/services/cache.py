@@ -0,0 +1,244 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Any, Optional, Iterable, List, Tuple
+
+from app.utils.metrics import CACHE_LOOKUPS
+
+DEFAULT_CACHE_TTL_HOURS = 24
+DEFAULT_MIN_CACHE_TTL_HOURS = 6
+DEFAULT_MAX_CACHE_TTL_HOURS = 24 * 7
+DEFAULT_MEMORY_CACHE_MAX_ENTRIES = 1000
+DEFAULT_MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Bounds how long an instance can keep serving an entry that was cleared from Firestore elsewhere
+DEFAULT_MEMORY_CACHE_TTL_SECONDS = 3600
+
+# Weight given to the newest observation when updating a company's supplier-set stability
+STABILITY_SMOOTHING = 0.5
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def _supplier_names(suppliers: Iterable[Dict[str, Any]]) -> set:
+    return {s.get("name", "").strip().lower() for s in suppliers if s.get("name")}
+
+class CachePolicy:
+    """TTL and size limits for cached extraction results.
+
+    Each entry carries its own TTL. With adaptive TTL enabled, companies whose supplier set
+    stays the same between extractions are kept for longer, and companies whose results
+    churn are refreshed sooner.
+    """
+
+    def __init__(self, ttl_hours: float = DEFAULT_CACHE_TTL_HOURS,
+                 min_ttl_hours: float = DEFAULT_MIN_CACHE_TTL_HOURS,
+                 max_ttl_hours: float = DEFAULT_MAX_CACHE_TTL_HOURS,
+                 adaptive_ttl: bool = True,
+                 memory_max_entries: int = DEFAULT_MEMORY_CACHE_MAX_ENTRIES,
+                 memory_max_bytes: int = DEFAULT_MEMORY_CACHE_MAX_BYTES,
+                 memory_ttl_seconds: float = DEFAULT_MEMORY_CACHE_TTL_SECONDS,
+                 store_max_entries: Optional[int] = None,
+                 store_max_bytes: Optional[int] = None):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.min_ttl = timedelta(hours=min(min_ttl_hours, ttl_hours))
+        self.max_ttl = timedelta(hours=max(max_ttl_hours, ttl_hours))
+        self.adaptive_ttl = adaptive_ttl
+        self.memory_max_entries = memory_max_entries
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_ttl = timedelta(seconds=memory_ttl_seconds)
+        self.store_max_entries = store_max_entries
+        self.store_max_bytes = store_max_bytes
+
+    @classmethod
+    def from_env(cls) -> "CachePolicy":
+        """Build a policy from CACHE_* environment variables."""
+        return cls(
+            ttl_hours=_env_float("CACHE_TTL_HOURS", DEFAULT_CACHE_TTL_HOURS),
+            min_ttl_hours=_env_float("CACHE_MIN_TTL_HOURS", DEFAULT_MIN_CACHE_TTL_HOURS),
+            max_ttl_hours=_env_float("CACHE_MAX_TTL_HOURS", DEFAULT_MAX_CACHE_TTL_HOURS),
+            adaptive_ttl=os.getenv("CACHE_ADAPTIVE_TTL", "true").lower() == "true",
+            memory_max_entries=_env_int("MEMORY_CACHE_MAX_ENTRIES", DEFAULT_MEMORY_CACHE_MAX_ENTRIES),
+            memory_max_bytes=_env_int("MEMORY_CACHE_MAX_BYTES", DEFAULT_MEMORY_CACHE_MAX_BYTES),
+            memory_ttl_seconds=_env_float("MEMORY_CACHE_TTL_SECONDS", DEFAULT_MEMORY_CACHE_TTL_SECONDS),
+            store_max_entries=_env_int("CACHE_MAX_ENTRIES", None),
+            store_max_bytes=_env_int("CACHE_MAX_BYTES", None),
+        )
+
+    def ttl_for(self, suppliers: List[Dict[str, Any]],
+                previous_entry: Optional[Dict[str, Any]] = None) -> Tuple[timedelta, float]:
+        """Return the TTL and stability score for a new entry.
+
+        Stability is a smoothed Jaccard similarity between consecutive supplier sets,
+        from 0.0 (completely different every time) to 1.0 (never changes).
+        """
+
+        if not self.adaptive_ttl or not previous_entry or "suppliers" not in previous_entry:
+            return self.ttl, previous_entry.get("stability", 0.5) if previous_entry else 0.5
+
+        current = _supplier_names(suppliers)
+        previous = _supplier_names(previous_entry["suppliers"])
+        union = current | previous
+        similarity = len(current & previous) / len(union) if union else 1.0
+
+        stability = previous_entry.get("stability", 0.5)
+        stability = (1 - STABILITY_SMOOTHING) * stability + STABILITY_SMOOTHING * similarity
+
+        ttl = self.min_ttl + (self.max_ttl - self.min_ttl) * stability
+        return ttl, round(stability, 4)
+
+    def expires_at(self, entry: Dict[str, Any]) -> Optional[datetime]:
+        """When an entry stops being servable. Entries written before per-entry TTLs use the default."""
+        if entry.get("expires_at"):
+            return entry["expires_at"]
+        if entry.get("timestamp"):
+            return entry["timestamp"] + self.ttl
+        return None
+
+    def is_expired(self, entry: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+        expires_at = self.expires_at(entry)
+        return expires_at is None or expires_at <= (now or datetime.now(timezone.utc))
+
+    @staticmethod
+    def entry_size(entry: Dict[str, Any]) -> int:
+        """Approximate serialized size of an entry in bytes."""
+        return len(json.dumps(entry, default=str).encode("utf-8"))
+
+class CacheMetrics:
+    """Thread-safe hit, miss, expiry and eviction counters per cache tier.
+
+    Lookups are also counted in the cache_lookups_total metric, with expirations as stale.
+    """
+
+    EVENTS = ("hits", "misses", "expirations", "evictions")
+    LOOKUP_RESULTS = {"hits": "hit", "misses": "miss", "expirations": "stale"}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, tier: str, event: str, count: int = 1) -> None:
+        with self._lock:
+            tier_counts = self._counts.setdefault(tier, dict.fromkeys(self.EVENTS, 0))
+            tier_counts[event] += count
+        if event in self.LOOKUP_RESULTS:
+            CACHE_LOOKUPS.labels(tier, self.LOOKUP_RESULTS[event]).inc(count)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            tiers = {tier: dict(counts) for tier, counts in self._counts.items()}
+        for counts in tiers.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_ratio"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+        return tiers
+
+class MemoryCache:
+    """In-process LRU tier bounded by entry count and approximate byte size."""
+
+    tier = "memory"
+
+    def __init__(self, policy: CachePolicy, metrics: CacheMetrics):
+        self.policy = policy
+        self.metrics = metrics
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int, datetime]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str, usable: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        """The live entry for a key. An entry ``usable`` rejects is kept but counted as a miss."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.metrics.record(self.tier, "misses")
+                return None
+            entry, size, inserted_at = item
+            now = datetime.now(timezone.utc)
+            if self.policy.is_expired(entry, now) or now - inserted_at > self.policy.memory_ttl:
+                del self._entries[key]
+                self._bytes -= size
+                self.metrics.record(self.tier, "expirations")
+                self.metrics.record(self.tier, "misses")
+                return None
+            if usable is not None and not usable(entry):
+                self.metrics.record(self.tier, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self.metrics.record(self.tier, "hits")
+            return entry
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """The entry held for a key, expired or not, without counting a lookup or touching recency."""
+        with self._lock:
+            item = self._entries.get(key)
+            return item[0] if item else None
+
+    def set(self, key: str, entry: Dict[str, Any], inserted_at: Optional[datetime] = None) -> None:
+        size = entry.get("size_bytes") or self.policy.entry_size(entry)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (entry, size, inserted_at or datetime.now(timezone.utc))
+            self._bytes += size
+            self._evict_locked()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            item = self._entries.pop(key, None)
+            if item:
+                self._bytes -= item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def items(self) -> List[Tuple[str, Dict[str, Any], datetime]]:
+        """Keys, entries and insertion times, from least to most recently used."""
+        with self._lock:
+            return [(key, entry, inserted_at) for key, (entry, _, inserted_at) in self._entries.items()]
+
+    def _evict_locked(self) -> None:
+        evicted = 0
+        while self._entries and (len(self._entries) > self.policy.memory_max_entries
+                                 or self._bytes > self.policy.memory_max_bytes):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            evicted += 1
+        if evicted:
+            self.metrics.record(self.tier, "evictions", evicted)
+
+def select_store_evictions(entries: List[Dict[str, Any]], policy: CachePolicy,
+                           now: Optional[datetime] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Pick persistent-store entries to remove: expired ones, then least-recently-used
+    ones until the store is back under its entry and byte limits.
+
+    Returns (expired, evicted).
+    """
+
+    now = now or datetime.now(timezone.utc)
+    expired = [e for e in entries if policy.is_expired(e, now)]
+    live = [e for e in entries if not policy.is_expired(e, now)]
+    live.sort(key=lambda e: e.get("last_accessed") or e.get("timestamp") or now)
+
+    evicted = []
+    total_bytes = sum(e.get("size_bytes") or 0 for e in live)
+    while live and ((policy.store_max_entries is not None and len(live) > policy.store_max_entries)
+                    or (policy.store_max_bytes is not None and total_bytes > policy.store_max_bytes)):
+        entry = live.pop(0)
+        total_bytes -= entry.get("size_bytes") or 0
+        evicted.append(entry)
+
+    return expired, evicted
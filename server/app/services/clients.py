@@ -0,0 +1,52 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+from google.cloud import firestore
+
+logger = logging.getLogger(__name__)
+
+# One client per project. gRPC multiplexes concurrent calls over the client's HTTP/2
+# channel, so sharing the client is what gives us connection reuse. The library's own
+# channel options already keep the connection alive and lift gRPC's message size limit.
+_clients: Dict[str, firestore.Client] = {}
+_clients_lock = threading.Lock()
+
+def _resolve_project(project_id: Optional[str]) -> str:
+    project_id = project_id or os.getenv("GOOGLE_CLOUD_PROJECT")
+    if not project_id:
+        raise ValueError("GOOGLE_CLOUD_PROJECT must be set")
+    return project_id
+
+def get_firestore_client(project_id: Optional[str] = None) -> firestore.Client:
+    """Return the process-wide Firestore client for a project, creating it on first use."""
+    project_id = _resolve_project(project_id)
+    client = _clients.get(project_id)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(project_id)
+            if client is None:
+                client = firestore.Client(project=project_id)
+                _clients[project_id] = client
+    return client
+
+def warm_up_firestore(project_id: Optional[str] = None) -> Optional[float]:
+    """Open the channel and fetch credentials before the first request needs them.
+
+    Returns the warm-up time in seconds, or None if it failed.
+    """
+    start_time = time.time()
+    try:
+        client = get_firestore_client(project_id)
+        # Any RPC will do; a one-document read establishes the connection and auth token
+        list(client.collection("cache").limit(1).stream())
+        return time.time() - start_time
+    except Exception as e:
+        logger.warning("Firestore warm-up failed: %s", e)
+        return None
+
+def reset_clients() -> None:
+    """Drop shared clients, e.g. after a fork or in tests."""
+    with _clients_lock:
+        _clients.clear()
@@ -1,95 +1,328 @@
+import logging
 import os
 import json
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel
+from vertexai.generative_models import GenerativeModel, GenerationConfig
+from app.services.extraction_cache import ExtractionCache
+from app.services.model_cascade import (
+    ModelTier, cascade_model_names, should_escalate, DEFAULT_ESCALATION_CONFIDENCE
+)
+from app.services.providers import model_from_env, provider_mode, stream_chunk_text
+from app.services.rate_limit import ThrottledError, get_rate_limiter
+from app.config import SUPPLIERS_DIR, config
+from app.utils.log import debug_payload
+from app.utils.metrics import LLM_CALLS, LLM_TOKENS, PARSE_FAILURES
+from app.utils.prefilter import SupplierPreFilter
+from app.utils.result_dedup import SearchResultDeduplicator
+from app.utils.tracing import span
+from app.utils.response_parser import SUPPLIER_RESPONSE_SCHEMA, parse_supplier_response
+from app.utils.tokens import (
+    TokenUsage, estimate_tokens, chunk_text, usage_from_response,
+    DEFAULT_EXTRACTION_TOKEN_BUDGET, DEFAULT_CHUNK_OVERLAP_TOKENS
+)
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-2.0-flash-001"
+
+# Bump whenever the prompt or generation settings change so cached extractions are not reused
+PROMPT_TEMPLATE_VERSION = 3
+
+# Static instructions, sent once per model as its system instruction rather than repeated in
+# every prompt. Keeping them identical across calls also makes them a shared prefix.
+EXTRACTION_SYSTEM_INSTRUCTION = """You are an expert at extracting supplier information from business documents. Each request names a TARGET COMPANY and gives a TEXT TO ANALYZE and its SOURCE. Your task is to identify any supplier companies mentioned in relation to the target company.
+
+INSTRUCTIONS:
+1. Identify any company names that appear to be suppliers, vendors, or business partners of the target company
+2. Focus on companies that provide goods, services, or materials to the target company
+3. Exclude the target company itself and its subsidiaries
+4. For each supplier, provide:
+   - Company name (normalized)
+   - Confidence score (0.0-1.0)
+   - Brief context of the relationship
+
+OUTPUT FORMAT (JSON only):
+{
+    "suppliers": [
+        {
+            "name": "Supplier Company Name",
+            "confidence": 0.85,
+            "context": "Brief description of relationship or mention context"
+        }
+    ]
+}
+
+IMPORTANT: Return ONLY valid JSON. Do not include any other text or explanations.
+"""
+
+# Constrain output to the Supplier JSON shape so a single call parses reliably
+EXTRACTION_GENERATION_CONFIG = GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=SUPPLIER_RESPONSE_SCHEMA,
+    temperature=0.0
+)
+
+# Never leave less than this much room for content, however long the instructions get
+MIN_CONTENT_TOKENS = 200
+
+# Metric children bound once, so recording a call does no label lookup
+_LLM_OK = LLM_CALLS.labels("ok")
+_LLM_ERRORS = LLM_CALLS.labels("error")
+_PROMPT_TOKENS = LLM_TOKENS.labels("prompt")
+_OUTPUT_TOKENS = LLM_TOKENS.labels("output")
+_CACHED_PROMPT_TOKENS = LLM_TOKENS.labels("cached_prompt")
+_PARSE_FAILED = PARSE_FAILURES.labels("failed")
+_PARSE_PARTIAL = PARSE_FAILURES.labels("partial")
 
 class VertexAIExtractionService:
-    def __init__(self):
+    # Prompt token budget per model call, and the overlap between chunks of long text
+    token_budget = DEFAULT_EXTRACTION_TOKEN_BUDGET
+    chunk_overlap_tokens = DEFAULT_CHUNK_OVERLAP_TOKENS
+    # Local check that skips snippets with no plausible supplier mention; None disables it
+    prefilter: Optional[SupplierPreFilter] = None
+    # Models tried in order, cheapest first; None means the single model in self.model
+    cascade: Optional[List[ModelTier]] = None
+    escalation_confidence = DEFAULT_ESCALATION_CONFIDENCE
+    # Stream responses so time to first token can be measured. Off by default: parsing needs
+    # the whole response anyway, so streaming only adds per-chunk overhead
+    stream_responses = False
+    
+    def __init__(self, extraction_cache: Optional[ExtractionCache] = None):
         self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
-        if not self.project_id:
+        # Replay answers from a recording, so it needs neither a project nor Vertex AI
+        replay = provider_mode() == "replay"
+        if not self.project_id and not replay:
             raise ValueError("GOOGLE_CLOUD_PROJECT must be set")
         
         # Initialize Vertex AI
-        aiplatform.init(project=self.project_id)
-        self.model = GenerativeModel("gemini-2.0-flash-001")
+        if not replay:
+            aiplatform.init(project=self.project_id)
+        self.cascade = [
+            ModelTier(name, model_from_env(name, lambda name=name: GenerativeModel(
+                name,
+                generation_config=EXTRACTION_GENERATION_CONFIG,
+                system_instruction=EXTRACTION_SYSTEM_INSTRUCTION
+            )))
+            for name in cascade_model_names() or [MODEL_NAME]
+        ]
+        self.stream_responses = os.getenv("EXTRACTION_STREAMING", "false").lower() == "true"
+        self.escalation_confidence = float(
+            os.getenv("EXTRACTION_CASCADE_CONFIDENCE", DEFAULT_ESCALATION_CONFIDENCE)
+        )
+        # The strongest tier is the service's reference model
+        self.model_name = self.cascade[-1].name
+        self.model = self.cascade[-1].model
+        self.extraction_cache = extraction_cache or ExtractionCache.from_env()
+        self.result_deduplicator = SearchResultDeduplicator()
+        self.token_budget = int(os.getenv("EXTRACTION_TOKEN_BUDGET", DEFAULT_EXTRACTION_TOKEN_BUDGET))
+        self.chunk_overlap_tokens = int(os.getenv("EXTRACTION_CHUNK_OVERLAP_TOKENS", DEFAULT_CHUNK_OVERLAP_TOKENS))
+        if os.getenv("EXTRACTION_PREFILTER", "true").lower() == "true":
+            self.prefilter = SupplierPreFilter.from_directory(
+                os.getenv("SUPPLIER_REGISTRY_DIR", str(SUPPLIERS_DIR)), config.is_supplier_ignored
+            )
     
-    def extract_suppliers_from_text(self, company_name: str, text_content: str, source_url: str = "") -> List[Dict[str, Any]]:
-        """Extract supplier names from text content using Vertex AI Gemini."""
+    def extract_suppliers_from_text(self, company_name: str, text_content: str, source_url: str = "",
+                                    usage: Optional[TokenUsage] = None) -> List[Dict[str, Any]]:
+        """Extract supplier names from text content using Vertex AI Gemini.
+        
+        Text that does not fit the per-call token budget is split into overlapping chunks
+        on sentence boundaries, one model call each.
+        """
+        
+        suppliers = []
+        for chunk in self.chunk_content(company_name, text_content, source_url):
+            suppliers.extend(self._extract_chunk(company_name, chunk, source_url, usage))
+        return suppliers
+    
+    def chunk_content(self, company_name: str, text_content: str, source_url: str = "") -> List[str]:
+        """Split text into chunks that fit the per-call token budget alongside the instructions."""
+        
+        # The system instruction is billed as input on every call, so it counts against the budget
+        instructions_tokens = estimate_tokens(EXTRACTION_SYSTEM_INSTRUCTION) + \
+            estimate_tokens(self._build_extraction_prompt(company_name, "", source_url))
+        content_budget = max(MIN_CONTENT_TOKENS, self.token_budget - instructions_tokens)
+        return chunk_text(text_content, content_budget, self.chunk_overlap_tokens)
+    
+    def _model_tiers(self) -> List[ModelTier]:
+        return self.cascade or [ModelTier(self.model_name, self.model)]
+    
+    def cache_key_for(self, company_name: str, text_content: str) -> Optional[str]:
+        """Extraction cache key for one chunk, or None when caching is disabled."""
+        
+        if not self.extraction_cache:
+            return None
+        return self.extraction_cache.make_key(
+            "+".join(tier.name for tier in self._model_tiers()), PROMPT_TEMPLATE_VERSION, company_name, text_content
+        )
+    
+    def _extract_chunk(self, company_name: str, text_content: str, source_url: str,
+                       usage: Optional[TokenUsage] = None) -> List[Dict[str, Any]]:
+        """Extract suppliers from text that fits in one call.
+        
+        The text goes to the cheapest model in the cascade first and is re-run on the next
+        tier only when the output fails to parse or has low-confidence suppliers. Results
+        are cached on a hash of the cascade, prompt version, company and text, so only text
+        that has not been seen before costs a model call.
+        """
+        
+        tiers = self._model_tiers()
+        cache_key = self.cache_key_for(company_name, text_content)
+        if cache_key:
+            cached_suppliers = self.extraction_cache.get(cache_key)
+            if cached_suppliers is not None:
+                if usage:
+                    usage.record_cached()
+                return cached_suppliers
         
         prompt = self._build_extraction_prompt(company_name, text_content, source_url)
         
-        try:
-            response = self.model.generate_content(prompt)
-            
-            # Clean up response text for JSON parsing
-            text = response.text.strip()
-            if text.startswith('```'):
-                text = text.strip('`')
-                # Remove optional 'json' after backticks
-                if text.startswith('json'):
-                    text = text[4:].strip()
-            try:
-                result = json.loads(text)
-                return result.get("suppliers", [])
-            except json.JSONDecodeError:
-                print(f"Failed to parse JSON response: {response.text}")
-                return []
-                
-        except Exception as e:
-            print(f"Vertex AI extraction error: {e}")
+        suppliers, complete = None, False
+        for position, tier in enumerate(tiers):
+            started = time.perf_counter()
+            tier_suppliers, tier_complete = self._generate(tier.model, prompt, usage, tier.name)
+            # A stronger tier that fails outright does not throw away a weaker tier's answer
+            if tier_suppliers is not None:
+                suppliers, complete = tier_suppliers, tier_complete
+            escalate = position < len(tiers) - 1 and should_escalate(
+                tier_suppliers, tier_complete, self.escalation_confidence
+            )
+            tier.record(time.perf_counter() - started, escalated=escalate, failed=tier_suppliers is None)
+            if not escalate:
+                break
+        
+        if suppliers is None:
             return []
+        
+        # Only cache complete parses so partial recoveries and failures are retried next time
+        if cache_key and complete:
+            self.extraction_cache.set(cache_key, suppliers)
+        return suppliers
+    
+    def _generate(self, model: Any, prompt: str, usage: Optional[TokenUsage] = None,
+                  model_name: str = "") -> Tuple[Optional[List[Dict[str, Any]]], bool]:
+        """One model call, parsed. Returns (None, False) when the call or the parse fails."""
+        
+        with span("llm.call", model=model_name) as call_span:
+            try:
+                response, response_text, first_token_seconds = get_rate_limiter("vertex_ai").call(
+                    self._call_model, model, prompt
+                )
+            except ThrottledError:
+                # Surface sustained throttling instead of returning an empty (and cacheable) result
+                _LLM_ERRORS.inc()
+                raise
+            except Exception as e:
+                logger.warning("Vertex AI extraction error: %s", e)
+                _LLM_ERRORS.inc()
+                if call_span:
+                    call_span.error = f"{type(e).__name__}: {e}"
+                return None, False
+            
+            tokens = usage_from_response(response, f"{EXTRACTION_SYSTEM_INSTRUCTION}{prompt}", response_text)
+            _LLM_OK.inc()
+            _PROMPT_TOKENS.inc(tokens["prompt_tokens"])
+            _OUTPUT_TOKENS.inc(tokens["output_tokens"])
+            _CACHED_PROMPT_TOKENS.inc(tokens["cached_prompt_tokens"])
+            if call_span:
+                call_span.set_attribute("prompt_tokens", tokens["prompt_tokens"])
+                call_span.set_attribute("output_tokens", tokens["output_tokens"])
+                if first_token_seconds is not None:
+                    call_span.set_attribute("first_token_ms", round(first_token_seconds * 1000, 1))
+        
+        if usage:
+            usage.record_call(**tokens, first_token_seconds=first_token_seconds)
+        
+        with span("parse", response_chars=len(response_text)) as parse_span:
+            suppliers, complete = parse_supplier_response(response_text)
+            if parse_span:
+                parse_span.set_attribute("complete", complete)
+        if suppliers is None:
+            _PARSE_FAILED.inc()
+            logger.warning("Failed to parse model response (%d chars)", len(response_text))
+            debug_payload(logger, "Unparsed model response", response_text)
+        elif not complete:
+            _PARSE_PARTIAL.inc()
+        return suppliers, complete
+    
+    def _call_model(self, model: Any, prompt: str) -> Tuple[Any, str, Optional[float]]:
+        """Returns the response carrying usage metadata, its text and the time to first token.
+        
+        The whole stream is read here so rate limiting retries cover errors raised mid-stream.
+        """
+        
+        if not self.stream_responses:
+            response = model.generate_content(prompt)
+            # .text raises when the response was blocked or has no candidates
+            return response, response.text, None
+        
+        started = time.perf_counter()
+        first_token_seconds = None
+        response, parts = None, []
+        for response in model.generate_content(prompt, stream=True):
+            text = stream_chunk_text(response)
+            if text and first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - started
+            parts.append(text)
+        # The final chunk carries the usage metadata for the whole response
+        return response, "".join(parts), first_token_seconds
     
     def _build_extraction_prompt(self, company_name: str, text_content: str, source_url: str) -> str:
-        """Build the prompt for supplier extraction."""
+        """Build the per-request part of the extraction prompt.
+        
+        The instructions and output format are the same for every call, so they are sent as
+        the model's system instruction (EXTRACTION_SYSTEM_INSTRUCTION) instead.
+        """
         
-        return f"""
-You are an expert at extracting supplier information from business documents. Your task is to identify any supplier companies mentioned in relation to "{company_name}".
+        return f"""TARGET COMPANY: "{company_name}"
 
 TEXT TO ANALYZE:
 {text_content}
 
 SOURCE: {source_url}
-
-INSTRUCTIONS:
-1. Identify any company names that appear to be suppliers, vendors, or business partners of "{company_name}"
-2. Focus on companies that provide goods, services, or materials to "{company_name}"
-3. Exclude "{company_name}" itself and its subsidiaries
-4. For each supplier, provide:
-   - Company name (normalized)
-   - Confidence score (0.0-1.0)
-   - Brief context of the relationship
-
-OUTPUT FORMAT (JSON only):
-{{
-    "suppliers": [
-        {{
-            "name": "Supplier Company Name",
-            "confidence": 0.85,
-            "context": "Brief description of relationship or mention context"
-        }}
-    ]
-}}
-
-IMPORTANT: Return ONLY valid JSON. Do not include any other text or explanations.
 """
     
-    def extract_suppliers_from_search_results(self, company_name: str, search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Extract suppliers from multiple search results."""
+    def extract_suppliers_from_search_results(self, company_name: str, search_results: List[Dict[str, Any]],
+                                              usage: Optional[TokenUsage] = None) -> List[Dict[str, Any]]:
+        """Extract suppliers from multiple search results.
+        
+        Duplicate and near-duplicate results are collapsed first so each distinct piece of
+        text costs one model call; suppliers keep every URL the text appeared at. Results the
+        local pre-filter finds no plausible supplier in are skipped entirely. Results carrying
+        fetched page text under "content" (deep mode) are chunked along with their snippet.
+        """
         
         all_suppliers = []
         
-        for result in search_results:
-            # Combine title and snippet for analysis
-            content = f"Title: {result.get('title', '')}\nSnippet: {result.get('snippet', '')}"
+        for result in self.result_deduplicator.deduplicate_results(search_results):
+            content = self.result_content(company_name, result)
+            if content is None:
+                continue
             source_url = result.get('link', '')
+            source_urls = result.get('source_urls') or [source_url]
             
-            suppliers = self.extract_suppliers_from_text(company_name, content, source_url)
+            suppliers = self.extract_suppliers_from_text(company_name, content, source_url, usage)
             
-            # Add source URL to each supplier
+            # Add source URLs to each supplier
             for supplier in suppliers:
                 supplier['source_url'] = source_url
+                supplier['source_urls'] = source_urls
             
             all_suppliers.extend(suppliers)
         
-        return all_suppliers 
\ No newline at end of file
+        return all_suppliers
+    
+    def result_content(self, company_name: str, result: Dict[str, Any]) -> Optional[str]:
+        """The text sent to the model for one search result, or None if the pre-filter skips it."""
+        
+        page = result.get('content', '')
+        if self.prefilter and not self.prefilter.has_candidate(
+                f"{result.get('title', '')}\n{result.get('snippet', '')}\n{page}", company_name):
+            return None
+        
+        # Combine title and snippet for analysis, plus the page text in deep mode
+        content = f"Title: {result.get('title', '')}\nSnippet: {result.get('snippet', '')}"
+        if page:
+            content += f"\nPage: {page}"
+        return content
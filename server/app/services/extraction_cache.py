@@ -0,0 +1,64 @@
+import logging
+import os
+import json
+import hashlib
+from typing import List, Dict, Any, Optional
+
+from app.utils.cache_keys import canonicalize_company_name
+from app.utils.local_cache import SqliteCache
+from app.utils.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTRACTION_CACHE_PATH = "cache/extraction_cache.sqlite3"
+DEFAULT_EXTRACTION_CACHE_MAX_ENTRIES = 50_000
+DEFAULT_EXTRACTION_CACHE_TTL_DAYS = 30
+
+_HITS = CACHE_LOOKUPS.labels("extraction", "hit")
+_MISSES = CACHE_LOOKUPS.labels("extraction", "miss")
+
+class ExtractionCache:
+    """Persistent cache of model extraction output keyed on a content hash.
+
+    The key covers everything that determines the model's answer: model name, prompt
+    template version, company and the exact text sent. A snippet that comes back unchanged
+    for a related query, or on a later re-extraction, is served without a model call.
+    """
+
+    def __init__(self, store: SqliteCache):
+        self.store = store
+
+    @classmethod
+    def from_env(cls) -> Optional["ExtractionCache"]:
+        """Build from EXTRACTION_CACHE_* variables. Returns None when EXTRACTION_CACHE_PATH is empty."""
+        path = os.getenv("EXTRACTION_CACHE_PATH", DEFAULT_EXTRACTION_CACHE_PATH)
+        if not path:
+            return None
+        try:
+            return cls(SqliteCache(
+                path,
+                max_entries=int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", DEFAULT_EXTRACTION_CACHE_MAX_ENTRIES)),
+                ttl_seconds=float(os.getenv("EXTRACTION_CACHE_TTL_DAYS", DEFAULT_EXTRACTION_CACHE_TTL_DAYS)) * 86400
+            ))
+        except Exception as e:
+            logger.warning("Extraction cache disabled: %s", e)
+            return None
+
+    @staticmethod
+    def make_key(model_name: str, template_version: Any, company_name: str, content: str) -> str:
+        payload = json.dumps(
+            [model_name, str(template_version), canonicalize_company_name(company_name), content],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        suppliers = self.store.get(key)
+        (_MISSES if suppliers is None else _HITS).inc()
+        return suppliers
+
+    def set(self, key: str, suppliers: List[Dict[str, Any]]) -> None:
+        self.store.set(key, suppliers)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
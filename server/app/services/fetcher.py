@@ -0,0 +1,176 @@
+import codecs
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; LazyLogistics/1.0)"
+
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_PER_HOST_LIMIT = 2
+# Stop reading a page after this many bytes; supplier mentions are rarely deep in the page
+DEFAULT_MAX_PAGE_BYTES = 512 * 1024
+DEFAULT_FETCH_TIMEOUT = 10.0
+
+READ_CHUNK_BYTES = 16 * 1024
+
+_TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+_CHARSET = re.compile(r"charset=[\"']?([\w.:-]+)")
+
+def _body_encoding(content_type: str, body: bytes) -> str:
+    """The charset the Content-Type declares, else the body's apparent encoding, else utf-8.
+
+    requests reports ISO-8859-1 for any text/* response without a charset, which garbles
+    the UTF-8 most such pages are in, so its response.encoding is not used.
+    """
+    match = _CHARSET.search(content_type)
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    try:
+        # Valid UTF-8 needs no detection; a multi-byte character cut at the byte cap is allowed
+        codecs.getincrementaldecoder("utf-8")().decode(body, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    detected = chardet.detect(body)["encoding"] if chardet else None
+    return detected or "utf-8"
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text, one line per block element."""
+
+    SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "head", "nav", "footer"}
+    BLOCK_TAGS = {
+        "p", "div", "br", "li", "ul", "ol", "tr", "td", "th", "table", "section", "article",
+        "header", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "title"
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+def html_to_text(html: str) -> str:
+    """Visible text of an HTML page, whitespace collapsed, blocks on separate lines."""
+    parser = _TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        # Truncated markup is expected when reading stops at the byte cap
+        pass
+    lines = (re.sub(r"\s+", " ", line).strip() for line in "".join(parser.parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+class DocumentFetcher:
+    """Fetches result pages concurrently over pooled keep-alive connections.
+
+    At most ``per_host_limit`` requests run against one host at a time, bodies are streamed
+    and reading stops at ``max_bytes``, and HTML is converted to plain text.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_FETCH_WORKERS, per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+                 max_bytes: int = DEFAULT_MAX_PAGE_BYTES, timeout: float = DEFAULT_FETCH_TIMEOUT,
+                 session: Optional[requests.Session] = None):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "DocumentFetcher":
+        return cls(
+            max_workers=int(os.getenv("FETCH_MAX_WORKERS", DEFAULT_FETCH_WORKERS)),
+            per_host_limit=int(os.getenv("FETCH_PER_HOST_LIMIT", DEFAULT_PER_HOST_LIMIT)),
+            max_bytes=int(os.getenv("FETCH_MAX_PAGE_BYTES", DEFAULT_MAX_PAGE_BYTES)),
+            timeout=float(os.getenv("FETCH_TIMEOUT_SECONDS", DEFAULT_FETCH_TIMEOUT))
+        )
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return slot
+
+    def fetch(self, url: str) -> str:
+        """Text of one page, or "" if it cannot be fetched or is not a text document."""
+        try:
+            with self._host_slot(url):
+                with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    content_type = response.headers.get("Content-Type", "text/html").lower()
+                    if not content_type.startswith(_TEXT_CONTENT_TYPES):
+                        return ""
+
+                    body = bytearray()
+                    for chunk in response.iter_content(READ_CHUNK_BYTES):
+                        body.extend(chunk)
+                        if len(body) >= self.max_bytes:
+                            break
+                    body = bytes(body[:self.max_bytes])
+                    text = body.decode(_body_encoding(content_type, body), errors="replace")
+        except Exception as e:
+            logger.warning("Error fetching content from %s: %s", url, e)
+            return ""
+
+        return text if content_type.startswith("text/plain") else html_to_text(text)
+
+    def fetch_all(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Fetch several pages concurrently. Returns url -> text for every distinct URL."""
+        unique_urls = [url for url in dict.fromkeys(urls) if url]
+        if not unique_urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique_urls))) as executor:
+            return dict(zip(unique_urls, executor.map(self.fetch, unique_urls)))
+
+    def close(self) -> None:
+        self.session.close()
+
+_fetcher: Optional[DocumentFetcher] = None
+_fetcher_lock = threading.Lock()
+
+def get_document_fetcher() -> DocumentFetcher:
+    """Process-wide fetcher, so connections are pooled across requests."""
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = DocumentFetcher.from_env()
+    return _fetcher
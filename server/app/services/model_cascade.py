@@ -0,0 +1,54 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+# Cheapest model first; results are escalated to the next tier when they are not trusted
+DEFAULT_MODEL_CASCADE = "gemini-2.0-flash-lite-001,gemini-2.0-flash-001"
+
+# Escalate when any supplier from a tier is below this confidence
+DEFAULT_ESCALATION_CONFIDENCE = 0.6
+
+class ModelTier:
+    """One model in the extraction cascade, with its call counts and latency."""
+
+    def __init__(self, name: str, model: Any):
+        self.name = name
+        self.model = model
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.escalations = 0
+        self.failures = 0
+        self.latency_seconds = 0.0
+
+    def record(self, latency: float, escalated: bool = False, failed: bool = False) -> None:
+        with self._lock:
+            self.calls += 1
+            self.latency_seconds += latency
+            self.escalations += escalated
+            self.failures += failed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.name,
+                "calls": self.calls,
+                "escalations": self.escalations,
+                "failures": self.failures,
+                "avg_latency_ms": round(self.latency_seconds / self.calls * 1000, 1) if self.calls else 0.0,
+                "escalation_rate": round(self.escalations / self.calls, 3) if self.calls else 0.0
+            }
+
+def cascade_model_names() -> List[str]:
+    """Model names from EXTRACTION_MODEL_CASCADE, cheapest first."""
+    names = os.getenv("EXTRACTION_MODEL_CASCADE", DEFAULT_MODEL_CASCADE)
+    return [name.strip() for name in names.split(",") if name.strip()]
+
+def should_escalate(suppliers: Optional[List[Dict[str, Any]]], complete: bool, threshold: float) -> bool:
+    """Whether a tier's output should be re-run on the next, stronger model.
+
+    Failed and partial parses always escalate, as does any supplier below the confidence
+    threshold. An empty result is trusted: most snippets simply name no supplier.
+    """
+    if suppliers is None or not complete:
+        return True
+    return any(s.get("confidence", 0.0) < threshold for s in suppliers)
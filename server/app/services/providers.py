@@ -0,0 +1,304 @@
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# live: call the real APIs. record: call them and append every response to the recording.
+# replay: answer from the recording without network access or credentials.
+PROVIDER_MODES = ("live", "record", "replay")
+DEFAULT_RECORDING_PATH = "recordings/calls.jsonl"
+
+SEARCH = "search"
+MODEL = "model"
+
+# Returned for calls the recording does not contain, so replay never reaches the network
+EMPTY_SEARCH_RESPONSE: Dict[str, Any] = {"items": []}
+EMPTY_MODEL_RESPONSE = '{"suppliers": []}'
+
+def provider_mode() -> str:
+    mode = os.getenv("PROVIDER_MODE", "live").lower()
+    if mode not in PROVIDER_MODES:
+        raise ValueError(f"PROVIDER_MODE must be one of {', '.join(PROVIDER_MODES)}")
+    return mode
+
+def call_key(kind: str, *request: Any) -> str:
+    payload = json.dumps([kind, *request], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class CallRecording:
+    """Raw upstream responses in an append-only JSONL file, one call per line.
+
+    Each line holds the call kind, its key, the request (for reading the file), the
+    response and the latency observed when it was recorded. A later line for the same key
+    replaces an earlier one.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def record(self, kind: str, key: str, request: Dict[str, Any], response: Any, latency: float) -> None:
+        entry = {"kind": kind, "key": key, "request": request, "response": response, "latency": round(latency, 4)}
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._entries[key] = entry
+            self.recorded += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+class InjectedError(Exception):
+    """A failure injected during replay. ``code`` 429 is treated as throttling by the rate limiters."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+class FaultInjector:
+    """Latency and error injection for replayed or simulated calls.
+
+    Each call sleeps for its recorded latency times ``latency_scale``, or for
+    ``latency_seconds`` when that is set, and then fails with probability ``error_rate``
+    (HTTP 500) or ``throttle_rate`` (HTTP 429). A ``latency_sigma`` above 0 spreads the
+    latency log-normally around that median; 0.5 puts p99 at about 3.2 times the median.
+    """
+
+    def __init__(self, latency_scale: float = 1.0, latency_seconds: Optional[float] = None,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, seed: Optional[int] = None,
+                 sleep: Callable[[float], None] = time.sleep, latency_sigma: float = 0.0):
+        self.latency_scale = latency_scale
+        self.latency_seconds = latency_seconds
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.total_latency = 0.0
+        self.injected_errors = 0
+        self.injected_throttles = 0
+
+    @classmethod
+    def from_env(cls) -> "FaultInjector":
+        latency_ms = os.getenv("REPLAY_LATENCY_MS")
+        seed = os.getenv("REPLAY_SEED")
+        return cls(
+            latency_scale=float(os.getenv("REPLAY_LATENCY_SCALE", 1.0)),
+            latency_seconds=float(latency_ms) / 1000 if latency_ms else None,
+            latency_sigma=float(os.getenv("REPLAY_LATENCY_SIGMA", 0.0)),
+            error_rate=float(os.getenv("REPLAY_ERROR_RATE", 0.0)),
+            throttle_rate=float(os.getenv("REPLAY_THROTTLE_RATE", 0.0)),
+            seed=int(seed) if seed else None
+        )
+
+    def before_call(self, recorded_latency: float = 0.0) -> None:
+        delay = self.latency_seconds if self.latency_seconds is not None else recorded_latency * self.latency_scale
+        with self._lock:
+            if delay > 0 and self.latency_sigma > 0:
+                delay *= math.exp(self._random.gauss(0.0, self.latency_sigma))
+            self.calls += 1
+            self.total_latency += max(delay, 0.0)
+        if delay > 0:
+            self._sleep(delay)
+        with self._lock:
+            roll = self._random.random()
+            if roll < self.throttle_rate:
+                self.injected_throttles += 1
+                raise InjectedError(429, "Injected throttling")
+            if roll < self.throttle_rate + self.error_rate:
+                self.injected_errors += 1
+                raise InjectedError(500, "Injected upstream error")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "injected_errors": self.injected_errors,
+                "injected_throttles": self.injected_throttles,
+                "mean_latency_ms": round(self.total_latency / self.calls * 1000, 1) if self.calls else 0.0
+            }
+
+class RecordingSearchProvider:
+    """Calls the live search and records every successful response."""
+
+    def __init__(self, live: Callable[[str, int, int], Dict[str, Any]], recording: CallRecording):
+        self.live = live
+        self.recording = recording
+
+    def search(self, query: str, start: int, num: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        response = self.live(query, start, num)
+        self.recording.record(
+            SEARCH, call_key(SEARCH, query, start, num), {"q": query, "start": start, "num": num},
+            response, time.perf_counter() - started
+        )
+        return response
+
+class ReplaySearchProvider:
+    def __init__(self, recording: CallRecording, faults: FaultInjector):
+        self.recording = recording
+        self.faults = faults
+
+    def search(self, query: str, start: int, num: int) -> Dict[str, Any]:
+        entry = self.recording.get(call_key(SEARCH, query, start, num))
+        self.faults.before_call(entry["latency"] if entry else 0.0)
+        return entry["response"] if entry else EMPTY_SEARCH_RESPONSE
+
+def _model_response(text: str, usage: Optional[Dict[str, Any]]) -> SimpleNamespace:
+    usage = usage or {}
+    return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(
+        prompt_token_count=usage.get("prompt_token_count"),
+        candidates_token_count=usage.get("candidates_token_count"),
+        cached_content_token_count=usage.get("cached_content_token_count")
+    ))
+
+def _usage_metadata(response: Any) -> Dict[str, Any]:
+    metadata = getattr(response, "usage_metadata", None)
+    usage = {}
+    for field in ("prompt_token_count", "candidates_token_count", "cached_content_token_count"):
+        value = getattr(metadata, field, None)
+        if isinstance(value, int):
+            usage[field] = value
+    return usage
+
+def stream_chunk_text(response: Any) -> str:
+    """The text of one streamed chunk.
+
+    The final chunk can carry only usage or finish metadata, with no content parts, and
+    .text raises on it; only parts that hold text are read. Responses without a candidates
+    list (test doubles, replayed calls) fall back to .text.
+    """
+    candidates = getattr(response, "candidates", None)
+    if not isinstance(candidates, (list, tuple)):
+        return response.text
+    if not candidates:
+        return ""
+    parts = getattr(getattr(candidates[0], "content", None), "parts", None) or []
+    return "".join(getattr(part, "text", "") or "" for part in parts)
+
+class RecordingModel:
+    """Wraps a GenerativeModel and records each prompt's response text and usage."""
+
+    def __init__(self, model: Any, model_name: str, recording: CallRecording):
+        self.model = model
+        self.model_name = model_name
+        self.recording = recording
+
+    def generate_content(self, prompt: str, stream: bool = False) -> Any:
+        started = time.perf_counter()
+        if not stream:
+            response = self.model.generate_content(prompt)
+            self._record(prompt, response.text, _usage_metadata(response), started)
+            return response
+        return self._stream(prompt, started)
+
+    def _stream(self, prompt: str, started: float) -> Iterator[Any]:
+        parts, response = [], None
+        for response in self.model.generate_content(prompt, stream=True):
+            parts.append(stream_chunk_text(response))
+            yield response
+        self._record(prompt, "".join(parts), _usage_metadata(response), started)
+
+    def _record(self, prompt: str, text: str, usage: Dict[str, Any], started: float) -> None:
+        self.recording.record(
+            MODEL, call_key(MODEL, self.model_name, prompt), {"model": self.model_name, "prompt": prompt},
+            {"text": text, "usage": usage}, time.perf_counter() - started
+        )
+
+class ReplayModel:
+    """Stands in for a GenerativeModel, answering prompts from the recording."""
+
+    def __init__(self, model_name: str, recording: CallRecording, faults: FaultInjector):
+        self.model_name = model_name
+        self.recording = recording
+        self.faults = faults
+
+    def generate_content(self, prompt: str, stream: bool = False) -> Any:
+        entry = self.recording.get(call_key(MODEL, self.model_name, prompt))
+        self.faults.before_call(entry["latency"] if entry else 0.0)
+        response = entry["response"] if entry else {"text": EMPTY_MODEL_RESPONSE, "usage": {}}
+        reply = _model_response(response["text"], response.get("usage"))
+        return iter([reply]) if stream else reply
+
+_recording: Optional[CallRecording] = None
+_faults: Optional[FaultInjector] = None
+_providers_lock = threading.Lock()
+
+def get_recording() -> CallRecording:
+    """Process-wide recording at PROVIDER_RECORDING_PATH, shared by search and extraction."""
+    global _recording
+    with _providers_lock:
+        if _recording is None:
+            _recording = CallRecording(os.getenv("PROVIDER_RECORDING_PATH", DEFAULT_RECORDING_PATH))
+        return _recording
+
+def get_fault_injector() -> FaultInjector:
+    global _faults
+    with _providers_lock:
+        if _faults is None:
+            _faults = FaultInjector.from_env()
+        return _faults
+
+def search_provider_from_env(live: Callable[[str, int, int], Dict[str, Any]]) -> Optional[Any]:
+    """The search provider for PROVIDER_MODE; None means call the API directly."""
+    mode = provider_mode()
+    if mode == "record":
+        return RecordingSearchProvider(live, get_recording())
+    if mode == "replay":
+        return ReplaySearchProvider(get_recording(), get_fault_injector())
+    return None
+
+def model_from_env(model_name: str, build_live: Callable[[], Any]) -> Any:
+    """The model object for PROVIDER_MODE. The live model is only built outside replay."""
+    mode = provider_mode()
+    if mode == "replay":
+        return ReplayModel(model_name, get_recording(), get_fault_injector())
+    model = build_live()
+    return RecordingModel(model, model_name, get_recording()) if mode == "record" else model
+
+def provider_stats() -> Optional[Dict[str, Any]]:
+    """Recording and injection counters, or None in live mode."""
+    if _recording is None:
+        return None
+    stats = {"mode": provider_mode(), "recording": _recording.stats()}
+    if _faults is not None:
+        stats["faults"] = _faults.stats()
+    return stats
+
+def reset_providers() -> None:
+    global _recording, _faults
+    with _providers_lock:
+        _recording = None
+        _faults = None
@@ -0,0 +1,50 @@
+import os
+from typing import List, Dict, Any, Optional
+
+from app.utils.urls import canonicalize_url
+
+# Query variants searched concurrently for each company. The first is the original
+# single query; the others reach pages that phrase supplier relationships differently.
+DEFAULT_QUERY_TEMPLATES = [
+    '"{company}" suppliers vendors partners supply chain',
+    '"supplier to {company}"',
+    '"{company}" sourcing procurement',
+    '"{company}" annual report "key suppliers"',
+]
+
+def query_templates_from_env() -> List[str]:
+    """Templates from SEARCH_QUERY_TEMPLATES, separated by ";", each with a {company} placeholder."""
+    raw = os.getenv("SEARCH_QUERY_TEMPLATES", "")
+    templates = [t.strip() for t in raw.split(";") if t.strip()]
+    return templates or list(DEFAULT_QUERY_TEMPLATES)
+
+def plan_queries(company_name: str, templates: Optional[List[str]] = None) -> List[str]:
+    """The distinct search queries to run for a company, in template order."""
+    queries = (t.replace("{company}", company_name) for t in (templates or DEFAULT_QUERY_TEMPLATES))
+    return list(dict.fromkeys(queries))
+
+def merge_query_results(results_per_query: List[List[Dict[str, Any]]], max_results: int) -> List[Dict[str, Any]]:
+    """Merge the results of several queries into one ranked list.
+
+    Results are deduplicated by canonical URL, keeping the first copy seen. They are ranked
+    by how many queries returned the URL, then by the best position any query gave it, then
+    by query order. Each merged result records that count in ``query_count``.
+    """
+
+    merged: Dict[str, Dict[str, Any]] = {}
+    for query_index, results in enumerate(results_per_query):
+        seen_in_query = set()
+        for position, result in enumerate(results):
+            key = canonicalize_url(result.get("link", "")) or f"#{query_index}:{position}"
+            if key in seen_in_query:
+                continue
+            seen_in_query.add(key)
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = {"result": result, "count": 1, "best": position, "first": query_index}
+            else:
+                entry["count"] += 1
+                entry["best"] = min(entry["best"], position)
+
+    ranked = sorted(merged.values(), key=lambda e: (-e["count"], e["best"], e["first"]))
+    return [{**e["result"], "query_count": e["count"]} for e in ranked[:max_results]]
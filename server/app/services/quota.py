@@ -0,0 +1,164 @@
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+# Custom Search allows 100 queries per day on the free tier; the counter resets at
+# midnight Pacific time
+DEFAULT_SEARCH_DAILY_QUOTA = 100
+# Calls kept back from batch jobs so interactive requests still work after a large run
+DEFAULT_INTERACTIVE_RESERVE = 20
+# Below this fraction of the daily quota, each query fetches only its first page
+DEFAULT_LOW_BUDGET_FRACTION = 0.25
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Reasons Google APIs give when the daily quota, not the per-minute rate, is used up
+DAILY_QUOTA_REASONS = ("dailylimitexceeded", "per day")
+
+class QuotaExhaustedError(Exception):
+    """The daily search quota is used up, either by our own count or as reported by the API."""
+
+    def __init__(self, api: str, retry_after: Optional[float] = None):
+        super().__init__(f"{api} daily quota is exhausted")
+        self.api = api
+        self.retry_after = retry_after
+
+def is_daily_quota_error(error: Exception) -> bool:
+    """Whether an API error means the daily quota is spent. Retrying it only wastes time."""
+    status = getattr(getattr(error, "resp", None), "status", None)
+    if status is None or int(status) not in (403, 429):
+        return False
+    content = getattr(error, "content", b"") or b""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="ignore")
+    return any(reason in str(content).lower() for reason in DAILY_QUOTA_REASONS)
+
+class SearchOutcome:
+    """Filled in by a search call. A quota-limited search may be incomplete and must not be cached."""
+
+    def __init__(self):
+        self.quota_limited = False
+
+class QuotaScheduler:
+    """Counts search API calls per quota day and decides how many each request may spend.
+
+    Batch jobs may not use the last ``interactive_reserve`` calls of the day. When the
+    remaining budget falls below ``low_budget_fraction`` of the quota, searches are planned
+    with one page per query, and when it is smaller than the planned calls, with fewer
+    queries. The count is per process; the API's own quota errors mark the day exhausted
+    when several instances share the quota.
+    """
+
+    def __init__(self, daily_limit: int, interactive_reserve: int = DEFAULT_INTERACTIVE_RESERVE,
+                 low_budget_fraction: float = DEFAULT_LOW_BUDGET_FRACTION,
+                 clock: Callable[[], float] = time.time):
+        self.daily_limit = daily_limit
+        self.interactive_reserve = min(interactive_reserve, daily_limit)
+        self.low_budget_fraction = low_budget_fraction
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._day = self._today()
+        self._used = 0
+        self._exhausted = False
+        self._denied = {INTERACTIVE: 0, BATCH: 0}
+        self._degraded = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["QuotaScheduler"]:
+        """Build from SEARCH_DAILY_QUOTA and related variables. Returns None when the quota is 0."""
+        daily_limit = int(os.getenv("SEARCH_DAILY_QUOTA", DEFAULT_SEARCH_DAILY_QUOTA))
+        if daily_limit <= 0:
+            return None
+        return cls(
+            daily_limit,
+            interactive_reserve=int(os.getenv("SEARCH_INTERACTIVE_RESERVE", DEFAULT_INTERACTIVE_RESERVE)),
+            low_budget_fraction=float(os.getenv("SEARCH_LOW_BUDGET_FRACTION", DEFAULT_LOW_BUDGET_FRACTION))
+        )
+
+    def _now(self) -> datetime:
+        return datetime.fromtimestamp(self._clock(), QUOTA_TIMEZONE)
+
+    def _today(self) -> str:
+        return self._now().date().isoformat()
+
+    def _roll_over_locked(self) -> None:
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._used = 0
+            self._exhausted = False
+            self._denied = {INTERACTIVE: 0, BATCH: 0}
+            self._degraded = 0
+
+    def _available_locked(self, priority: str) -> int:
+        if self._exhausted:
+            return 0
+        limit = self.daily_limit if priority == INTERACTIVE else self.daily_limit - self.interactive_reserve
+        return max(0, limit - self._used)
+
+    def available(self, priority: str = INTERACTIVE) -> int:
+        """Calls a request of this priority may still make today."""
+        with self._lock:
+            self._roll_over_locked()
+            return self._available_locked(priority)
+
+    def try_consume(self, priority: str = INTERACTIVE) -> bool:
+        """Take one call from today's budget. False when the priority has none left."""
+        with self._lock:
+            self._roll_over_locked()
+            if self._available_locked(priority) <= 0:
+                self._denied[priority] = self._denied.get(priority, 0) + 1
+                return False
+            self._used += 1
+            return True
+
+    def mark_exhausted(self) -> None:
+        """The API reported the daily quota spent; stop calling it until the quota resets."""
+        with self._lock:
+            self._roll_over_locked()
+            self._exhausted = True
+
+    def plan(self, queries: int, pages_per_query: int, priority: str = INTERACTIVE) -> Tuple[int, int]:
+        """How many queries and pages per query to run for one search, given the budget.
+
+        Cached pages cost nothing, so even a plan the budget cannot cover is returned with at
+        least one query and one page.
+        """
+        with self._lock:
+            self._roll_over_locked()
+            available = self._available_locked(priority)
+            remaining = 0 if self._exhausted else self.daily_limit - self._used
+            planned = (queries, pages_per_query)
+            if remaining < self.daily_limit * self.low_budget_fraction:
+                pages_per_query = 1
+            if queries * pages_per_query > available:
+                pages_per_query = max(1, available // queries)
+                queries = max(1, min(queries, available))
+            if (queries, pages_per_query) != planned:
+                self._degraded += 1
+            return queries, pages_per_query
+
+    def seconds_until_reset(self) -> float:
+        now = self._now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), QUOTA_TIMEZONE)
+        return max(1.0, (midnight - now).total_seconds())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._roll_over_locked()
+            return {
+                "day": self._day,
+                "daily_limit": self.daily_limit,
+                "used": self._used,
+                "remaining": self._available_locked(INTERACTIVE),
+                "remaining_for_batch": self._available_locked(BATCH),
+                "interactive_reserve": self.interactive_reserve,
+                "exhausted": self._exhausted,
+                "denied": dict(self._denied),
+                "degraded_searches": self._degraded
+            }
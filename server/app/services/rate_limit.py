@@ -0,0 +1,233 @@
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Reasons Google APIs attach to 403 responses that are really rate limiting
+THROTTLE_REASONS = ("ratelimitexceeded", "userratelimitexceeded", "quotaexceeded", "resource_exhausted")
+
+# Per-API defaults: sustained requests per second, burst size and starting concurrency.
+# Custom Search allows 100 queries per minute by default.
+DEFAULT_LIMITS = {
+    "vertex_ai": {"rate": 10.0, "burst": 20, "concurrency": 8},
+    "custom_search": {"rate": 1.5, "burst": 5, "concurrency": 4},
+}
+
+class ThrottledError(Exception):
+    """An upstream API kept throttling after all retries were used."""
+
+    def __init__(self, api: str, retry_after: Optional[float] = None):
+        super().__init__(f"{api} is throttling requests")
+        self.api = api
+        self.retry_after = retry_after
+
+def _status_code(error: Exception) -> Optional[int]:
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    resp = getattr(error, "resp", None)
+    status = getattr(resp, "status", None)
+    return int(status) if status is not None else None
+
+def is_throttle_error(error: Exception) -> bool:
+    """Whether an exception from Vertex AI, Custom Search or requests means "slow down"."""
+    if isinstance(error, ThrottledError):
+        return True
+    status = _status_code(error)
+    if status == 429:
+        return True
+    if status == 403:
+        content = getattr(error, "content", b"") or b""
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", errors="ignore")
+        return any(reason in str(content).lower() for reason in THROTTLE_REASONS)
+    return False
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read a Retry-After header (seconds or HTTP date) from an upstream error, if present."""
+    headers = None
+    resp = getattr(error, "resp", None)
+    if resp is not None:
+        headers = resp
+    response = getattr(error, "response", None)
+    if headers is None and response is not None:
+        headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, holding at most ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available. Returns 0, or the seconds to wait for the next token."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    Each success raises the limit by roughly one per window of ``limit`` calls, and each
+    throttle halves it, so in-flight calls settle just under what the upstream accepts.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 64, decrease_factor: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self) -> None:
+        with self._condition:
+            self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+            self._condition.notify()
+
+    def on_throttle(self) -> None:
+        with self._condition:
+            self.limit = max(self.minimum, self.limit * self.decrease_factor)
+
+class RateLimiter:
+    """Client-side limiter for one upstream API: token bucket, AIMD concurrency and
+    jittered retries that honour Retry-After.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, concurrency: int,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 30.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AIMDLimiter(concurrency, maximum=max(concurrency * 4, concurrency))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "throttled": 0, "retries": 0, "exhausted": 0, "wait_seconds": 0.0}
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def _wait_for_token(self) -> None:
+        while True:
+            wait = self.bucket.try_acquire()
+            if wait <= 0:
+                return
+            self._count("wait_seconds", wait)
+            self._sleep(wait)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps retrying clients from synchronising
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call fn under the limiter, retrying throttling errors. Other errors propagate unchanged."""
+        retry_after = None
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_token()
+            self.concurrency.acquire()
+            try:
+                self._count("calls")
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_throttle_error(e):
+                    raise
+                self._count("throttled")
+                self.concurrency.on_throttle()
+                retry_after = retry_after_seconds(e)
+            else:
+                self.concurrency.on_success()
+                return result
+            finally:
+                self.concurrency.release()
+
+            if attempt < self.max_retries:
+                delay = min(self.max_delay, retry_after) if retry_after is not None else self._backoff(attempt)
+                self._count("retries")
+                self._count("wait_seconds", delay)
+                self._sleep(delay)
+
+        self._count("exhausted")
+        raise ThrottledError(self.name, retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["concurrency_limit"] = round(self.concurrency.limit, 2)
+        stats["in_flight"] = self.concurrency.in_flight
+        return stats
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """Return the process-wide limiter for an API, configured from <NAME>_RATE_LIMIT_* variables."""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                defaults = DEFAULT_LIMITS.get(name, {"rate": 5.0, "burst": 10, "concurrency": 4})
+                prefix = f"{name.upper()}_RATE_LIMIT"
+                limiter = RateLimiter(
+                    name,
+                    rate=float(os.getenv(f"{prefix}_QPS", defaults["rate"])),
+                    burst=int(os.getenv(f"{prefix}_BURST", defaults["burst"])),
+                    concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", defaults["concurrency"])),
+                    max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", 4)),
+                )
+                _limiters[name] = limiter
+    return limiter
+
+def rate_limiter_stats() -> Dict[str, Any]:
+    """Throttling metrics for every limiter created so far."""
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
+
+def reset_rate_limiters() -> None:
+    with _limiters_lock:
+        _limiters.clear()
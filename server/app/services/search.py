@@ -1,58 +1,251 @@
+import logging
 import os
-import requests
-from typing import List, Dict, Any
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from app.config import MAX_SEARCH_RESULTS
+from app.services.fetcher import get_document_fetcher
+from app.services.query_planner import (
+    DEFAULT_QUERY_TEMPLATES, merge_query_results, plan_queries, query_templates_from_env
+)
+from app.services.providers import ReplaySearchProvider, search_provider_from_env
+from app.services.quota import (
+    INTERACTIVE, QuotaExhaustedError, QuotaScheduler, SearchOutcome, is_daily_quota_error
+)
+from app.services.rate_limit import ThrottledError, get_rate_limiter
+from app.services.search_cache import SearchCache
+from app.utils.metrics import SEARCH_CALLS
+from app.utils.tokens import truncate_to_budget
+from app.utils.result_dedup import DomainDiversifier
+from app.utils.tracing import span, submit_in_context
+from app.utils.urls import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on fetched document text; extraction chunks it to the per-call budget
+DOCUMENT_TOKEN_LIMIT = 12_000
+
+RESULTS_PER_PAGE = 10
+# At most this many results per site; the rest only backfill a search short of results
+DEFAULT_MAX_RESULTS_PER_DOMAIN = 3
+# Extra page rounds a lazy search may fetch to replace results held back by the site cap
+DEFAULT_DOMAIN_BACKFILL_PAGES = 1
+
+_SEARCH_OK = SEARCH_CALLS.labels("ok")
+_SEARCH_ERRORS = SEARCH_CALLS.labels("error")
+_SEARCH_QUOTA_EXHAUSTED = SEARCH_CALLS.labels("quota_exhausted")
 
 class GoogleSearchService:
+    search_cache: Optional[SearchCache] = None
+    query_templates: List[str] = DEFAULT_QUERY_TEMPLATES
+    quota_scheduler: Optional[QuotaScheduler] = None
+    # Record or replay provider at the raw API call; None calls the API directly
+    search_provider = None
+    max_results_per_domain = DEFAULT_MAX_RESULTS_PER_DOMAIN
+    domain_backfill_pages = DEFAULT_DOMAIN_BACKFILL_PAGES
+
     def __init__(self):
         self.api_key = os.getenv("CUSTOM_SEARCH_API_KEY")
         self.search_engine_id = os.getenv("CUSTOM_SEARCH_ENGINE_ID")
         
-        if not self.api_key or not self.search_engine_id:
+        # Replay answers from a recording, so it needs no credentials
+        self.search_provider = search_provider_from_env(self._live_search)
+        if not isinstance(self.search_provider, ReplaySearchProvider) and not (self.api_key and self.search_engine_id):
             raise ValueError("CUSTOM_SEARCH_API_KEY and CUSTOM_SEARCH_ENGINE_ID must be set")
+        self.search_cache = SearchCache.from_env()
+        self.query_templates = query_templates_from_env()
+        self.quota_scheduler = QuotaScheduler.from_env()
+        self.max_results_per_domain = int(os.getenv("SEARCH_MAX_RESULTS_PER_DOMAIN", DEFAULT_MAX_RESULTS_PER_DOMAIN))
+        self.domain_backfill_pages = int(os.getenv("SEARCH_DOMAIN_BACKFILL_PAGES", DEFAULT_DOMAIN_BACKFILL_PAGES))
+    
+    def search_company_suppliers(self, company_name: str, max_results: int = MAX_SEARCH_RESULTS,
+                                 priority: str = INTERACTIVE,
+                                 outcome: Optional[SearchOutcome] = None) -> List[Dict[str, Any]]:
+        """Search for web documents mentioning the company and potential suppliers. Fetch up to max_results results.
+
+        Runs iter_search_pages to completion: query variants, one per page of results
+        wanted, are searched concurrently, results are merged by canonical URL, ranked by
+        how many queries found them and capped per site. When the daily quota is low the search runs fewer pages or
+        queries; ``outcome`` then records that the result is quota-limited.
+        """
+        return [result for page in self.iter_search_pages(company_name, max_results, priority, outcome)
+                for result in page]
     
-    def search_company_suppliers(self, company_name: str, max_results: int = MAX_SEARCH_RESULTS) -> List[Dict[str, Any]]:
-        """Search for web documents mentioning the company and potential suppliers. Fetch up to max_results results."""
-        try:
-            service = build("customsearch", "v1", developerKey=self.api_key)
-            query = f'"{company_name}" suppliers vendors partners supply chain'
-            search_results = []
-            results_per_page = 10
-            total_to_fetch = max_results
-            for start in range(1, total_to_fetch + 1, results_per_page):
-                result = service.cse().list(
-                    q=query,
-                    cx=self.search_engine_id,
-                    num=results_per_page,
-                    start=start
-                ).execute()
-                for item in result.get("items", []):
-                    search_results.append({
-                        "title": item.get("title", ""),
-                        "snippet": item.get("snippet", ""),
-                        "link": item.get("link", ""),
-                        "displayLink": item.get("displayLink", "")
-                    })
-                if len(search_results) >= total_to_fetch or not result.get("items"):
+    def iter_search_pages(self, company_name: str, max_results: int = MAX_SEARCH_RESULTS,
+                          priority: str = INTERACTIVE,
+                          outcome: Optional[SearchOutcome] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Lazily yield pages of up to RESULTS_PER_PAGE ranked search results.
+
+        Results are fetched in rounds: round n fetches page n of every planned query variant
+        concurrently and merges it like search_company_suppliers. Its URLs not yielded
+        before are yielded in pages, up to max_results in total. The next round is only
+        fetched when those fell short of max_results and the previous round was consumed,
+        so a filled request or a caller that stops iterating spends no further quota.
+
+        Results over the per-site cap are held back. Up to domain_backfill_pages extra
+        rounds are fetched to replace them, only when some were held back, and any still
+        needed are yielded last.
+        """
+        outcome = outcome if outcome is not None else SearchOutcome()
+        queries, pages_per_query = self._plan_search(company_name, max_results, priority, outcome)
+        seen = set()
+        yielded = 0
+        throttled = None
+        diversifier = DomainDiversifier(self.max_results_per_domain)
+        # Backfill rounds are skipped when the quota already limits the search
+        backfill_pages = 0 if outcome.quota_limited else self.domain_backfill_pages
+
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            for page in range(pages_per_query + backfill_pages):
+                if page >= pages_per_query and not diversifier.overflow:
                     break
-            return search_results[:total_to_fetch]
-        except HttpError as e:
-            print(f"Google Search API error: {e}")
-            return []
-        except Exception as e:
-            print(f"Search error: {e}")
-            return []
+                start = 1 + page * RESULTS_PER_PAGE
+                futures = [submit_in_context(executor, self._search_page, query, start, RESULTS_PER_PAGE, priority)
+                           for query in queries]
+                round_results = []
+                active = []
+                for query, future in zip(queries, futures):
+                    try:
+                        items = future.result()
+                    except QuotaExhaustedError:
+                        outcome.quota_limited = True
+                        continue
+                    except ThrottledError as e:
+                        throttled = e
+                        continue
+                    except Exception as e:
+                        logger.warning("Search error for query %r: %s", query, e)
+                        continue
+                    round_results.append(items)
+                    # A short page is the query's last
+                    if len(items) == RESULTS_PER_PAGE:
+                        active.append(query)
+
+                fresh = []
+                for result in merge_query_results(round_results, RESULTS_PER_PAGE * len(queries)):
+                    key = canonicalize_url(result.get("link", ""))
+                    if key and key in seen:
+                        continue
+                    seen.add(key)
+                    fresh.append(result)
+                # Admitted results past max_results stay with the diversifier: their URLs are
+                # already seen, so no later round could return them
+                fresh = diversifier.admit(fresh, max_results - yielded)
+                for page_results in self._pages(fresh):
+                    yielded += len(page_results)
+                    yield page_results
+
+                queries = active
+                if yielded >= max_results or not queries:
+                    break
+
+        for page_results in self._pages(diversifier.backfill(max_results - yielded)):
+            yielded += len(page_results)
+            yield page_results
+
+        if not yielded:
+            self._raise_if_unavailable(outcome, throttled)
+    
+    @staticmethod
+    def _pages(results: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        for offset in range(0, len(results), RESULTS_PER_PAGE):
+            yield results[offset:offset + RESULTS_PER_PAGE]
+    
+    def _plan_search(self, company_name: str, max_results: int, priority: str,
+                     outcome: SearchOutcome) -> Tuple[List[str], int]:
+        """The queries to run and the pages to fetch for each, within the daily quota."""
+        pages_per_query = max(1, math.ceil(max_results / RESULTS_PER_PAGE))
+        # A round of n variants returns up to n pages, so a small request only needs the first
+        # variants; rounds past the first are fetched only while the request is short
+        queries = plan_queries(company_name, self.query_templates)[:pages_per_query]
+        if self.quota_scheduler:
+            planned_queries, planned_pages = self.quota_scheduler.plan(len(queries), pages_per_query, priority)
+            if (planned_queries, planned_pages) != (len(queries), pages_per_query):
+                outcome.quota_limited = True
+            queries = queries[:planned_queries]
+            pages_per_query = planned_pages
+        return queries, pages_per_query
+    
+    def _raise_if_unavailable(self, outcome: SearchOutcome, throttled: Optional[ThrottledError]) -> None:
+        """For a search that found nothing: raise if that was down to quota or throttling.
+
+        Partial results are still useful, but if every query was throttled or out of quota
+        the caller must not mistake that for a company with no suppliers.
+        """
+        if outcome.quota_limited:
+            retry_after = self.quota_scheduler.seconds_until_reset() if self.quota_scheduler else None
+            raise QuotaExhaustedError("custom_search", retry_after)
+        if throttled:
+            raise throttled
+    
+    def _search_page(self, query: str, start: int, num: int,
+                     priority: str = INTERACTIVE) -> List[Dict[str, Any]]:
+        """One page of results, from the search cache when the same page was fetched before.
+
+        Only pages that reach the API count against the daily quota.
+        """
+        with span("search.page", start=start, cached=False) as page_span:
+            cache_key = SearchCache.make_key(self.search_engine_id, query, start, num) if self.search_cache else None
+            if cache_key:
+                cached = self.search_cache.get(cache_key)
+                if cached is not None:
+                    if page_span:
+                        page_span.set_attribute("cached", True)
+                    return cached
+
+            if self.quota_scheduler and not self.quota_scheduler.try_consume(priority):
+                raise QuotaExhaustedError("custom_search", self.quota_scheduler.seconds_until_reset())
+
+            def execute():
+                try:
+                    if self.search_provider:
+                        response = self.search_provider.search(query, start, num)
+                    else:
+                        response = self._live_search(query, start, num)
+                except HttpError as e:
+                    # A spent daily quota is not retried like per-minute throttling
+                    if is_daily_quota_error(e):
+                        _SEARCH_QUOTA_EXHAUSTED.inc()
+                        if self.quota_scheduler:
+                            self.quota_scheduler.mark_exhausted()
+                        raise QuotaExhaustedError("custom_search") from e
+                    _SEARCH_ERRORS.inc()
+                    raise
+                except Exception:
+                    _SEARCH_ERRORS.inc()
+                    raise
+                _SEARCH_OK.inc()
+                return response
+
+            result = get_rate_limiter("custom_search").call(execute)
+            if page_span:
+                page_span.set_attribute("results", len(result.get("items", [])))
+            items = [{
+                "title": item.get("title", ""),
+                "snippet": item.get("snippet", ""),
+                "link": item.get("link", ""),
+                "displayLink": item.get("displayLink", "")
+            } for item in result.get("items", [])]
+
+            # Only successful responses reach this point, so errors are never cached
+            if cache_key:
+                self.search_cache.set(cache_key, items)
+            return items
+    
+    def _live_search(self, query: str, start: int, num: int) -> Dict[str, Any]:
+        """The raw Custom Search API response for one page."""
+        # The API client is not thread-safe, so every call builds its own
+        service = build("customsearch", "v1", developerKey=self.api_key)
+        return service.cse().list(q=query, cx=self.search_engine_id, num=num, start=start).execute()
     
     def get_document_content(self, url: str) -> str:
-        """Fetch document content from URL (simplified - in production, use proper web scraping)"""
-        try:
-            response = requests.get(url, timeout=10, headers={
-                "User-Agent": "Mozilla/5.0 (compatible; LazyLogistics/1.0)"
-            })
-            response.raise_for_status()
-            return response.text[:5000]  # Limit content length
-        except Exception as e:
-            print(f"Error fetching content from {url}: {e}")
-            return "" 
\ No newline at end of file
+        """Fetch a result page as plain text, capped to the document token limit."""
+        # Cut on a sentence boundary rather than mid-word or mid-name
+        return truncate_to_budget(get_document_fetcher().fetch(url), DOCUMENT_TOKEN_LIMIT)
+    
+    def get_documents(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Fetch several result pages concurrently. Returns url -> text."""
+        documents = get_document_fetcher().fetch_all(urls)
+        return {url: truncate_to_budget(text, DOCUMENT_TOKEN_LIMIT) for url, text in documents.items()}
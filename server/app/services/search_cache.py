@@ -0,0 +1,62 @@
+import logging
+import os
+import json
+import hashlib
+from typing import List, Dict, Any, Optional
+
+from app.utils.local_cache import SqliteCache
+from app.utils.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_CACHE_PATH = "cache/search_cache.sqlite3"
+DEFAULT_SEARCH_CACHE_MAX_ENTRIES = 20_000
+DEFAULT_SEARCH_CACHE_TTL_DAYS = 7
+
+_HITS = CACHE_LOOKUPS.labels("search", "hit")
+_MISSES = CACHE_LOOKUPS.labels("search", "miss")
+
+class SearchCache:
+    """Persistent cache of Custom Search result pages keyed on (engine, query, start, num).
+
+    It sits below the final result cache: when that expires, or a run changes only
+    deduplication or ignore settings, the same search pages are replayed from here instead
+    of spending Custom Search quota. Every hit is one API call saved.
+    """
+
+    def __init__(self, store: SqliteCache):
+        self.store = store
+
+    @classmethod
+    def from_env(cls) -> Optional["SearchCache"]:
+        """Build from SEARCH_CACHE_* variables. Returns None when SEARCH_CACHE_PATH is empty."""
+        path = os.getenv("SEARCH_CACHE_PATH", DEFAULT_SEARCH_CACHE_PATH)
+        if not path:
+            return None
+        try:
+            return cls(SqliteCache(
+                path,
+                max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", DEFAULT_SEARCH_CACHE_MAX_ENTRIES)),
+                ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_DAYS", DEFAULT_SEARCH_CACHE_TTL_DAYS)) * 86400
+            ))
+        except Exception as e:
+            logger.warning("Search cache disabled: %s", e)
+            return None
+
+    @staticmethod
+    def make_key(engine_id: str, query: str, start: int, num: int) -> str:
+        payload = json.dumps([engine_id or "", query, int(start), int(num)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        items = self.store.get(key)
+        (_MISSES if items is None else _HITS).inc()
+        return items
+
+    def set(self, key: str, items: List[Dict[str, Any]]) -> None:
+        self.store.set(key, items)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.store.stats()
+        stats["quota_calls_saved"] = stats["hits"]
+        return stats
@@ -0,0 +1,96 @@
+import logging
+import os
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from app.utils.cache_keys import get_canonical_name_memo, load_canonical_name_memo
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_PATH = "snapshots/cache_snapshot.json"
+
+def snapshot_path() -> Optional[Path]:
+    """Where the warm-start snapshot lives. Set CACHE_SNAPSHOT_PATH to an empty string to disable.
+
+    To survive a redeploy the path must be on storage that outlives the container, e.g. a
+    mounted volume.
+    """
+    path = os.getenv("CACHE_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+    return Path(path) if path else None
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+def build_snapshot(storage_service: Any, config: Any) -> Dict[str, Any]:
+    """Collect the hot cache entries, ignore list and canonical-name memo."""
+    return {
+        "version": SNAPSHOT_VERSION,
+        "created_at": datetime.now(timezone.utc),
+        "cache_entries": [list(item) for item in storage_service.memory_cache.items()],
+        "ignore_list": sorted(config.get_ignored_suppliers()),
+        "canonical_names": get_canonical_name_memo(),
+    }
+
+def export_snapshot(path: Path, storage_service: Any, config: Any) -> int:
+    """Write a snapshot atomically. Returns the number of cache entries written."""
+    snapshot = build_snapshot(storage_service, config)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, default=_encode, separators=(",", ":"))
+    os.replace(temp_path, path)
+    return len(snapshot["cache_entries"])
+
+def read_snapshot(path: Path) -> Optional[Dict[str, Any]]:
+    """Read a snapshot, or None if there is none."""
+    if not path.exists():
+        return None
+    raw = path.read_bytes()
+    if not raw:
+        return None
+    snapshot = json.loads(raw, object_hook=_decode)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        logger.warning("Ignoring snapshot with unsupported version %s", snapshot.get('version'))
+        return None
+    return snapshot
+
+def restore_snapshot(snapshot: Dict[str, Any], storage_service: Any, config: Any) -> int:
+    """Load a snapshot back into the in-process state. Returns the number of cache entries restored.
+
+    Entries keep their original memory-tier insertion time, so a restart does not extend
+    how long they are served from memory; expired ones are skipped. The snapshot's ignore
+    list is only used when it is newer than the ignore list file, so edits made to the
+    file between runs win.
+    """
+    policy = storage_service.cache_policy
+    now = datetime.now(timezone.utc)
+    restored = 0
+    for key, entry, *rest in snapshot.get("cache_entries", []):
+        # Snapshots written before insertion times were recorded fall back to the entry's timestamp
+        inserted_at = rest[0] if rest else entry.get("timestamp") or now
+        if policy.is_expired(entry, now) or now - inserted_at > policy.memory_ttl:
+            continue
+        storage_service.memory_cache.set(key, entry, inserted_at=inserted_at)
+        restored += 1
+
+    ignore_file = Path(config.ignore_list_file)
+    created_at = snapshot.get("created_at")
+    file_is_older = (
+        not ignore_file.exists()
+        or (created_at and datetime.fromtimestamp(ignore_file.stat().st_mtime, timezone.utc) < created_at)
+    )
+    if file_is_older and snapshot.get("ignore_list"):
+        config.load_ignored_suppliers(snapshot["ignore_list"])
+
+    load_canonical_name_memo(snapshot.get("canonical_names", {}))
+    return restored
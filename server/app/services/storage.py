@@ -1,20 +1,54 @@
+import logging
 import os
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterable
 from google.cloud import firestore
+from app.config import MAX_SEARCH_RESULTS
+from app.utils.cache_keys import build_cache_key, canonicalize_company_name
+from app.services.clients import get_firestore_client
+from app.services.cache import CachePolicy, CacheMetrics, MemoryCache, select_store_evictions
+
+logger = logging.getLogger(__name__)
+
+# Firestore rejects write batches with more than 500 operations
+MAX_BATCH_WRITES = 500
+DEFAULT_DELETE_WORKERS = 8
+
+# Check the persistent cache against its size limits once every this many writes
+STORE_EVICTION_INTERVAL = 100
+# Write buffered cache access times to Firestore once this many entries have been read
+ACCESS_FLUSH_THRESHOLD = MAX_BATCH_WRITES
 
 class FirestoreService:
-    def __init__(self):
+    def __init__(self, client: Optional[firestore.Client] = None):
         self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
-        if not self.project_id:
+        if not self.project_id and client is None:
             raise ValueError("GOOGLE_CLOUD_PROJECT must be set")
         
-        self.db = firestore.Client(project=self.project_id)
+        # Share one client (and its gRPC channel) across every service in the process
+        self.db = client or get_firestore_client(self.project_id)
         self.extractions_collection = self.db.collection("supplier_extractions")
         self.cache_collection = self.db.collection("cache")
+        self._init_cache_tiers()
+    
+    def _init_cache_tiers(self, policy: Optional[CachePolicy] = None) -> None:
+        """Set up the cache policy, metrics and in-memory tier in front of Firestore."""
+        self.cache_policy = policy or CachePolicy.from_env()
+        self.cache_metrics = CacheMetrics()
+        self.memory_cache = MemoryCache(self.cache_policy, self.cache_metrics)
+        # itertools.count is advanced atomically, so concurrent writes never skip an eviction trigger
+        self._cache_writes = itertools.count(1)
+        self._eviction_lock = threading.Lock()
+        # Last access time per cache key, not yet written to Firestore
+        self._pending_accesses: Dict[str, datetime] = {}
+        self._access_lock = threading.Lock()
     
     def store_extraction_result(self, company_name: str, suppliers: List[Dict[str, Any]], 
-                              processing_time: float, search_results: List[Dict[str, Any]]) -> str:
+                              processing_time: float, search_results: List[Dict[str, Any]],
+                              token_usage: Optional[Dict[str, Any]] = None) -> str:
         """Store extraction result in Firestore for audit trail."""
         
         doc_data = {
@@ -24,41 +58,213 @@ class FirestoreService:
             "processing_time": processing_time,
             "search_results_count": len(search_results),
             "timestamp": datetime.now(timezone.utc),
-            "search_results": search_results
+            "search_results": search_results,
+            "token_usage": token_usage
         }
         
         doc_ref = self.extractions_collection.add(doc_data)
         return doc_ref[1].id
     
-    def get_cached_result(self, company_name: str) -> Optional[Dict[str, Any]]:
-        """Get cached extraction result for a company."""
+    def get_cached_result(self, company_name: str, max_results: int = MAX_SEARCH_RESULTS,
+                          deep: bool = False) -> Optional[Dict[str, Any]]:
+        """Get cached extraction result for a company.
         
-        # Check if we have a recent cache entry (within 24 hours)
-        cache_doc = self.cache_collection.document(company_name.lower()).get()
+        Checks the in-memory tier first, then Firestore. An entry built from at least
+        ``max_results`` search results can answer the request; suppliers found only beyond
+        the first ``max_results`` results are dropped. Deep-mode results are cached separately.
+        """
         
-        if cache_doc.exists:
+        cache_key = build_cache_key(company_name, deep=deep or None)
+
+        def answers_request(entry: Dict[str, Any]) -> bool:
+            return entry.get("max_results", MAX_SEARCH_RESULTS) >= max_results
+
+        cache_data = self.memory_cache.get(cache_key, answers_request)
+        if cache_data is None:
+            if self.memory_cache.peek(cache_key) is not None:
+                # Held in memory but built from fewer search results; Firestore has the same entry
+                return None
+            cache_doc = self.cache_collection.document(cache_key).get()
+            if not cache_doc.exists:
+                self.cache_metrics.record("firestore", "misses")
+                return None
+            
             cache_data = cache_doc.to_dict()
-            cache_time = cache_data.get("timestamp")
+            if self.cache_policy.is_expired(cache_data):
+                self.cache_metrics.record("firestore", "expirations")
+                self.cache_metrics.record("firestore", "misses")
+                return None
+            if not answers_request(cache_data):
+                self.cache_metrics.record("firestore", "misses")
+                return None
             
-            # Check if cache is still valid (24 hours)
-            if cache_time and (datetime.now(timezone.utc) - cache_time).days < 1:
-                return cache_data
+            self.cache_metrics.record("firestore", "hits")
+            self.memory_cache.set(cache_key, cache_data)
         
-        return None
+        self._record_access(cache_key)
+        cached_max_results = cache_data.get("max_results", MAX_SEARCH_RESULTS)
+        if cached_max_results > max_results and cache_data.get("source_links"):
+            return self._trim_cached_result(cache_data, max_results)
+        return cache_data
+    
+    def _trim_cached_result(self, cache_data: Dict[str, Any], max_results: int) -> Dict[str, Any]:
+        """Restrict a cached result to suppliers found within the first max_results search results."""
+        
+        allowed_links = set(cache_data["source_links"][:max_results])
+        suppliers = [
+            s for s in cache_data.get("suppliers", [])
+            if allowed_links.intersection([s.get("source_url")] + (s.get("source_urls") or []))
+        ]
+        return {
+            **cache_data,
+            "suppliers": suppliers,
+            "total_suppliers": len(suppliers),
+            "max_results": max_results
+        }
     
     def cache_result(self, company_name: str, suppliers: List[Dict[str, Any]], 
-                    processing_time: float) -> None:
-        """Cache extraction result for faster future access."""
+                    processing_time: float, max_results: int = MAX_SEARCH_RESULTS,
+                    source_links: Optional[List[str]] = None, deep: bool = False) -> None:
+        """Cache extraction result for faster future access.
         
+        ``source_links`` is the ordered list of search result URLs the suppliers came from,
+        which lets the entry answer later requests for fewer results.
+        """
+        
+        cache_key = build_cache_key(company_name, deep=deep or None)
+        doc_ref = self.cache_collection.document(cache_key)
+        
+        previous_entry = None
+        if self.cache_policy.adaptive_ttl:
+            # The memory tier usually holds the previous entry; read Firestore only when it does not
+            previous_entry = self.memory_cache.peek(cache_key)
+            if previous_entry is None:
+                previous_doc = doc_ref.get()
+                previous_entry = previous_doc.to_dict() if previous_doc.exists else None
+        ttl, stability = self.cache_policy.ttl_for(suppliers, previous_entry)
+        
+        now = datetime.now(timezone.utc)
         cache_data = {
             "company_name": company_name,
+            "canonical_name": canonicalize_company_name(company_name),
+            "max_results": max_results,
+            "source_links": source_links or [],
             "suppliers": suppliers,
             "total_suppliers": len(suppliers),
             "processing_time": processing_time,
-            "timestamp": datetime.now(timezone.utc)
+            "timestamp": now,
+            "last_accessed": now,
+            "ttl_seconds": int(ttl.total_seconds()),
+            "expires_at": now + ttl,
+            "stability": stability
         }
+        cache_data["size_bytes"] = self.cache_policy.entry_size(cache_data)
+        
+        doc_ref.set(cache_data)
+        self.memory_cache.set(cache_key, cache_data)
+        
+        if next(self._cache_writes) % STORE_EVICTION_INTERVAL == 0 and self._has_store_limits():
+            threading.Thread(target=self.evict_cache_entries, daemon=True).start()
+    
+    def _record_access(self, cache_key: str) -> None:
+        """Note a cache hit for least-recently-used eviction, without a Firestore write on the read path."""
+        with self._access_lock:
+            self._pending_accesses[cache_key] = datetime.now(timezone.utc)
+            flush = len(self._pending_accesses) >= ACCESS_FLUSH_THRESHOLD
+        if flush:
+            threading.Thread(target=self.flush_cache_accesses, daemon=True).start()
+    
+    def flush_cache_accesses(self) -> int:
+        """Write buffered access times to Firestore in batches. Returns the number of entries updated."""
+        
+        with self._access_lock:
+            pending, self._pending_accesses = self._pending_accesses, {}
+        items = list(pending.items())
+        updated = 0
+        for i in range(0, len(items), MAX_BATCH_WRITES):
+            chunk = items[i:i + MAX_BATCH_WRITES]
+            batch = self.db.batch()
+            for cache_key, accessed in chunk:
+                batch.update(self.cache_collection.document(cache_key), {"last_accessed": accessed})
+            try:
+                batch.commit()
+                updated += len(chunk)
+            except Exception as e:
+                # Usually an entry deleted since it was read; recency is only a hint for eviction
+                logger.warning("Failed to record %d cache accesses: %s", len(chunk), e)
+        return updated
+    
+    def _has_store_limits(self) -> bool:
+        return self.cache_policy.store_max_entries is not None or self.cache_policy.store_max_bytes is not None
+    
+    def evict_cache_entries(self) -> Dict[str, int]:
+        """Remove expired Firestore cache entries, then least-recently-used ones beyond the size limits."""
+        
+        if not self._eviction_lock.acquire(blocking=False):
+            return {"expired": 0, "evicted": 0}
+        try:
+            # Recency must be current before least-recently-used entries are chosen
+            self.flush_cache_accesses()
+            expired, evicted = select_store_evictions(self.list_cache_entries(), self.cache_policy)
+            self.delete_documents(e["reference"] for e in expired + evicted)
+            for entry in expired + evicted:
+                self.memory_cache.delete(entry["id"])
+            self.cache_metrics.record("firestore", "expirations", len(expired))
+            self.cache_metrics.record("firestore", "evictions", len(evicted))
+            return {"expired": len(expired), "evicted": len(evicted)}
+        except Exception as e:
+            logger.warning("Cache eviction failed: %s", e)
+            return {"expired": 0, "evicted": 0}
+        finally:
+            self._eviction_lock.release()
+    
+    def get_cache_metrics(self) -> Dict[str, Any]:
+        """Hit, miss, expiry and eviction counts per cache tier."""
+        return {
+            "tiers": self.cache_metrics.snapshot(),
+            "memory_entries": len(self.memory_cache),
+            "memory_bytes": self.memory_cache.size_bytes
+        }
+    
+    def list_cache_entries(self) -> List[Dict[str, Any]]:
+        """List cache entries with only the fields needed for eviction decisions."""
+        
+        # Project away the supplier payloads so large caches stream quickly
+        docs = self.cache_collection.select(
+            ["timestamp", "last_accessed", "expires_at", "size_bytes"]
+        ).stream()
+        entries = []
+        for doc in docs:
+            data = doc.to_dict() or {}
+            entries.append({
+                "id": doc.id,
+                "reference": doc.reference,
+                "timestamp": data.get("timestamp"),
+                "last_accessed": data.get("last_accessed") or data.get("timestamp"),
+                "expires_at": data.get("expires_at"),
+                "size_bytes": data.get("size_bytes")
+            })
+        return entries
+    
+    def delete_documents(self, doc_refs: Iterable[Any], batch_size: int = MAX_BATCH_WRITES,
+                         max_workers: int = DEFAULT_DELETE_WORKERS) -> int:
+        """Delete documents using batched writes committed by parallel workers."""
+        
+        batch_size = max(1, min(batch_size, MAX_BATCH_WRITES))
+        refs = list(doc_refs)
+        chunks = [refs[i:i + batch_size] for i in range(0, len(refs), batch_size)]
+        if not chunks:
+            return 0
+        
+        def commit_chunk(chunk: List[Any]) -> int:
+            batch = self.db.batch()
+            for ref in chunk:
+                batch.delete(ref)
+            batch.commit()
+            return len(chunk)
         
-        self.cache_collection.document(company_name.lower()).set(cache_data)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+            return sum(executor.map(commit_chunk, chunks))
     
     def get_extraction_history(self, company_name: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get extraction history for a company."""
@@ -80,5 +286,6 @@ class FirestoreService:
         return {
             "total_extractions": total_extractions,
             "total_cached_companies": total_cached,
+            "cache": self.get_cache_metrics(),
             "timestamp": datetime.now(timezone.utc)
         } 
\ No newline at end of file
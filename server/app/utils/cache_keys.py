@@ -0,0 +1,68 @@
+import re
+from typing import Dict, Any
+
+# Bump when a change to the pipeline makes existing cache entries incomparable
+CACHE_KEY_VERSION = 1
+
+# Legal-form and grouping words that do not change which company is meant
+COMPANY_NAME_SUFFIXES = {
+    "plc", "ltd", "limited", "inc", "incorporated", "corp", "corporation",
+    "llc", "llp", "co", "company", "group", "holdings", "gmbh", "ag", "sa",
+    "nv", "bv", "pty", "uk"
+}
+
+MAX_CANONICAL_NAME_MEMO = 10_000
+
+# Memo of raw name -> canonical name. Kept as a plain dict so it can be exported and reloaded.
+_canonical_names: Dict[str, str] = {}
+
+def canonicalize_company_name(company_name: str) -> str:
+    """Normalize a company name so trivial variants share a cache entry.
+
+    "Tesco", "Tesco PLC" and "tesco " all canonicalize to "tesco".
+    """
+
+    cached = _canonical_names.get(company_name)
+    if cached is not None:
+        return cached
+
+    normalized = company_name.lower()
+    normalized = normalized.replace("&", " and ")
+    normalized = re.sub(r"[^\w\s]", " ", normalized)
+    words = normalized.split()
+
+    if len(words) > 1 and words[0] == "the":
+        words = words[1:]
+
+    # Strip trailing legal suffixes, but never the whole name
+    while len(words) > 1 and words[-1] in COMPANY_NAME_SUFFIXES:
+        words = words[:-1]
+
+    canonical = "_".join(words)
+    if len(_canonical_names) >= MAX_CANONICAL_NAME_MEMO:
+        _canonical_names.clear()
+    _canonical_names[company_name] = canonical
+    return canonical
+
+def build_cache_key(company_name: str, **params: Any) -> str:
+    """Build the cache key for a company and the request parameters that change the result.
+
+    ``max_results`` is deliberately not part of the key: an entry built from more search
+    results can answer a request for fewer, so it is stored on the entry instead.
+    """
+
+    parts = [canonicalize_company_name(company_name), f"v{CACHE_KEY_VERSION}"]
+    for name in sorted(params):
+        value = params[name]
+        if value is None:
+            continue
+        parts.append(f"{name}-{str(value).lower()}")
+    return "__".join(parts)
+
+def get_canonical_name_memo() -> Dict[str, str]:
+    """Return a copy of the canonical-name memo."""
+    return dict(_canonical_names)
+
+def load_canonical_name_memo(memo: Dict[str, str]) -> None:
+    """Seed the canonical-name memo, e.g. from a snapshot."""
+    _canonical_names.update(memo)
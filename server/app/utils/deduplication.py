@@ -1,14 +1,22 @@
-from typing import List, Dict, Any
+import logging
+from typing import List, Dict, Any, Optional
 from fuzzywuzzy import fuzz
 import re
 from app.config import config
 
+logger = logging.getLogger(__name__)
+
 class SupplierDeduplicator:
     def __init__(self, similarity_threshold: float = 80.0):
         self.similarity_threshold = similarity_threshold
     
-    def deduplicate_suppliers(self, suppliers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Deduplicate suppliers using fuzzy string matching and ignore list filtering."""
+    def deduplicate_suppliers(self, suppliers: List[Dict[str, Any]],
+                              group_sizes: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """Deduplicate suppliers using fuzzy string matching and ignore list filtering.
+        
+        If given, ``group_sizes`` is filled with the number of mentions merged into each
+        returned supplier.
+        """
         
         if not suppliers:
             return []
@@ -19,7 +27,7 @@ class SupplierDeduplicator:
             if not config.is_supplier_ignored(supplier["name"]):
                 filtered_suppliers.append(supplier)
             else:
-                print(f"[DEBUG] Ignoring supplier: {supplier['name']}")
+                logger.debug("Ignoring supplier: %s", supplier["name"])
         
         if not filtered_suppliers:
             return []
@@ -41,6 +49,8 @@ class SupplierDeduplicator:
         for group in grouped_suppliers:
             merged_supplier = self._merge_supplier_group(group)
             final_suppliers.append(merged_supplier)
+            if group_sizes is not None:
+                group_sizes.append(len(group))
         
         return final_suppliers
     
@@ -117,8 +127,9 @@ class SupplierDeduplicator:
         all_contexts = []
         
         for supplier in group:
-            if supplier.get("source_url"):
-                all_sources.append(supplier["source_url"])
+            for url in [supplier.get("source_url")] + (supplier.get("source_urls") or []):
+                if url and url not in all_sources:
+                    all_sources.append(url)
             if supplier.get("context"):
                 all_contexts.append(supplier["context"])
         
@@ -129,6 +140,7 @@ class SupplierDeduplicator:
             "name": best_supplier["name"],
             "confidence": round(avg_confidence, 2),  # Round to avoid floating point issues
             "source_url": all_sources[0] if all_sources else None,
+            "source_urls": all_sources or None,
             "context": "; ".join(all_contexts) if all_contexts else None
         }
         
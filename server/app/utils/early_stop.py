@@ -0,0 +1,75 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# Stop once this many unique suppliers are found; 0 disables the target
+DEFAULT_TARGET_SUPPLIERS = 25
+# Stop when a page of results adds fewer new unique suppliers than this; 0 disables the check
+DEFAULT_MIN_NEW_SUPPLIERS = 1
+# Pages always processed before the yield check applies
+DEFAULT_MIN_PAGES = 1
+
+class EarlyStopPolicy:
+    """Decides when lazily fetched search pages stop paying for themselves.
+
+    After each page of results the pipeline reports how many unique suppliers it has in total.
+    The policy stops the search once ``target_suppliers`` is reached, or once a page past
+    the first ``min_pages`` adds fewer than ``min_new_suppliers``.
+    """
+
+    def __init__(self, target_suppliers: int = DEFAULT_TARGET_SUPPLIERS,
+                 min_new_suppliers: int = DEFAULT_MIN_NEW_SUPPLIERS,
+                 min_pages: int = DEFAULT_MIN_PAGES):
+        self.target_suppliers = target_suppliers
+        self.min_new_suppliers = min_new_suppliers
+        self.min_pages = min_pages
+        self._lock = threading.Lock()
+        self._stats = {"searches": 0, "pages": 0, "stopped_on_target": 0, "stopped_on_yield": 0}
+
+    @classmethod
+    def from_env(cls) -> "EarlyStopPolicy":
+        return cls(
+            target_suppliers=int(os.getenv("EARLY_STOP_TARGET_SUPPLIERS", DEFAULT_TARGET_SUPPLIERS)),
+            min_new_suppliers=int(os.getenv("EARLY_STOP_MIN_NEW_SUPPLIERS", DEFAULT_MIN_NEW_SUPPLIERS)),
+            min_pages=int(os.getenv("EARLY_STOP_MIN_PAGES", DEFAULT_MIN_PAGES))
+        )
+
+    def tracker(self) -> "SupplierYieldTracker":
+        """Per-request state; the policy itself is shared between requests."""
+        with self._lock:
+            self._stats["searches"] += 1
+        return SupplierYieldTracker(self)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["target_suppliers"] = self.target_suppliers
+        stats["min_new_suppliers"] = self.min_new_suppliers
+        return stats
+
+class SupplierYieldTracker:
+    def __init__(self, policy: EarlyStopPolicy):
+        self.policy = policy
+        self.pages = 0
+        self.unique_suppliers = 0
+        self.stop_reason: Optional[str] = None
+
+    def record_page(self, unique_suppliers: int) -> bool:
+        """Record the unique supplier total after a page. Returns True when the search should stop."""
+        policy = self.policy
+        new_suppliers = unique_suppliers - self.unique_suppliers
+        self.pages += 1
+        self.unique_suppliers = unique_suppliers
+        policy._count("pages")
+
+        if policy.target_suppliers and unique_suppliers >= policy.target_suppliers:
+            self.stop_reason = "target"
+            policy._count("stopped_on_target")
+        elif policy.min_new_suppliers and self.pages > policy.min_pages and new_suppliers < policy.min_new_suppliers:
+            self.stop_reason = "yield"
+            policy._count("stopped_on_yield")
+        return self.stop_reason is not None
@@ -0,0 +1,95 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional, Dict
+
+class SqliteCache:
+    """Small persistent key/value cache on local disk with TTL and LRU eviction.
+
+    Values are stored as JSON. Safe to share between threads.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50_000, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_accessed ON entries (last_accessed)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count -= 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET last_accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        payload = json.dumps(value, default=str)
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+            if not exists:
+                self._count += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, last_accessed) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now)
+            )
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        excess = self._count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY last_accessed ASC LIMIT ?)",
+                (excess,)
+            )
+            self._count -= excess
+            self.evictions += excess
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app.utils.tracing import current_span
+
+DEFAULT_LOG_LEVEL = "INFO"
+# json: one object per line for log collectors; text: for reading in a terminal
+DEFAULT_LOG_FORMAT = "json"
+# Fraction of debug payload records kept when debug logging is on
+DEFAULT_DEBUG_SAMPLE_RATE = 0.01
+DEFAULT_LOG_QUEUE_SIZE = 10_000
+
+# Loggers under this name are configured; others (uvicorn, google clients) are left alone
+APP_LOGGER = "app"
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the ``fields`` and ``payload`` passed as extra."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        text = json.dumps(entry, default=str, ensure_ascii=False)
+        payload = getattr(record, "payload", None)
+        # The payload is already JSON, so it is spliced in rather than parsed and dumped again
+        return f'{text[:-1]}, "payload": {payload}}}' if payload is not None else text
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        payload = getattr(record, "payload", None)
+        return f"{text} payload={payload}" if payload is not None else text
+
+class _TraceIdFilter(logging.Filter):
+    """Tags records with the request's trace id, so logs and spans can be joined."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = current_span()
+        record.trace_id = span.trace.trace_id if span else None
+        return True
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to the listener thread and never blocks: records are dropped when the queue is full."""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at the time, as test runners swap it."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_debug_sample_rate = DEFAULT_DEBUG_SAMPLE_RATE
+_configure_lock = threading.Lock()
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None,
+                      debug_sample_rate: Optional[float] = None) -> None:
+    """Route the app's loggers through a queue to a stdout writer thread.
+
+    Settings default to LOG_LEVEL, LOG_FORMAT and LOG_DEBUG_SAMPLE_RATE. Calling it again
+    replaces the previous configuration.
+    """
+    global _queue_handler, _listener, _debug_sample_rate
+    level = (level or os.getenv("LOG_LEVEL", DEFAULT_LOG_LEVEL)).upper()
+    log_format = (log_format or os.getenv("LOG_FORMAT", DEFAULT_LOG_FORMAT)).lower()
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", DEFAULT_DEBUG_SAMPLE_RATE))
+
+    with _configure_lock:
+        _stop_locked()
+        logger = logging.getLogger(APP_LOGGER)
+
+        writer = _StdoutHandler()
+        writer.setFormatter(TextFormatter() if log_format == "text" else JsonFormatter())
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(
+            int(os.getenv("LOG_QUEUE_SIZE", DEFAULT_LOG_QUEUE_SIZE))
+        )
+        _queue_handler = DroppingQueueHandler(log_queue)
+        _queue_handler.addFilter(_TraceIdFilter())
+        _listener = QueueListener(log_queue, writer)
+        _listener.start()
+
+        logger.addHandler(_queue_handler)
+        logger.setLevel(level)
+        logger.propagate = False
+        _debug_sample_rate = debug_sample_rate
+
+def _stop_locked() -> None:
+    global _queue_handler, _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+    if _queue_handler:
+        logging.getLogger(APP_LOGGER).removeHandler(_queue_handler)
+        _queue_handler = None
+
+def shutdown_logging() -> None:
+    """Write out queued records and stop the writer thread. Later records go to Python's last-resort handler."""
+    with _configure_lock:
+        _stop_locked()
+
+atexit.register(shutdown_logging)
+
+def debug_payload(logger: logging.Logger, message: str, payload: Any, **fields: Any) -> None:
+    """Log a large debug payload, for a sample of calls only.
+
+    When debug is off this is one level check: the payload is never serialized. When it is
+    on, only LOG_DEBUG_SAMPLE_RATE of calls serialize it, at the call site so the record
+    holds what the payload was at that moment.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if _debug_sample_rate < 1.0 and random.random() >= _debug_sample_rate:
+        return
+    logger.debug(message, extra={"fields": fields, "payload": json.dumps(payload, default=str, ensure_ascii=False)})
+
+def logging_stats() -> Dict[str, Any]:
+    handler = _queue_handler
+    if handler is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "level": logging.getLevelName(logging.getLogger(APP_LOGGER).level),
+        "queued": handler.queue.qsize(),
+        "dropped": handler.dropped,
+        "debug_sample_rate": _debug_sample_rate
+    }
@@ -0,0 +1,281 @@
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from a memory-cache hit to a slow deep-mode request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+GROUP_SIZE_BUCKETS = (1, 2, 3, 5, 8, 13, 21)
+
+# Label value for anything outside a metric's pre-registered label sets
+OTHER = "other"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One count per bucket plus +Inf; cumulated only when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+class _Metric(ABC):
+    """A metric family whose children, one per label set, all exist from registration.
+
+    ``labels()`` is a dict lookup, so recording never allocates. Label sets that were not
+    registered are folded into the child whose values are all "other", when there is one.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 label_sets: Iterable[Sequence[str]] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        sets = [tuple(values) for values in label_sets] if self.labelnames else [()]
+        self.register(sets)
+
+    @abstractmethod
+    def _new_child(self) -> object:
+        """A child holding the values of one label set."""
+
+    def register(self, label_sets: Iterable[Sequence[str]]) -> None:
+        """Add label sets. Meant for start-up, not the request path."""
+        with self._lock:
+            for values in label_sets:
+                values = tuple(values)
+                if len(values) != len(self.labelnames):
+                    raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+                if values not in self._children:
+                    self._children[values] = self._new_child()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.get((OTHER,) * len(self.labelnames))
+            if child is None:
+                raise KeyError(f"{self.name} has no label set {values}")
+        return child
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """The sample lines of every child, in the text exposition format."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_label_text(self.labelnames, values)} {_format_value(child.value)}"
+                for values, child in list(self._children.items())]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 label_sets: Iterable[Sequence[str]] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, label_sets)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, values, le)} {cumulative}")
+            labels = _label_text(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Metric families rendered together in the Prometheus text exposition format."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def add(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return next((m for m in self._metrics if m.name == name), None)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+STATUS_CLASSES = ("2xx", "3xx", "4xx", "5xx")
+# Span names of the /extract-suppliers trace, see app.utils.tracing
+PIPELINE_STAGES = (
+    "extract_suppliers", "cache_lookup", "search.page", "fetch.documents", "extraction.page",
+    "llm.call", "parse", "dedup", "storage.audit_write", "storage.cache_write"
+)
+CACHE_TIERS = ("memory", "firestore", "extraction", "search")
+CACHE_RESULTS = ("hit", "miss", "stale")
+
+REQUEST_LATENCY = REGISTRY.add(Histogram(
+    "http_request_duration_seconds", "Request latency by route.", ["endpoint"], [(OTHER,)]
+))
+REQUESTS = REGISTRY.add(Counter(
+    "http_requests_total", "Requests by route and status class.", ["endpoint", "status"],
+    [(OTHER, status) for status in STATUS_CLASSES] + [(OTHER, OTHER)]
+))
+IN_FLIGHT = REGISTRY.add(Gauge("http_requests_in_flight", "Requests being handled."))
+STAGE_LATENCY = REGISTRY.add(Histogram(
+    "pipeline_stage_duration_seconds", "Time spent in each supplier-extraction stage.", ["stage"],
+    [(stage,) for stage in PIPELINE_STAGES + (OTHER,)]
+))
+CACHE_LOOKUPS = REGISTRY.add(Counter(
+    "cache_lookups_total", "Cache lookups by tier and result. Stale lookups found an expired entry and also count as misses.",
+    ["tier", "result"], [(tier, result) for tier in CACHE_TIERS for result in CACHE_RESULTS]
+))
+LLM_CALLS = REGISTRY.add(Counter(
+    "llm_calls_total", "Model calls by outcome.", ["outcome"], [("ok",), ("error",)]
+))
+LLM_TOKENS = REGISTRY.add(Counter(
+    "llm_tokens_total", "Model tokens by kind.", ["kind"], [("prompt",), ("output",), ("cached_prompt",)]
+))
+PARSE_FAILURES = REGISTRY.add(Counter(
+    "llm_parse_failures_total", "Model responses that did not parse, or only partly.", ["kind"],
+    [("failed",), ("partial",)]
+))
+SEARCH_CALLS = REGISTRY.add(Counter(
+    "search_api_calls_total", "Custom Search API calls by outcome.", ["outcome"],
+    [("ok",), ("error",), ("quota_exhausted",)]
+))
+DEDUP_GROUP_SIZE = REGISTRY.add(Histogram(
+    "dedup_group_size", "Extracted supplier mentions merged into each deduplicated supplier.",
+    buckets=GROUP_SIZE_BUCKETS
+))
+
+def register_endpoints(paths: Iterable[str]) -> None:
+    """Pre-register the per-route children for the app's route templates."""
+    paths = list(paths)
+    REQUEST_LATENCY.register((path,) for path in paths)
+    REQUESTS.register((path, status) for path in paths for status in STATUS_CLASSES)
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+class RequestMetricsMiddleware:
+    """ASGI middleware that counts every HTTP request and times it under its route template.
+
+    It only wraps ``send`` to see the response status, so unlike ``@app.middleware("http")``
+    it adds no request/response objects or extra task per request. The route template, e.g.
+    /history/{company_name}, is read from the scope once the router has matched it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            endpoint = route.path if route else OTHER
+            REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+            REQUESTS.labels(endpoint, status_class(status_code)).inc()
+            IN_FLIGHT.dec()
+
+def observe_trace(trace) -> None:
+    """Feed each finished span of a trace into the stage latency histogram."""
+    for s in trace.spans:
+        STAGE_LATENCY.labels(s.name).observe(s.duration_ns / 1e9)
@@ -0,0 +1,205 @@
+import logging
+import re
+import json
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from app.config import SUPPLIERS_DIR
+from app.utils.cache_keys import COMPANY_NAME_SUFFIXES, canonicalize_company_name
+
+logger = logging.getLogger(__name__)
+
+# Legal forms that mark the preceding capitalised words as an organisation
+LEGAL_SUFFIXES = COMPANY_NAME_SUFFIXES | {
+    "sarl", "sas", "spa", "srl", "kg", "oy", "ab", "pte", "lp", "foods", "farms"
+}
+
+# Capitalised words that do not name an organisation on their own: sentence openers,
+# title-case filler and generic supply-chain vocabulary
+COMMON_WORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "with", "by", "from", "as",
+    "our", "we", "it", "its", "this", "that", "these", "their", "they", "how", "what", "why", "when",
+    "who", "all", "new", "more", "read", "find", "learn", "about", "home", "news", "page",
+    "supplier", "suppliers", "supply", "chain", "chains", "partner", "partners", "partnership",
+    "vendor", "vendors", "provider", "providers", "producers", "manufacturers", "distributors",
+    "retailer", "retailers", "company", "companies", "group", "ltd", "plc", "inc", "limited",
+    "uk", "us", "eu", "usa", "gb", "great", "britain", "edi", "ai", "ceo", "ghg", "esg", "b2b",
+    "scope", "tier", "code", "conduct", "policy", "report", "press", "release", "article",
+    "january", "february", "march", "april", "may", "june", "july", "august", "september",
+    "october", "november", "december", "monday", "tuesday", "wednesday", "thursday", "friday",
+    "saturday", "sunday", "provides", "supplies", "partnering",
+}
+
+CONNECTORS = {"&", "of", "de", "du", "la", "von", "van", "and"}
+
+# Segments are split on sentence ends, line breaks and the " | " / " - " separators in titles
+_SEGMENT_BREAK = re.compile(r"(?<=[.!?])\s+|\n+|\s[|\-–—]\s")
+_TOKEN = re.compile(r"&|[^\W_][\w'’.\-]*")
+_DOMAIN = re.compile(r"^([a-z0-9\-]+)\.(?:com|co\.uk|org|net|io|ai|eu|de|fr)$", re.IGNORECASE)
+
+def _normalize(word: str) -> str:
+    word = word.lower().rstrip(".,'’")
+    return re.sub(r"['’]s$", "", word)
+
+def _is_brand_shaped(word: str) -> bool:
+    """Acronyms (HSBC, CHEP) and mixed-case brands (OpenText, productDNA, McCain)."""
+    letters = word.replace("&", "").rstrip(".,'’")
+    if len(letters) < 2:
+        return False
+    if letters.isupper():
+        return True
+    return any(c.isupper() for c in letters[1:]) and any(c.islower() for c in letters)
+
+class SupplierPreFilter:
+    """Cheap, CPU-only check for whether a snippet could mention a supplier at all.
+
+    A snippet passes when it contains a known supplier from the registry, a capitalised name
+    with a legal suffix, or a capitalised span that is not the target company, an ignored
+    supplier or generic vocabulary. Everything else is skipped without a model call.
+    """
+
+    def __init__(self, known_suppliers: Iterable[str] = (),
+                 is_ignored: Optional[Callable[[str], bool]] = None):
+        self.is_ignored = is_ignored or (lambda name: False)
+        # Normalized name -> spellings seen, so lowercase mentions only match lowercase brands
+        self.registry: Dict[str, Set[str]] = {}
+        for name in known_suppliers:
+            tokens = _TOKEN.findall(name)
+            words = [_normalize(w) for w in tokens]
+            # Purely generic registry entries ("Suppliers", "Food Producers") would match everything
+            if words and any(w not in COMMON_WORDS for w in words) and not self.is_ignored(name):
+                self.registry.setdefault(" ".join(words), set()).add(" ".join(tokens))
+        self.max_registry_words = max((len(n.split()) for n in self.registry), default=0)
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_directory(cls, suppliers_dir: str = str(SUPPLIERS_DIR),
+                       is_ignored: Optional[Callable[[str], bool]] = None) -> "SupplierPreFilter":
+        """Build the registry from previous extraction results in suppliers/suppliers_*.json."""
+        names = []
+        for path in sorted(Path(suppliers_dir).glob("suppliers_*.json")):
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                names.extend(s["name"] for s in data.get("suppliers", []) if s.get("name"))
+            except Exception as e:
+                logger.error("Error loading supplier registry %s: %s", path, e)
+        return cls(names, is_ignored)
+
+    def _registry_hit(self, tokens: List[str], company_words: Set[str]) -> bool:
+        words = [_normalize(t) for t in tokens]
+        for start in range(len(words)):
+            for end in range(start + 1, min(len(words), start + self.max_registry_words) + 1):
+                spellings = self.registry.get(" ".join(words[start:end]))
+                if not spellings or company_words.intersection(words[start:end]):
+                    continue
+                if tokens[start][:1].isupper() or " ".join(tokens[start:end]) in spellings:
+                    return True
+        return False
+
+    def _span_is_candidate(self, span: List[str], at_segment_start: bool, labelled: bool,
+                           company_canonical: str, company_words: Set[str]) -> bool:
+        while span and span[-1].lower() in CONNECTORS:
+            span = span[:-1]
+        if not span:
+            return False
+        text = " ".join(w.rstrip(".,") for w in span)
+        if self.is_ignored(text) or canonicalize_company_name(text) == company_canonical:
+            return False
+
+        normalized = [_normalize(w) for w in span]
+        if len(span) > 1 and normalized[-1] in LEGAL_SUFFIXES:
+            return canonicalize_company_name(" ".join(span[:-1])) != company_canonical
+
+        content = [(i, w) for i, (w, n) in enumerate(zip(span, normalized))
+                   if n not in COMMON_WORDS and n not in CONNECTORS and n not in company_words
+                   and not n.isdigit()]
+        if len(content) > 1:
+            return True
+        if not content:
+            return False
+        index, word = content[0]
+        if _is_brand_shaped(word):
+            return True
+        # A lone capitalised word opening a sentence is usually just an ordinary word,
+        # unless it labels what follows ("Virtualstock: Partnership with ASDA")
+        return labelled or not (at_segment_start and index == 0)
+
+    def has_candidate(self, text: str, company_name: str = "") -> bool:
+        """Whether text might name an organisation other than company_name."""
+        company_canonical = canonicalize_company_name(company_name) if company_name else ""
+        company_words = set(company_canonical.split("_")) if company_canonical else set()
+
+        found = False
+        for segment in _SEGMENT_BREAK.split(text):
+            matches = list(_TOKEN.finditer(segment))
+            tokens = [m.group() for m in matches]
+            if self.registry and self._registry_hit(tokens, company_words):
+                found = True
+                break
+
+            span: List[str] = []
+            span_start = 0
+            for index, match in enumerate(matches + [None]):
+                token = match.group() if match else ""
+                domain = _DOMAIN.match(token.rstrip(".,"))
+                if domain and domain.group(1).lower() not in company_words:
+                    found = True
+                    break
+                # Punctuation between tokens ends a span: "Aldi: Listed" is two spans
+                gap = segment[matches[index - 1].end():match.start()] if match and index else " "
+                if span and gap.strip() and gap.strip() != "&":
+                    if self._span_is_candidate(span, span_start == 0, gap.strip().startswith(":"),
+                                               company_canonical, company_words):
+                        found = True
+                        break
+                    span = []
+                starts_upper = token[:1].isupper()
+                continues = span and (token.lower() in CONNECTORS or token[:1].isdigit())
+                if starts_upper or continues or (token and _is_brand_shaped(token)):
+                    if not span:
+                        span_start = index
+                    span.append(token)
+                    continue
+                if span and self._span_is_candidate(span, span_start == 0, False,
+                                                    company_canonical, company_words):
+                    found = True
+                    break
+                span = []
+            if found:
+                break
+
+        with self._lock:
+            self.checked += 1
+            if not found:
+                self.skipped += 1
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "skipped": self.skipped,
+                "skip_rate": round(self.skipped / self.checked, 3) if self.checked else 0.0,
+                "registry_size": len(self.registry)
+            }
+
+def evaluate_prefilter(prefilter: SupplierPreFilter, labelled: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Skip rate and recall of the pre-filter on snippets labelled with has_supplier.
+
+    Recall is the share of snippets that do mention a supplier which still reach the model;
+    skip rate is the share of all snippets that would not.
+    """
+    positives = [s for s in labelled if s["has_supplier"]]
+    negatives = [s for s in labelled if not s["has_supplier"]]
+    passed_positive = sum(prefilter.has_candidate(s["text"], s["company"]) for s in positives)
+    passed_negative = sum(prefilter.has_candidate(s["text"], s["company"]) for s in negatives)
+    skipped = len(labelled) - passed_positive - passed_negative
+    return {
+        "snippets": len(labelled),
+        "skip_rate": round(skipped / len(labelled), 3) if labelled else 0.0,
+        "recall": round(passed_positive / len(positives), 3) if positives else 1.0,
+        "negatives_skipped": round(1 - passed_negative / len(negatives), 3) if negatives else 0.0
+    }
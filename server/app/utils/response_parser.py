@@ -0,0 +1,133 @@
+import re
+import json
+from typing import List, Dict, Any, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
+
+from app.models.schemas import Supplier
+
+# Response schema sent to the model so it can only emit the Supplier shape (OpenAPI subset)
+SUPPLIER_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "suppliers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "confidence": {"type": "number"},
+                    "context": {"type": "string"}
+                },
+                "required": ["name", "confidence"]
+            }
+        }
+    },
+    "required": ["suppliers"]
+}
+
+_suppliers_adapter = TypeAdapter(List[Supplier])
+_decoder = json.JSONDecoder()
+_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+def _strip_fences(text: str) -> str:
+    return _FENCE_PATTERN.sub("", text.strip())
+
+def _decode_embedded_object(text: str) -> Optional[Any]:
+    """Decode a complete JSON object surrounded by stray prose."""
+    start = text.find("{")
+    if start < 0:
+        return None
+    try:
+        return _decoder.raw_decode(text, start)[0]
+    except json.JSONDecodeError:
+        return None
+
+def _recover_items(text: str) -> List[Any]:
+    """Decode supplier objects one by one from a possibly truncated or malformed response."""
+
+    anchor = text.find('"suppliers"')
+    start = text.find("[", anchor if anchor >= 0 else 0)
+    if start < 0:
+        return []
+
+    items = []
+    position = start + 1
+    while position < len(text):
+        next_object = text.find("{", position)
+        if next_object < 0:
+            break
+        try:
+            item, position = _decoder.raw_decode(text, next_object)
+        except json.JSONDecodeError:
+            # Truncated or broken object; everything before it is still usable
+            break
+        items.append(item)
+    return items
+
+def _normalize_item(item: Any) -> Any:
+    if not isinstance(item, dict):
+        return item
+    confidence = item.get("confidence")
+    if isinstance(confidence, str):
+        confidence = confidence.strip().rstrip("%")
+        try:
+            confidence = float(confidence)
+        except ValueError:
+            return item
+    # Some responses use a 0-100 scale
+    if isinstance(confidence, (int, float)) and 1.0 < confidence <= 100.0:
+        confidence = confidence / 100.0
+    return {**item, "confidence": confidence}
+
+def validate_suppliers(items: List[Any]) -> List[Dict[str, Any]]:
+    """Validate extracted items against the Supplier model, dropping invalid ones.
+
+    Validates the whole list in one pass and only falls back to item-by-item when
+    something in it is invalid.
+    """
+
+    items = [_normalize_item(item) for item in items]
+    try:
+        suppliers = _suppliers_adapter.validate_python(items)
+    except ValidationError:
+        suppliers = []
+        for item in items:
+            try:
+                suppliers.extend(_suppliers_adapter.validate_python([item]))
+            except ValidationError:
+                continue
+    return [s.model_dump(exclude_none=True) for s in suppliers if s.name.strip()]
+
+def parse_supplier_response(text: str) -> Tuple[Optional[List[Dict[str, Any]]], bool]:
+    """Parse a model response into supplier dicts.
+
+    Returns ``(suppliers, complete)``. ``suppliers`` is None when nothing could be
+    recovered. ``complete`` is False when the response was malformed and only part of it
+    was recovered, in which case the result should not be cached.
+    """
+
+    if not text:
+        return None, False
+
+    cleaned = _strip_fences(text)
+    try:
+        parsed = json.loads(cleaned)
+        complete = True
+    except json.JSONDecodeError:
+        parsed, complete = _decode_embedded_object(cleaned), True
+        if parsed is None:
+            complete = False
+
+    if isinstance(parsed, dict):
+        items = parsed.get("suppliers", [])
+    elif isinstance(parsed, list):
+        items = parsed
+    else:
+        items = _recover_items(cleaned)
+        if not items:
+            return None, False
+
+    if not isinstance(items, list):
+        return None, False
+
+    return validate_suppliers(items), complete
@@ -0,0 +1,111 @@
+import re
+from typing import List, Dict, Any, Optional, Set
+
+from app.utils.urls import canonicalize_url, site_domain
+
+class SearchResultDeduplicator:
+    """Collapse duplicate and near-duplicate search results before extraction.
+
+    Results are duplicates when their URLs canonicalize to the same value, and
+    near-duplicates when the word shingles of their title and snippet overlap by at least
+    ``similarity_threshold`` (Jaccard), as with syndicated press releases. The first result
+    of each group is kept, and every URL in the group is listed in its ``source_urls``.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.7, shingle_size: int = 3):
+        self.similarity_threshold = similarity_threshold
+        self.shingle_size = shingle_size
+
+    def deduplicate_results(self, search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return one result per duplicate group, in original rank order."""
+
+        if not search_results:
+            return []
+
+        groups: List[Dict[str, Any]] = []
+        groups_by_url: Dict[str, Dict[str, Any]] = {}
+
+        for result in search_results:
+            link = result.get("link", "")
+            canonical = canonicalize_url(link)
+            shingles = self._shingles(f"{result.get('title', '')} {result.get('snippet', '')}")
+
+            group = groups_by_url.get(canonical) if canonical else None
+            if group is None:
+                group = next((g for g in groups if self._jaccard(shingles, g["shingles"]) >= self.similarity_threshold), None)
+
+            if group is None:
+                group = {"result": result, "shingles": shingles, "links": []}
+                groups.append(group)
+            if canonical:
+                groups_by_url.setdefault(canonical, group)
+            if link and link not in group["links"]:
+                group["links"].append(link)
+
+        collapsed = []
+        for group in groups:
+            result = dict(group["result"])
+            result["source_urls"] = group["links"]
+            collapsed.append(result)
+        return collapsed
+
+    def _shingles(self, text: str) -> Set[str]:
+        words = re.findall(r"\w+", text.lower())
+        if len(words) < self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    @staticmethod
+    def _jaccard(a: Set[str], b: Set[str]) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+def result_domain(result: Dict[str, Any]) -> str:
+    """The site a search result belongs to, from its link or else its displayLink."""
+    link = result.get("link") or ""
+    if not link and result.get("displayLink"):
+        link = f"https://{result['displayLink']}"
+    return site_domain(link)
+
+class DomainDiversifier:
+    """Caps how many results one site contributes to a search.
+
+    ``admit`` is called with each batch of ranked results as it arrives and returns those
+    within the cap, up to ``limit``; the rest are held back. If the search runs out of other
+    sites before filling its results, ``backfill`` returns held-back results: first those
+    only cut by the limit, then those over the cap, each in their original order.
+    """
+
+    def __init__(self, max_per_domain: int):
+        self.max_per_domain = max_per_domain
+        # Results over the per-site cap, and results within it that did not fit the limit
+        self.overflow: List[Dict[str, Any]] = []
+        self.surplus: List[Dict[str, Any]] = []
+        self._counts: Dict[str, int] = {}
+
+    def admit(self, results: List[Dict[str, Any]], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        limit = len(results) if limit is None else max(0, limit)
+        if self.max_per_domain <= 0:
+            self.surplus.extend(results[limit:])
+            return list(results[:limit])
+        admitted = []
+        for result in results:
+            domain = result_domain(result)
+            if domain and self._counts.get(domain, 0) >= self.max_per_domain:
+                self.overflow.append(result)
+                continue
+            if len(admitted) >= limit:
+                self.surplus.append(result)
+                continue
+            self._counts[domain] = self._counts.get(domain, 0) + 1
+            admitted.append(result)
+        return admitted
+
+    def backfill(self, count: int) -> List[Dict[str, Any]]:
+        count = max(0, count)
+        from_surplus = self.surplus[:count]
+        from_overflow = self.overflow[:count - len(from_surplus)]
+        self.surplus = self.surplus[len(from_surplus):]
+        self.overflow = self.overflow[len(from_overflow):]
+        return from_surplus + from_overflow
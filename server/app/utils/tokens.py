@@ -0,0 +1,179 @@
+import re
+import math
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+# Gemini tokenizers average roughly four characters per token on English business text
+CHARS_PER_TOKEN = 4.0
+
+DEFAULT_EXTRACTION_TOKEN_BUDGET = 2000
+DEFAULT_CHUNK_OVERLAP_TOKENS = 100
+
+# Abbreviations that end in a full stop without ending the sentence. Splitting after
+# these would cut company names such as "Acme Ltd. and Partners" in half.
+_ABBREVIATIONS = {
+    "ltd", "inc", "co", "corp", "plc", "llc", "bros", "intl", "dept", "est",
+    "st", "mr", "mrs", "ms", "dr", "prof", "no", "vs", "etc", "e.g", "i.e", "u.s", "u.k", "approx"
+}
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+_WORD = re.compile(r"\S+")
+
+def _tokens_for_chars(chars: int) -> int:
+    return math.ceil(chars / CHARS_PER_TOKEN)
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the model token count of text locally, without a tokenizer call."""
+    if not text:
+        return 0
+    return _tokens_for_chars(len(text))
+
+def _iter_sentences(text: str) -> Iterator[str]:
+    pending = ""
+    position = 0
+    for match in _SENTENCE_BREAK.finditer(text):
+        fragment = text[position:match.end()]
+        position = match.end()
+        pending += fragment
+        last_word = pending.rstrip().rstrip("\"')]").rsplit(None, 1)[-1].rstrip(".!?").lower()
+        if last_word in _ABBREVIATIONS or len(last_word) == 1:
+            continue
+        yield pending.strip()
+        pending = ""
+    pending += text[position:]
+    if pending.strip():
+        yield pending.strip()
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, keeping abbreviations such as "Ltd." inside their sentence."""
+    return list(_iter_sentences(text))
+
+def _split_words(sentence: str, max_tokens: int) -> Iterator[str]:
+    """Last resort for a single sentence over budget: split on word boundaries."""
+    current: List[str] = []
+    # Length of " ".join(current), kept as words are added rather than re-joined
+    length = 0
+    for match in _WORD.finditer(sentence):
+        word = match.group()
+        if current and _tokens_for_chars(length + 1 + len(word)) > max_tokens:
+            yield " ".join(current)
+            current, length = [], 0
+        length += len(word) + (1 if current else 0)
+        current.append(word)
+    if current:
+        yield " ".join(current)
+
+def _iter_pieces(text: str, max_tokens: int) -> Iterator[str]:
+    for sentence in _iter_sentences(text):
+        if estimate_tokens(sentence) > max_tokens:
+            yield from _split_words(sentence, max_tokens)
+        else:
+            yield sentence
+
+def _iter_chunks(text: str, max_tokens: int, overlap_tokens: int) -> Iterator[str]:
+    """Chunks of at most max_tokens, produced as the text is read."""
+    current: List[str] = []
+    # Length of " ".join(current)
+    length = 0
+    for sentence in _iter_pieces(text, max_tokens):
+        if current and _tokens_for_chars(length + 1 + len(sentence)) > max_tokens:
+            yield " ".join(current)
+            # Carry trailing sentences into the next chunk, within the overlap budget
+            overlap: List[str] = []
+            overlap_length = 0
+            for previous in reversed(current):
+                carried = len(previous) + (1 + overlap_length if overlap else 0)
+                if _tokens_for_chars(carried + 1 + len(sentence)) > max_tokens \
+                        or _tokens_for_chars(carried) > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_length = carried
+            current, length = overlap, overlap_length
+        length += len(sentence) + (1 if current else 0)
+        current.append(sentence)
+    if current:
+        yield " ".join(current)
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = DEFAULT_CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """Split text into chunks of at most max_tokens on sentence boundaries.
+
+    Consecutive chunks share up to overlap_tokens of trailing sentences, so a supplier
+    mentioned across a boundary is still seen whole by at least one chunk.
+    """
+
+    if estimate_tokens(text) <= max_tokens:
+        return [text] if text.strip() else []
+    return list(_iter_chunks(text, max_tokens, overlap_tokens))
+
+def truncate_to_budget(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, ending on a sentence boundary where possible.
+
+    Only as much of the text is read as the first chunk needs.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return next(_iter_chunks(text, max_tokens, overlap_tokens=0), "")
+
+class TokenUsage:
+    """Accumulates model token usage for one extraction request. Thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.cached_calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.estimated = False
+        self.streamed_calls = 0
+        self.first_token_seconds = 0.0
+
+    def record_call(self, prompt_tokens: int, output_tokens: int, estimated: bool = False,
+                    cached_prompt_tokens: int = 0, first_token_seconds: Optional[float] = None) -> None:
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+            self.cached_prompt_tokens += cached_prompt_tokens
+            self.estimated = self.estimated or estimated
+            if first_token_seconds is not None:
+                self.streamed_calls += 1
+                self.first_token_seconds += first_token_seconds
+
+    def record_cached(self) -> None:
+        with self._lock:
+            self.cached_calls += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "cached_calls": self.cached_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": self.prompt_tokens + self.output_tokens,
+                "cached_prompt_tokens": self.cached_prompt_tokens,
+                "estimated": self.estimated,
+                "avg_time_to_first_token_ms": round(self.first_token_seconds / self.streamed_calls * 1000, 1)
+                if self.streamed_calls else None
+            }
+
+def usage_from_response(response: Any, prompt: str, response_text: str) -> Dict[str, Any]:
+    """Token counts reported by the model, falling back to local estimates."""
+    metadata = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(metadata, "prompt_token_count", None)
+    output_tokens = getattr(metadata, "candidates_token_count", None)
+    if isinstance(prompt_tokens, int) and isinstance(output_tokens, int):
+        # Input tokens served from Gemini's prefix cache, billed at a discount
+        cached_tokens = getattr(metadata, "cached_content_token_count", None)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "cached_prompt_tokens": cached_tokens if isinstance(cached_tokens, int) else 0,
+            "estimated": False
+        }
+    return {
+        "prompt_tokens": estimate_tokens(prompt),
+        "output_tokens": estimate_tokens(response_text),
+        "cached_prompt_tokens": 0,
+        "estimated": True
+    }
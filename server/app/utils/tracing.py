@@ -0,0 +1,251 @@
+import logging
+import os
+import json
+import time
+import queue
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "lazy-logistics-supplier-api"
+TRACER_NAME = "app.utils.tracing"
+
+DEFAULT_TRACE_FILE = "traces/spans.jsonl"
+DEFAULT_OTLP_ENDPOINT = "http://localhost:4318"
+
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = ("name", "trace", "span_id", "parent_id", "attributes", "start_ns", "duration_ns", "error", "_started")
+
+    def __init__(self, name: str, trace: "Trace", parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.duration_ns = 0
+        self.error: Optional[str] = None
+        self._started = time.perf_counter_ns()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        self.duration_ns = time.perf_counter_ns() - self._started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.trace.add(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1e6
+
+class Trace:
+    """The spans of one request. Spans may finish on worker threads, so adding is locked."""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def stage_timings(self) -> Dict[str, Dict[str, Any]]:
+        """Total time and count per span name, slowest stage first."""
+        with self._lock:
+            spans = list(self.spans)
+        stages: Dict[str, Dict[str, Any]] = {}
+        for span in spans:
+            stage = stages.setdefault(span.name, {"count": 0, "total_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] += span.duration_ms
+        for stage in stages.values():
+            stage["total_ms"] = round(stage["total_ms"], 2)
+        return dict(sorted(stages.items(), key=lambda item: -item[1]["total_ms"]))
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the enclosed block as a child of the current span.
+
+    Outside a trace this does nothing and yields None, so instrumented code costs almost
+    nothing when called from scripts or tests.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    current = Span(name, parent.trace, parent.span_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(e)
+        raise
+    else:
+        current.end()
+    finally:
+        _current_span.reset(token)
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Trace]:
+    """Start a trace with a root span, and export it when the block exits."""
+    trace = Trace()
+    root = Span(name, trace, None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield trace
+    except BaseException as e:
+        root.end(e)
+        raise
+    else:
+        root.end()
+    finally:
+        _current_span.reset(token)
+        exporter = get_span_exporter()
+        if exporter:
+            exporter.export(trace)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def submit_in_context(executor: Any, fn: Callable[..., Any], *args: Any) -> Any:
+    """executor.submit that carries the current span into the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def otlp_json(trace: Trace) -> Dict[str, Any]:
+    """The trace as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for s in trace.spans:
+        entry = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.start_ns + s.duration_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": STATUS_ERROR, "message": s.error} if s.error else {"code": STATUS_OK}
+        }
+        if s.parent_id:
+            entry["parentSpanId"] = s.parent_id
+        spans.append(entry)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": TRACER_NAME}, "spans": spans}]
+    }]}
+
+class FileSpanExporter:
+    """Appends each trace as one OTLP/JSON line, the format the collector's file receiver reads."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def send(self, payload: Dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload) + "\n")
+
+class OtlpHttpSpanExporter:
+    """Posts traces to an OpenTelemetry collector's OTLP/HTTP JSON endpoint."""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0, session: Optional[requests.Session] = None):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def send(self, payload: Dict[str, Any]) -> None:
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+class BackgroundSpanExporter:
+    """Exports traces from a worker thread so requests never wait on the collector.
+
+    Traces are dropped, and counted, when the queue is full.
+    """
+
+    def __init__(self, sink: Any, max_queue: int = 1000):
+        self.sink = sink
+        self.dropped = 0
+        self.exported = 0
+        self.failed = 0
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                break
+            try:
+                self.sink.send(otlp_json(trace))
+                self.exported += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Trace export failed: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        self._queue.join()
+
+    def stats(self) -> Dict[str, int]:
+        return {"exported": self.exported, "failed": self.failed, "dropped": self.dropped}
+
+_exporter: Optional[BackgroundSpanExporter] = None
+_exporter_configured = False
+_exporter_lock = threading.Lock()
+
+def get_span_exporter() -> Optional[BackgroundSpanExporter]:
+    """The process-wide exporter chosen by TRACING_EXPORTER: none (default), file or otlp."""
+    global _exporter, _exporter_configured
+    if not _exporter_configured:
+        with _exporter_lock:
+            if not _exporter_configured:
+                kind = os.getenv("TRACING_EXPORTER", "none").lower()
+                sink = None
+                if kind == "file":
+                    sink = FileSpanExporter(os.getenv("TRACING_FILE_PATH", DEFAULT_TRACE_FILE))
+                elif kind == "otlp":
+                    sink = OtlpHttpSpanExporter(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", DEFAULT_OTLP_ENDPOINT))
+                _exporter = BackgroundSpanExporter(sink) if sink else None
+                _exporter_configured = True
+    return _exporter
+
+def reset_span_exporter() -> None:
+    global _exporter, _exporter_configured
+    with _exporter_lock:
+        _exporter = None
+        _exporter_configured = False
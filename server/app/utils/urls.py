@@ -0,0 +1,107 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track the visit and never change the page content
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "igshid", "ref", "ref_src", "cmpid", "ito", "ocid"
+}
+TRACKING_PARAM_PREFIXES = ("utm_", "pk_", "hsa_")
+
+# Host prefixes of mobile and AMP editions of a site
+VARIANT_HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+# Query parameters that only select the mobile or AMP edition, with the values that do so
+VARIANT_PARAMS = {"amp": None, "outputtype": {"amp"}, "m": {"0", "1"}}
+
+# Second-level labels under which registrations happen one level deeper (example.co.uk)
+SECOND_LEVEL_LABELS = {"co", "com", "org", "net", "ac", "gov", "edu", "ltd", "plc"}
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+
+def _is_variant_param(name: str, value: str) -> bool:
+    name = name.lower()
+    if name not in VARIANT_PARAMS:
+        return False
+    values = VARIANT_PARAMS[name]
+    return values is None or value.lower() in values
+
+def _strip_variant_host(host: str) -> str:
+    stripped = True
+    while stripped:
+        stripped = False
+        for prefix in VARIANT_HOST_PREFIXES:
+            # Keep at least a two-label domain: "m.co" is a site, not a mobile edition
+            if host.startswith(prefix) and "." in host[len(prefix):]:
+                host = host[len(prefix):]
+                stripped = True
+    return host
+
+def _unwrap_amp_cache(host: str, path: str):
+    """The publisher host and path of a URL served by an AMP cache or viewer, if it is one."""
+    if host.endswith(".cdn.ampproject.org"):
+        match = re.match(r"^/[a-z]+(?:/s)?/([^/]+)(/.*)?$", path)
+    elif host in ("google.com", "www.google.com") and path.startswith("/amp/"):
+        match = re.match(r"^/amp/(?:s/)?([^/]+)(/.*)?$", path)
+    else:
+        return None
+    return (match.group(1).lower(), match.group(2) or "/") if match else None
+
+def _strip_amp_path(path: str) -> str:
+    path = re.sub(r"\.amp(\.html?)?$", r"\1", path)
+    path = re.sub(r"^/amp(?=/|$)", "", path)
+    path = re.sub(r"/amp/?$", "", path)
+    return path or "/"
+
+def canonicalize_url(url: str) -> str:
+    """Reduce a URL to a canonical form for duplicate detection.
+
+    Drops the scheme difference between http and https, "www." and mobile or AMP host
+    prefixes, AMP cache wrappers and path markers, default ports, fragments, tracking and
+    edition-selecting parameters and trailing slashes, and sorts the remaining query
+    parameters. The result is a comparison key, not necessarily a fetchable URL.
+    """
+
+    if not url:
+        return ""
+
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    path = parts.path or "/"
+
+    unwrapped = _unwrap_amp_cache(host, path)
+    if unwrapped:
+        host, path = unwrapped
+        port = None
+    else:
+        port = parts.port
+
+    host = _strip_variant_host(host)
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+
+    path = _strip_amp_path(re.sub(r"/{2,}", "/", path))
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(k) and not _is_variant_param(k, v)
+    )
+
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+def site_domain(url: str) -> str:
+    """The registrable domain of a URL, e.g. "example.co.uk" for "https://m.news.example.co.uk/a".
+
+    A heuristic without the public suffix list: the last two host labels, or three when
+    the second-to-last is a common second-level label such as "co" or "com".
+    """
+
+    host = urlsplit(canonicalize_url(url)).hostname or ""
+    labels = host.split(".")
+    if len(labels) <= 2 or re.fullmatch(r"[\d.]+", host):
+        return host
+    keep = 3 if labels[-2] in SECOND_LEVEL_LABELS and len(labels[-1]) == 2 else 2
+    return ".".join(labels[-keep:])
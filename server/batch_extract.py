@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Offline supplier extraction for many companies through Vertex AI batch prediction.
+Usage: python batch_extract.py COMPANIES_FILE [--max-results N] [--work-dir DIR] [--force]
+       python batch_extract.py --ingest BATCH_DIR
+
+COMPANIES_FILE lists one company name per line; lines starting with # are skipped.
+Companies with a fresh cached result are skipped unless --force is given. Search runs
+online; every model call for the run is submitted as a single batch job, and the results
+are stored in the extraction cache, the audit trail and the result cache.
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from typing import List, Optional
+from dotenv import load_dotenv
+from app.config import MAX_SEARCH_RESULTS
+from app.services.batch import BatchExtractionPipeline, VertexBatchBackend
+from app.utils.log import configure_logging
+
+def read_companies(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        names = [line.strip() for line in f]
+    return [name for name in dict.fromkeys(names) if name and not name.startswith("#")]
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Extract suppliers for many companies with batch prediction.")
+    parser.add_argument("companies_file", nargs="?", help="File with one company name per line")
+    parser.add_argument("--max-results", type=int, default=MAX_SEARCH_RESULTS,
+                        help="Search results to process per company")
+    parser.add_argument("--work-dir", default="batches", help="Directory for batch input, manifest and output")
+    parser.add_argument("--force", action="store_true", help="Re-extract companies that are already cached")
+    parser.add_argument("--ingest", metavar="BATCH_DIR",
+                        help="Only ingest predictions.jsonl from an earlier batch directory, e.g. after a failed ingest")
+    args = parser.parse_args(argv)
+    if not args.companies_file and not args.ingest:
+        parser.error("COMPANIES_FILE or --ingest is required")
+    return args
+
+def main():
+    """Main function."""
+    load_dotenv()
+    configure_logging(log_format="text")
+    args = parse_args()
+
+    # Imported here so --help works without cloud credentials
+    from app.services.quota import BATCH, QuotaExhaustedError, SearchOutcome
+    from app.services.search import GoogleSearchService
+    from app.services.extraction import VertexAIExtractionService
+    from app.services.storage import FirestoreService
+    from app.utils.deduplication import SupplierDeduplicator
+
+    storage_service = FirestoreService()
+    pipeline = BatchExtractionPipeline(
+        VertexAIExtractionService(), storage_service, SupplierDeduplicator(),
+        VertexBatchBackend.from_env(), args.work_dir
+    )
+
+    if args.ingest:
+        batch_dir = Path(args.ingest)
+        stored = pipeline.ingest(batch_dir, batch_dir / "predictions.jsonl")
+        print(f"Stored results for {len(stored)} companies")
+        return
+
+    search_service = GoogleSearchService()
+    search_results = {}
+    for company_name in read_companies(args.companies_file):
+        if not args.force and storage_service.get_cached_result(company_name, args.max_results):
+            print(f"Skipping {company_name}: cached")
+            continue
+        print(f"Searching: {company_name}")
+        outcome = SearchOutcome()
+        try:
+            results = search_service.search_company_suppliers(
+                company_name, args.max_results, priority=BATCH, outcome=outcome
+            )
+        except QuotaExhaustedError:
+            print("Search quota available to batch jobs is used up; stopping searches for today.")
+            break
+        if outcome.quota_limited:
+            # Results would be cached as complete; leave the company for a later run
+            print(f"Skipping {company_name}: search limited by the daily quota")
+            continue
+        search_results[company_name] = results
+
+    if not search_results:
+        print("Nothing to extract.")
+        return
+
+    batch_dir = pipeline.prepare(search_results, args.max_results)
+    try:
+        output_path = pipeline.run(batch_dir)
+    except Exception as e:
+        print(f"Batch prediction failed: {e}")
+        sys.exit(1)
+
+    stored = pipeline.ingest(batch_dir, output_path)
+    for company_name, count in stored.items():
+        print(f"{company_name}: {count} suppliers")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Measure what request logging costs /extract-suppliers.
+Usage: python benchmark_logging.py [--requests N] [--concurrency N] [--output FILE]
+
+Runs the real extract_suppliers handler against in-process fake search, extraction and
+storage services, so only the pipeline's own work and its logging are measured. Each mode
+writes its output to FILE (a temporary file by default):
+
+  print         the payload prints the handler used to make (five per page)
+  info          LOG_LEVEL=INFO, the default: debug payloads are skipped
+  debug-sampled LOG_LEVEL=DEBUG with 1% of debug payloads logged
+  debug-all     LOG_LEVEL=DEBUG with every debug payload logged
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+import app.main as api
+from app.models.schemas import SupplierExtractionRequest
+from app.utils.deduplication import SupplierDeduplicator
+from app.utils.log import configure_logging, shutdown_logging
+
+MODES = ("print", "info", "debug-sampled", "debug-all")
+PAGES = 2
+RESULTS_PER_PAGE = 10
+SUPPLIERS_PER_PAGE = 8
+
+def fake_page(company_name: str, page: int) -> List[Dict[str, Any]]:
+    return [{
+        "title": f"{company_name} supplier news {page}-{i}",
+        "snippet": f"{company_name} has signed a multi-year agreement with Supplier {page}-{i} Ltd " * 4,
+        "link": f"https://news{page}-{i}.example.com/{company_name.lower()}/suppliers",
+        "displayLink": f"news{page}-{i}.example.com"
+    } for i in range(RESULTS_PER_PAGE)]
+
+class FakeSearch:
+    def __init__(self, legacy_print: bool):
+        self.legacy_print = legacy_print
+
+    def iter_search_pages(self, company_name, max_results, outcome=None):
+        for page in range(PAGES):
+            results = fake_page(company_name, page)
+            if self.legacy_print:
+                print("[DEBUG] Google Search Results:", results)
+            yield results
+
+class FakeExtraction:
+    def __init__(self, legacy_print: bool):
+        self.legacy_print = legacy_print
+
+    def extract_suppliers_from_search_results(self, company_name, results, usage=None):
+        if self.legacy_print:
+            print("[DEBUG] Extraction input:", results)
+        suppliers = [{
+            "name": f"Supplier {r['title'].split()[-1]} Ltd",
+            "confidence": 0.8,
+            "context": r["snippet"][:120],
+            "source_url": r["link"],
+            "source_urls": [r["link"]]
+        } for r in results[:SUPPLIERS_PER_PAGE]]
+        if self.legacy_print:
+            print("[DEBUG] Extraction output:", suppliers)
+        return suppliers
+
+class FakeDeduplicator(SupplierDeduplicator):
+    def __init__(self, legacy_print: bool):
+        super().__init__()
+        self.legacy_print = legacy_print
+
+    def deduplicate_suppliers(self, suppliers, group_sizes=None):
+        if self.legacy_print:
+            print("[DEBUG] Deduplication input:", suppliers)
+        deduplicated = super().deduplicate_suppliers(suppliers, group_sizes)
+        if self.legacy_print:
+            print("[DEBUG] Deduplication output:", deduplicated)
+        return deduplicated
+
+class FakeStorage:
+    def get_cached_result(self, company_name, max_results, deep=False):
+        return None
+
+    def store_extraction_result(self, *args, **kwargs):
+        return "audit-id"
+
+    def cache_result(self, *args, **kwargs):
+        pass
+
+@contextmanager
+def fake_services(legacy_print: bool):
+    saved = (api.search_service, api.extraction_service, api.storage_service, api.deduplicator)
+    api.search_service = FakeSearch(legacy_print)
+    api.extraction_service = FakeExtraction(legacy_print)
+    api.storage_service = FakeStorage()
+    api.deduplicator = FakeDeduplicator(legacy_print)
+    try:
+        yield
+    finally:
+        api.search_service, api.extraction_service, api.storage_service, api.deduplicator = saved
+
+def run_mode(mode: str, requests: int, concurrency: int, output_path: str) -> Dict[str, float]:
+    level = "DEBUG" if mode.startswith("debug") else "INFO"
+    sample_rate = 1.0 if mode == "debug-all" else 0.01
+    stdout = sys.stdout
+    with open(output_path, "w", encoding="utf-8") as output:
+        sys.stdout = output
+        try:
+            configure_logging(level=level, log_format="json", debug_sample_rate=sample_rate)
+            with fake_services(legacy_print=mode == "print"):
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    list(executor.map(
+                        lambda n: api.extract_suppliers(SupplierExtractionRequest(company_name=f"Company {n}")),
+                        range(requests)
+                    ))
+                elapsed = time.perf_counter() - started
+            # Queued records are written after the requests finish; report that separately
+            drain_started = time.perf_counter()
+            shutdown_logging()
+            drain = time.perf_counter() - drain_started
+        finally:
+            sys.stdout = stdout
+    return {
+        "requests_per_second": requests / elapsed,
+        "drain_seconds": drain,
+        "output_bytes": os.path.getsize(output_path)
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark request logging overhead.")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent requests, like the server threadpool")
+    parser.add_argument("--output", help="File the log output is written to (default: a temporary file)")
+    return parser.parse_args()
+
+def main():
+    """Main function."""
+    args = parse_args()
+    output_path = args.output or os.path.join(tempfile.mkdtemp(), "benchmark.log")
+
+    results = {mode: run_mode(mode, args.requests, args.concurrency, output_path) for mode in MODES}
+    configure_logging(log_format="text")
+
+    baseline = results["print"]["requests_per_second"]
+    print(f"{args.requests} requests per mode, concurrency {args.concurrency}")
+    print(f"{'mode':<15}{'req/s':>10}{'vs print':>10}{'drain s':>10}{'output KB':>12}")
+    for mode, result in results.items():
+        print(f"{mode:<15}{result['requests_per_second']:>10.0f}"
+              f"{result['requests_per_second'] / baseline:>9.2f}x"
+              f"{result['drain_seconds']:>10.2f}{result['output_bytes'] / 1024:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,142 @@
 #!/usr/bin/env python3
 """
-Script to clear all caches in Firestore.
-Usage: python clear_cache.py [company_name]
-If no company_name is provided, clears all caches.
+Script to clear caches in Firestore.
+Usage: python clear_cache.py [company_name] [--older-than HOURS] [--prefix PREFIX]
+                             [--lru COUNT] [--dry-run] [--workers N] [--batch-size N]
+If no company_name or policy is provided, clears all caches.
+
+Examples:
+    python clear_cache.py                     # clear everything
+    python clear_cache.py Tesco               # clear a single company
+    python clear_cache.py --older-than 48     # entries written more than 48 hours ago
+    python clear_cache.py --prefix tes        # entries whose key starts with "tes"
+    python clear_cache.py --lru 500           # the 500 least-recently-used entries
+    python clear_cache.py --older-than 24 --dry-run
 """
 
 import sys
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
-from app.services.storage import FirestoreService
+from app.services.storage import FirestoreService, MAX_BATCH_WRITES, DEFAULT_DELETE_WORKERS
+from app.utils.cache_keys import build_cache_key
 
-def clear_all_caches():
-    """Clear all cached results."""
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+def select_entries(entries: List[Dict[str, Any]], older_than_hours: Optional[float] = None,
+                   prefix: Optional[str] = None, lru_count: Optional[int] = None,
+                   now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Apply eviction policies to cache entries. Policies combine (all must match)."""
+
+    selected = entries
+
+    if prefix:
+        prefix = prefix.lower().replace(" ", "_")
+        selected = [e for e in selected if e["id"].startswith(prefix)]
+
+    if older_than_hours is not None:
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=older_than_hours)
+        # Entries without a timestamp can never be served, so treat them as expired
+        selected = [e for e in selected if not e.get("timestamp") or e["timestamp"] < cutoff]
+
+    if lru_count is not None:
+        selected = sorted(selected, key=lambda e: e.get("last_accessed") or _EPOCH)[:max(0, lru_count)]
+
+    return selected
+
+def evict_caches(older_than_hours: Optional[float] = None, prefix: Optional[str] = None,
+                 lru_count: Optional[int] = None, dry_run: bool = False,
+                 workers: int = DEFAULT_DELETE_WORKERS, batch_size: int = MAX_BATCH_WRITES):
+    """Evict cache entries matching the given policies using bulk deletes."""
     try:
         storage_service = FirestoreService()
-        
-        # Get all cache documents
-        cache_docs = storage_service.cache_collection.stream()
-        count = 0
-        
-        for doc in cache_docs:
-            doc.reference.delete()
-            count += 1
-            print(f"Deleted cache for: {doc.id}")
-        
-        print(f"\nCleared {count} cache entries.")
-        
+
+        entries = storage_service.list_cache_entries()
+        selected = select_entries(entries, older_than_hours, prefix, lru_count)
+
+        if dry_run:
+            for entry in selected:
+                print(f"Would delete cache for: {entry['id']} (last accessed {entry.get('last_accessed')})")
+            print(f"\nDry run: {len(selected)} of {len(entries)} cache entries would be removed.")
+            return True
+
+        count = storage_service.delete_documents(
+            (entry["reference"] for entry in selected),
+            batch_size=batch_size,
+            max_workers=workers
+        )
+        print(f"\nCleared {count} of {len(entries)} cache entries.")
+
     except Exception as e:
         print(f"Error clearing caches: {e}")
         return False
-    
+
     return True
 
-def clear_company_cache(company_name: str):
+def clear_all_caches(dry_run: bool = False, workers: int = DEFAULT_DELETE_WORKERS,
+                     batch_size: int = MAX_BATCH_WRITES):
+    """Clear all cached results."""
+    return evict_caches(dry_run=dry_run, workers=workers, batch_size=batch_size)
+
+def clear_company_cache(company_name: str, dry_run: bool = False):
     """Clear cache for a specific company."""
     try:
         storage_service = FirestoreService()
-        
-        # Delete the specific company's cache
-        doc_ref = storage_service.cache_collection.document(company_name.lower())
-        doc = doc_ref.get()
-        
-        if doc.exists:
-            doc_ref.delete()
-            print(f"Cache cleared for: {company_name}")
-        else:
+
+        # Delete the specific company's cache, snippet and deep-mode entries alike
+        doc_refs = [
+            storage_service.cache_collection.document(build_cache_key(company_name, deep=deep))
+            for deep in (None, True)
+        ]
+        existing = [ref for ref in doc_refs if ref.get().exists]
+
+        if not existing:
             print(f"No cache found for: {company_name}")
-        
+        elif dry_run:
+            print(f"Would clear cache for: {company_name} ({len(existing)} entries)")
+        else:
+            for doc_ref in existing:
+                doc_ref.delete()
+            print(f"Cache cleared for: {company_name}")
+
     except Exception as e:
         print(f"Error clearing cache for {company_name}: {e}")
         return False
-    
+
     return True
 
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Clear cached supplier extraction results.")
+    parser.add_argument("company_name", nargs="?", help="Clear the cache for a single company")
+    parser.add_argument("--older-than", type=float, metavar="HOURS",
+                        help="Only remove entries written more than HOURS ago")
+    parser.add_argument("--prefix", help="Only remove entries whose cache key starts with PREFIX")
+    parser.add_argument("--lru", type=int, metavar="COUNT",
+                        help="Remove the COUNT least-recently-used entries")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without deleting")
+    parser.add_argument("--workers", type=int, default=DEFAULT_DELETE_WORKERS,
+                        help="Parallel batch commit workers")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_WRITES,
+                        help=f"Deletes per batched write (max {MAX_BATCH_WRITES})")
+    return parser.parse_args(argv)
+
 def main():
     """Main function."""
     load_dotenv()
-    
-    if len(sys.argv) > 1:
-        company_name = sys.argv[1]
-        print(f"Clearing cache for: {company_name}")
-        success = clear_company_cache(company_name)
+    args = parse_args()
+
+    if args.company_name:
+        print(f"Clearing cache for: {args.company_name}")
+        success = clear_company_cache(args.company_name, dry_run=args.dry_run)
+    elif args.older_than is not None or args.prefix or args.lru is not None:
+        print("Evicting matching caches...")
+        success = evict_caches(args.older_than, args.prefix, args.lru, args.dry_run,
+                               args.workers, args.batch_size)
     else:
         print("Clearing all caches...")
-        success = clear_all_caches()
-    
+        success = clear_all_caches(args.dry_run, args.workers, args.batch_size)
+
     if success:
         print("Cache clearing completed successfully.")
     else:
@@ -71,4 +144,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Load test the API against simulated search, model and storage backends.
+Usage: python load_test.py [--requests N] [--concurrency N] [--hit-ratio R] [--json]
+
+Boots the real app (uvicorn on a free local port, or in process with --in-process) with
+the real search, extraction and storage services, whose Custom Search, Gemini and
+Firestore calls are answered by the doubles in simulated_backends.py. Each backend has
+its own latency distribution, error rate and throttling rate, given as
+MEDIAN_MS[:SIGMA[:ERROR_RATE[:THROTTLE_RATE]]]:
+
+  --search 200:0.4:0.005:0.005   Custom Search page calls
+  --model 400:0.5:0.005:0.005    Gemini calls, per cascade tier
+  --store 15:0.3                 Firestore reads, writes, queries and batch commits
+
+Traffic is closed-loop: each of --concurrency clients sends its next request as soon as
+the last one returns. A --hit-ratio share of requests go to a set of companies warmed
+into the cache first; the rest name a company never seen before. The report gives
+throughput, p50/p95/p99 latency for hits, misses and overall, backend call counts and the
+process's memory (server and clients share it).
+
+Search and model rate limits are lifted so the app itself is measured; --keep-rate-limits
+uses the configured ones. Caches other than the result cache, the search quota, the warm
+start snapshot and trace export are turned off.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import socket
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Settings the app reads at import, so this runs before app.main is imported."""
+    os.environ.update({
+        "PROVIDER_MODE": "live",
+        "CUSTOM_SEARCH_API_KEY": "simulated",
+        "CUSTOM_SEARCH_ENGINE_ID": "simulated",
+        "GOOGLE_CLOUD_PROJECT": "simulated",
+        "SEARCH_CACHE_PATH": "",
+        "EXTRACTION_CACHE_PATH": "",
+        "SEARCH_DAILY_QUOTA": "0",
+        "CACHE_SNAPSHOT_PATH": "",
+        "FIRESTORE_WARM_UP": "false",
+        "TRACING_EXPORTER": "none",
+        # Importing app.main tries to build the GCP-backed services and logs their failure;
+        # the harness builds its own, so that error is not shown
+        "LOG_LEVEL": "CRITICAL",
+    })
+    if not args.keep_rate_limits:
+        for api in ("CUSTOM_SEARCH", "VERTEX_AI"):
+            os.environ[f"{api}_RATE_LIMIT_QPS"] = "100000"
+            os.environ[f"{api}_RATE_LIMIT_BURST"] = "100000"
+            os.environ[f"{api}_RATE_LIMIT_CONCURRENCY"] = "1000"
+
+def build_services(api: Any, faults: Dict[str, Any]) -> None:
+    """Install the real services, backed by simulated clients, into app.main."""
+    from app.services.search import GoogleSearchService
+    from app.services.extraction import VertexAIExtractionService
+    from app.services.storage import FirestoreService
+    from app.utils.deduplication import SupplierDeduplicator
+    from simulated_backends import InMemoryFirestore, SimulatedModel, SimulatedSearchProvider
+
+    search = GoogleSearchService()
+    search.search_provider = SimulatedSearchProvider(faults["search"])
+    extraction = VertexAIExtractionService()
+    model = SimulatedModel(faults["model"])
+    for tier in extraction.cascade:
+        tier.model = model
+    extraction.model = model
+
+    api.search_service = search
+    api.extraction_service = extraction
+    api.storage_service = FirestoreService(client=InMemoryFirestore(faults["store"]))
+    api.deduplicator = SupplierDeduplicator()
+
+def memory_kb() -> Dict[str, int]:
+    """Resident and peak resident memory of this process, in KB."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as status:
+            fields = dict(line.split(":", 1) for line in status if ":" in line)
+        return {"rss": int(fields["VmRSS"].split()[0]), "peak": int(fields["VmHWM"].split()[0])}
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and KB elsewhere
+        peak = peak // 1024 if sys.platform == "darwin" else peak
+        return {"rss": peak, "peak": peak}
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "per_second": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+        "max_ms": round(values[-1] * 1000, 1) if values else 0.0
+    }
+
+class HttpTransport:
+    """Requests to the app served by uvicorn on a free local port, one session per client thread."""
+
+    def __init__(self, app: Any):
+        import uvicorn
+        import requests
+
+        self._requests = requests
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+        self._thread.start()
+        while not self.server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("uvicorn failed to start")
+            time.sleep(0.05)
+        self._local = threading.local()
+
+    def post(self, path: str, body: Dict[str, Any]) -> int:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        return session.post(self.base_url + path, json=body, timeout=300).status_code
+
+    def close(self) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+class InProcessTransport:
+    """Requests through the ASGI app directly, without a server or sockets."""
+
+    def __init__(self, app: Any):
+        from fastapi.testclient import TestClient
+        self.client = TestClient(app)
+
+    def post(self, path: str, body: Dict[str, Any]) -> int:
+        return self.client.post(path, json=body).status_code
+
+    def close(self) -> None:
+        self.client.close()
+
+def run_load(transport: Any, args: argparse.Namespace) -> Dict[str, Any]:
+    """Warm the hot companies, then send args.requests requests from args.concurrency clients."""
+    hot_companies = [f"Hot Company {n}" for n in range(args.hot_companies)]
+    extra = {"max_results": args.max_results} if args.max_results else {}
+
+    def body(company_name: str) -> Dict[str, Any]:
+        return {"company_name": company_name, **extra}
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(lambda name: transport.post("/extract-suppliers", body(name)), hot_companies))
+
+    lock = threading.Lock()
+    next_request = iter(range(args.requests))
+    latencies: Dict[str, List[float]] = {"hit": [], "miss": []}
+    statuses: Dict[str, int] = {}
+
+    def client(client_id: int) -> None:
+        rng = random.Random(f"{args.seed}-{client_id}")
+        while True:
+            with lock:
+                n = next(next_request, None)
+            if n is None:
+                return
+            kind = "hit" if hot_companies and rng.random() < args.hit_ratio else "miss"
+            company_name = rng.choice(hot_companies) if kind == "hit" else f"Cold Company {n}"
+            started = time.perf_counter()
+            try:
+                status = str(transport.post("/extract-suppliers", body(company_name)))
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[kind].append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    memory_before = memory_kb()
+    peak_rss = [memory_before["rss"]]
+    done = threading.Event()
+
+    def sample_memory() -> None:
+        while not done.wait(0.25):
+            peak_rss.append(memory_kb()["rss"])
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(client, range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    memory_after = memory_kb()
+
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "overall": summarize(latencies["hit"] + latencies["miss"], elapsed),
+        "hit": summarize(latencies["hit"], elapsed),
+        "miss": summarize(latencies["miss"], elapsed),
+        "statuses": statuses,
+        "memory_mb": {
+            "rss_before": round(memory_before["rss"] / 1024, 1),
+            "rss_after": round(memory_after["rss"] / 1024, 1),
+            "rss_peak_during_run": round(max(peak_rss + [memory_after["rss"]]) / 1024, 1),
+            "process_peak": round(memory_after["peak"] / 1024, 1)
+        }
+    }
+
+def print_report(report: Dict[str, Any]) -> None:
+    settings = report["settings"]
+    print(f"{settings['requests']} requests, concurrency {settings['concurrency']}, hit ratio {settings['hit_ratio']}, "
+          f"{report['elapsed_seconds']}s ({settings['transport']})")
+    print(f"{'':<9}{'requests':>10}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind in ("overall", "hit", "miss"):
+        row = report[kind]
+        print(f"{kind:<9}{row['requests']:>10}{row['per_second']:>9.1f}{row['p50_ms']:>10.1f}"
+              f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    print("statuses:", ", ".join(f"{status}={count}" for status, count in sorted(report["statuses"].items())))
+    print("backends:", ", ".join(
+        f"{name} {stats['calls']} calls/{stats['injected_errors']} errors/{stats['injected_throttles']} throttled"
+        for name, stats in report["backends"].items()
+    ))
+    memory = report["memory_mb"]
+    print(f"memory: RSS {memory['rss_before']} MB before, {memory['rss_after']} MB after, "
+          f"{memory['rss_peak_during_run']} MB peak during the run")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the API against simulated backends.")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests, after warm-up")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--hit-ratio", type=float, default=0.5, help="Share of requests for already-cached companies")
+    parser.add_argument("--hot-companies", type=int, default=20, help="Companies warmed into the cache")
+    parser.add_argument("--max-results", type=int, help="max_results sent with each request (default: the API's)")
+    spec = "MEDIAN_MS[:SIGMA[:ERROR_RATE[:THROTTLE_RATE]]]"
+    parser.add_argument("--search", default="200:0.4:0.005:0.005", help=f"Search latency and failures, {spec}")
+    parser.add_argument("--model", default="400:0.5:0.005:0.005", help=f"Model latency and failures, {spec}")
+    parser.add_argument("--store", default="15:0.3", help=f"Firestore latency and failures, {spec}")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for latencies, errors and traffic")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Use the configured search and model rate limits")
+    parser.add_argument("--in-process", action="store_true", help="Call the app in process instead of over HTTP")
+    parser.add_argument("--log-level", default="WARNING", help="App log level during the run")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Main function."""
+    args = parse_args(argv)
+    configure_environment(args)
+
+    import app.main as api
+    from app.utils.log import configure_logging
+    from simulated_backends import faults_from_spec
+
+    configure_logging(level=args.log_level)
+    faults = {name: faults_from_spec(getattr(args, name), seed=args.seed + offset)
+              for offset, name in enumerate(("search", "model", "store"))}
+    build_services(api, faults)
+
+    transport = InProcessTransport(api.app) if args.in_process else HttpTransport(api.app)
+    try:
+        report = run_load(transport, args)
+    finally:
+        transport.close()
+    report["settings"] = {
+        "requests": args.requests, "concurrency": args.concurrency, "hit_ratio": args.hit_ratio,
+        "transport": "in-process" if args.in_process else "http",
+        "search": args.search, "model": args.model, "store": args.store
+    }
+    report["backends"] = {name: injector.stats() for name, injector in faults.items()}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,12 @@ from app.services.search import GoogleSearchService
 from app.services.extraction import VertexAIExtractionService
 from app.utils.deduplication import SupplierDeduplicator
 from app.models.schemas import Supplier
+from app.utils.log import configure_logging
 
 def main():
     """Main CLI function."""
     load_dotenv()
+    configure_logging(log_format="text")
     
     # Check command line arguments
     if len(sys.argv) < 2:
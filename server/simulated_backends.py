@@ -0,0 +1,225 @@
+"""
+Simulated stand-ins for Custom Search, Gemini and Firestore, used by load_test.py and the
+tests to run the real pipeline without GCP. Unlike replay (app.services.providers),
+nothing needs recording first: responses are generated. Every call goes through a
+FaultInjector, which gives it a log-normal latency and may fail it.
+"""
+
+import re
+import json
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.services.providers import FaultInjector
+
+SUPPLIER_NAMES = (
+    "Moy Park", "Arla Foods", "Greencore", "Cranswick", "Müller", "Bakkavor", "Samworth Brothers",
+    "Kerry Group", "Dairy Crest", "Hovis", "Warburtons", "Noble Foods", "Pilgrim's UK", "Dawn Meats",
+    "ABP Food Group", "Hilton Foods", "Finsbury Food Group", "Premier Foods", "Fresca Group", "G's Fresh"
+)
+
+def faults_from_spec(spec: str, seed: Optional[int] = None) -> FaultInjector:
+    """Build from "MEDIAN_MS[:SIGMA[:ERROR_RATE[:THROTTLE_RATE]]]", e.g. "250:0.5:0.005:0.005"."""
+    parts = [float(part) for part in spec.split(":")] if spec else []
+    if not 1 <= len(parts) <= 4:
+        raise ValueError(f"Latency spec must be MEDIAN_MS[:SIGMA[:ERROR_RATE[:THROTTLE_RATE]]], got {spec!r}")
+    median_ms, sigma, error_rate, throttle_rate = parts + [0.0] * (4 - len(parts))
+    return FaultInjector(latency_seconds=median_ms / 1000, latency_sigma=sigma, error_rate=error_rate,
+                         throttle_rate=throttle_rate, seed=seed)
+
+def _company_from_query(query: str) -> str:
+    match = re.search(r'"([^"]+)"', query)
+    return match.group(1) if match else query.split(" suppliers")[0]
+
+class SimulatedSearchProvider:
+    """Search provider that makes up result pages naming suppliers of the queried company.
+
+    Results are deterministic per (company, query, page), so query variants overlap the
+    way real ones do, and each result links to a site with its own registrable domain.
+    """
+
+    def __init__(self, faults: FaultInjector, results_available: int = 50):
+        self.faults = faults
+        self.results_available = results_available
+
+    def search(self, query: str, start: int, num: int) -> Dict[str, Any]:
+        self.faults.before_call()
+        company = _company_from_query(query)
+        seed = sum(map(ord, company))
+        items = []
+        for position in range(start, min(start + num, self.results_available + 1)):
+            # Most positions are the same for every query variant of a company
+            variant = position if position % 3 else f"{position}-{sum(map(ord, query)) % 5}"
+            first = SUPPLIER_NAMES[(seed + position) % len(SUPPLIER_NAMES)]
+            second = SUPPLIER_NAMES[(seed + 3 * position) % len(SUPPLIER_NAMES)]
+            slug = re.sub(r"[^a-z0-9]+", "-", company.lower()).strip("-")
+            # A registrable domain per result, so the per-site cap does not fold them together
+            host = f"supplier{variant}-{slug}.com"
+            items.append({
+                "title": f"{company} supply chain update {variant}",
+                "snippet": f"{company} has extended its contracts with {first} and {second} for own-label lines.",
+                "link": f"https://{host}/suppliers",
+                "displayLink": host
+            })
+        return {"items": items}
+
+class SimulatedModel:
+    """Stands in for a GenerativeModel: names each known supplier mentioned in the prompt."""
+
+    def __init__(self, faults: FaultInjector, confidence: float = 0.85):
+        self.faults = faults
+        self.confidence = confidence
+
+    def generate_content(self, prompt: str, stream: bool = False) -> Any:
+        self.faults.before_call()
+        text = prompt.split("TEXT TO ANALYZE:", 1)[-1]
+        suppliers = [{"name": name, "confidence": self.confidence, "context": "Supplies own-label lines"}
+                     for name in SUPPLIER_NAMES if name in text]
+        body = json.dumps({"suppliers": suppliers})
+        response = SimpleNamespace(text=body, usage_metadata=SimpleNamespace(
+            prompt_token_count=len(prompt) // 4, candidates_token_count=len(body) // 4, cached_content_token_count=0
+        ))
+        return iter([response]) if stream else response
+
+class _Snapshot:
+    def __init__(self, reference: "_DocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+class _DocumentReference:
+    def __init__(self, collection: "InMemoryCollection", doc_id: str):
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self) -> _Snapshot:
+        self.collection.store.faults.before_call()
+        with self.collection.store.lock:
+            data = self.collection.documents.get(self.id)
+            return _Snapshot(self, dict(data) if data is not None else None)
+
+    def set(self, data: Dict[str, Any]) -> None:
+        self.collection.store.faults.before_call()
+        with self.collection.store.lock:
+            self.collection.documents[self.id] = dict(data)
+
+    def update(self, fields: Dict[str, Any]) -> None:
+        self.collection.store.faults.before_call()
+        with self.collection.store.lock:
+            if self.id not in self.collection.documents:
+                raise KeyError(f"No document to update: {self.id}")
+            self.collection.documents[self.id].update(fields)
+
+    def delete(self) -> None:
+        self.collection.store.faults.before_call()
+        with self.collection.store.lock:
+            self.collection.documents.pop(self.id, None)
+
+class _Query:
+    """The where/order_by/limit/select subset FirestoreService uses."""
+
+    def __init__(self, collection: "InMemoryCollection", filters: Tuple = (), order: Optional[Tuple[str, bool]] = None,
+                 limit: Optional[int] = None):
+        self.collection = collection
+        self.filters = filters
+        self.order = order
+        self._limit = limit
+
+    def where(self, field: str, op: str, value: Any) -> "_Query":
+        if op != "==":
+            raise NotImplementedError(f"Only == filters are simulated, got {op}")
+        return _Query(self.collection, self.filters + ((field, value),), self.order, self._limit)
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "_Query":
+        return _Query(self.collection, self.filters, (field, direction == "DESCENDING"), self._limit)
+
+    def limit(self, count: int) -> "_Query":
+        return _Query(self.collection, self.filters, self.order, count)
+
+    def select(self, fields: List[str]) -> "_Query":
+        return self
+
+    def stream(self) -> Iterator[_Snapshot]:
+        self.collection.store.faults.before_call()
+        with self.collection.store.lock:
+            docs = [(doc_id, dict(data)) for doc_id, data in self.collection.documents.items()
+                    if all(data.get(field) == value for field, value in self.filters)]
+        if self.order:
+            field, descending = self.order
+            docs.sort(key=lambda item: item[1].get(field) or datetime.min.replace(tzinfo=timezone.utc),
+                      reverse=descending)
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return iter([_Snapshot(_DocumentReference(self.collection, doc_id), data) for doc_id, data in docs])
+
+class InMemoryCollection(_Query):
+    def __init__(self, store: "InMemoryFirestore", name: str):
+        super().__init__(self)
+        self.store = store
+        self.name = name
+        self.documents: Dict[str, Dict[str, Any]] = {}
+
+    def document(self, doc_id: str) -> _DocumentReference:
+        return _DocumentReference(self, doc_id)
+
+    def add(self, data: Dict[str, Any]) -> Tuple[datetime, _DocumentReference]:
+        with self.store.lock:
+            self.store.next_id += 1
+            reference = _DocumentReference(self, f"doc{self.store.next_id}")
+        reference.set(data)
+        return datetime.now(timezone.utc), reference
+
+class _WriteBatch:
+    """Deletes and updates applied together on commit. Like Firestore, an update of a missing
+    document fails the whole batch."""
+
+    def __init__(self, store: "InMemoryFirestore"):
+        self.store = store
+        self.deletes: List[_DocumentReference] = []
+        self.updates: List[Tuple[_DocumentReference, Dict[str, Any]]] = []
+
+    def delete(self, reference: _DocumentReference) -> None:
+        self.deletes.append(reference)
+
+    def update(self, reference: _DocumentReference, fields: Dict[str, Any]) -> None:
+        self.updates.append((reference, dict(fields)))
+
+    def commit(self) -> None:
+        self.store.faults.before_call()
+        with self.store.lock:
+            missing = [reference.id for reference, _ in self.updates
+                       if reference.id not in reference.collection.documents]
+            if missing:
+                raise KeyError(f"No documents to update: {missing}")
+            for reference, fields in self.updates:
+                reference.collection.documents[reference.id].update(fields)
+            for reference in self.deletes:
+                reference.collection.documents.pop(reference.id, None)
+
+class InMemoryFirestore:
+    """A Firestore client double holding documents in memory, for FirestoreService(client=...).
+
+    Every read, write, query and batch commit costs one call of ``faults``. Documents are
+    copied in and out, as they would be serialized over the wire.
+    """
+
+    def __init__(self, faults: Optional[FaultInjector] = None):
+        self.faults = faults or FaultInjector()
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def collection(self, name: str) -> InMemoryCollection:
+        with self.lock:
+            if name not in self._collections:
+                self._collections[name] = InMemoryCollection(self, name)
+            return self._collections[name]
+
+    def batch(self) -> _WriteBatch:
+        return _WriteBatch(self)
@@ -24,14 +24,14 @@ class TestAPIEndpoints:
         mock_storage.get_cached_result.return_value = None
         
         # Mock search results
-        mock_search.search_company_suppliers.return_value = [
+        mock_search.iter_search_pages.return_value = iter([[
             {
                 "title": "Tesco Suppliers",
                 "snippet": "Tesco works with ABC Corp and XYZ Ltd",
                 "link": "http://example.com",
                 "displayLink": "example.com"
             }
-        ]
+        ]])
         
         # Mock extraction results
         mock_extraction.extract_suppliers_from_search_results.return_value = [
@@ -93,7 +93,7 @@ class TestAPIEndpoints:
         mock_storage.get_cached_result.return_value = None
         
         # Mock empty search results
-        mock_search.search_company_suppliers.return_value = []
+        mock_search.iter_search_pages.return_value = iter([])
         
         response = client.post("/extract-suppliers", json={
             "company_name": "UnknownCompany",
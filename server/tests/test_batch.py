@@ -0,0 +1,137 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from app.services.batch import (
+    BatchExtractionPipeline, BatchPredictionBackend, LocalBatchBackend, VertexBatchBackend, prompt_key
+)
+from app.services.extraction import VertexAIExtractionService
+from app.services.extraction_cache import ExtractionCache
+from app.utils.deduplication import SupplierDeduplicator
+from app.utils.local_cache import SqliteCache
+from app.utils.result_dedup import SearchResultDeduplicator
+
+SEARCH_RESULTS = {
+    "Tesco": [
+        {"title": "Tesco poultry", "snippet": "Tesco works with Moy Park on poultry.", "link": "https://a.com"},
+        {"title": "Tesco dairy", "snippet": "Arla Foods supplies Tesco own-brand milk.", "link": "https://b.com"},
+    ],
+    "Asda": [
+        {"title": "Asda logistics", "snippet": "XPO Logistics runs reverse logistics for Asda.", "link": "https://c.com"},
+    ],
+}
+
+def fake_model(prompt):
+    for name in ("Moy Park", "Arla Foods", "XPO Logistics"):
+        if f"Snippet: {name}" in prompt or f"with {name}" in prompt:
+            return json.dumps({"suppliers": [{"name": name, "confidence": 0.9}]})
+    return json.dumps({"suppliers": []})
+
+class TestBatchPipeline:
+    def setup_method(self):
+        self.service = VertexAIExtractionService.__new__(VertexAIExtractionService)
+        self.service.model_name = "test-model"
+        self.service.model = MagicMock()
+        self.service.extraction_cache = ExtractionCache(SqliteCache(":memory:"))
+        self.service.result_deduplicator = SearchResultDeduplicator()
+        self.storage = MagicMock()
+        self.model_calls = []
+
+        def generate(prompt):
+            self.model_calls.append(prompt)
+            return fake_model(prompt)
+
+        self.pipeline = BatchExtractionPipeline(
+            self.service, self.storage, SupplierDeduplicator(), LocalBatchBackend(generate)
+        )
+
+    def run(self, tmp_path, name="batch"):
+        self.pipeline.work_dir = tmp_path
+        batch_dir = self.pipeline.prepare(SEARCH_RESULTS, 20, batch_name=name)
+        return batch_dir, self.pipeline.ingest(batch_dir, self.pipeline.run(batch_dir))
+
+    def test_prompts_match_online_extraction(self, tmp_path):
+        batch_dir, _ = self.run(tmp_path)
+
+        lines = [json.loads(l) for l in (batch_dir / "input.jsonl").read_text().splitlines()]
+        expected = self.service._build_extraction_prompt(
+            "Tesco", "Title: Tesco poultry\nSnippet: Tesco works with Moy Park on poultry.", "https://a.com"
+        )
+        assert len(lines) == 3
+        assert expected in [l["request"]["contents"][0]["parts"][0]["text"] for l in lines]
+        assert lines[0]["request"]["generationConfig"]["responseMimeType"] == "application/json"
+
+    def test_results_reach_audit_and_cache(self, tmp_path):
+        _, stored = self.run(tmp_path)
+
+        assert stored == {"Tesco": 2, "Asda": 1}
+        audit = {c[0][0]: c[0] for c in self.storage.store_extraction_result.call_args_list}
+        assert {s["name"] for s in audit["Tesco"][1]} == {"Moy Park", "Arla Foods"}
+        assert audit["Tesco"][4]["calls"] == 2
+        cached = {c[0][0]: c[0] for c in self.storage.cache_result.call_args_list}
+        assert cached["Asda"][4] == ["https://c.com"]
+        assert cached["Asda"][1][0]["source_url"] == "https://c.com"
+
+    def test_online_extraction_reuses_batch_output(self, tmp_path):
+        self.run(tmp_path)
+
+        suppliers = self.service.extract_suppliers_from_search_results("Asda", SEARCH_RESULTS["Asda"])
+
+        assert [s["name"] for s in suppliers] == ["XPO Logistics"]
+        self.service.model.generate_content.assert_not_called()
+
+    def test_cached_chunks_are_not_resubmitted(self, tmp_path):
+        self.run(tmp_path, "first")
+        self.model_calls.clear()
+
+        self.pipeline.backend = MagicMock(spec=BatchPredictionBackend)
+
+        batch_dir, stored = self.run(tmp_path, "second")
+
+        assert (batch_dir / "input.jsonl").read_text() == ""
+        # An empty input is never submitted; Vertex rejects it
+        self.pipeline.backend.run.assert_not_called()
+        assert stored == {"Tesco": 2, "Asda": 1}
+
+    def test_failed_lines_are_skipped(self, tmp_path):
+        def flaky(prompt):
+            if "XPO" in prompt:
+                raise RuntimeError("quota")
+            return fake_model(prompt)
+
+        self.pipeline.backend = LocalBatchBackend(flaky)
+        _, stored = self.run(tmp_path)
+
+        assert stored == {"Tesco": 2, "Asda": 0}
+        assert {c[0][0] for c in self.storage.store_extraction_result.call_args_list} == {"Tesco", "Asda"}
+        assert [c[0][0] for c in self.storage.cache_result.call_args_list] == ["Tesco"]
+
+    def test_unparsed_responses_are_not_cached(self, tmp_path):
+        self.pipeline.backend = LocalBatchBackend(
+            lambda prompt: "not json" if "Arla" in prompt else fake_model(prompt)
+        )
+        _, stored = self.run(tmp_path)
+
+        assert stored == {"Tesco": 1, "Asda": 1}
+        assert [c[0][0] for c in self.storage.cache_result.call_args_list] == ["Asda"]
+
+    def test_backend_must_implement_run(self):
+        with pytest.raises(TypeError):
+            BatchPredictionBackend()
+
+    def test_output_shards_are_joined_on_line_boundaries(self, tmp_path):
+        input_path = tmp_path / "input.jsonl"
+        input_path.write_text("{}\n")
+        shards = [MagicMock(), MagicMock()]
+        shards[0].name, shards[0].download_as_bytes.return_value = "out/0.jsonl", b'{"a": 1}\n{"b": 2}'
+        shards[1].name, shards[1].download_as_bytes.return_value = "out/1.jsonl", b'{"c": 3}\n'
+        job = MagicMock(has_ended=True, has_succeeded=True, output_location="gs://bucket/out")
+
+        with patch("google.cloud.storage.Client") as client, \
+                patch("vertexai.batch_prediction.BatchPredictionJob.submit", return_value=job):
+            client.return_value.list_blobs.return_value = shards
+            output_path = VertexBatchBackend("bucket").run(input_path, "test-model", tmp_path)
+
+        assert [json.loads(line) for line in output_path.read_text().splitlines()] == [{"a": 1}, {"b": 2}, {"c": 3}]
+
+    def test_prompt_key_is_stable(self):
+        assert prompt_key("a") == prompt_key("a") != prompt_key("b")
@@ -0,0 +1,193 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from app.services.cache import CachePolicy, CacheMetrics, MemoryCache, select_store_evictions
+from app.services.storage import FirestoreService
+
+def make_entry(names, **extra):
+    now = datetime.now(timezone.utc)
+    return {
+        "suppliers": [{"name": n, "confidence": 0.9} for n in names],
+        "timestamp": now,
+        "expires_at": now + timedelta(hours=1),
+        **extra
+    }
+
+class TestCachePolicy:
+    def setup_method(self):
+        self.policy = CachePolicy(ttl_hours=24, min_ttl_hours=6, max_ttl_hours=168)
+
+    def test_first_extraction_uses_default_ttl(self):
+        ttl, stability = self.policy.ttl_for([{"name": "ABC"}])
+        assert ttl == timedelta(hours=24)
+        assert stability == 0.5
+
+    def test_stable_supplier_set_extends_ttl(self):
+        previous = make_entry(["ABC", "XYZ"], stability=0.9)
+        ttl, stability = self.policy.ttl_for([{"name": "ABC"}, {"name": "xyz"}], previous)
+        assert stability == pytest.approx(0.95)
+        assert ttl > timedelta(hours=150)
+
+    def test_churning_supplier_set_shortens_ttl(self):
+        previous = make_entry(["ABC", "XYZ"], stability=0.1)
+        ttl, stability = self.policy.ttl_for([{"name": "Other"}], previous)
+        assert stability == pytest.approx(0.05)
+        assert ttl < timedelta(hours=24)
+
+    def test_adaptive_ttl_can_be_disabled(self):
+        policy = CachePolicy(ttl_hours=12, adaptive_ttl=False)
+        ttl, _ = policy.ttl_for([{"name": "Other"}], make_entry(["ABC"], stability=1.0))
+        assert ttl == timedelta(hours=12)
+
+    def test_legacy_entries_expire_after_default_ttl(self):
+        entry = {"timestamp": datetime.now(timezone.utc) - timedelta(hours=25)}
+        assert self.policy.is_expired(entry)
+        entry = {"timestamp": datetime.now(timezone.utc) - timedelta(hours=1)}
+        assert not self.policy.is_expired(entry)
+
+class TestMemoryCache:
+    def setup_method(self):
+        self.metrics = CacheMetrics()
+
+    def test_hit_and_miss_metrics(self):
+        cache = MemoryCache(CachePolicy(), self.metrics)
+        cache.set("tesco", make_entry(["ABC"]))
+        assert cache.get("tesco") is not None
+        assert cache.get("asda") is None
+        stats = self.metrics.snapshot()["memory"]
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_expired_entries_are_dropped(self):
+        cache = MemoryCache(CachePolicy(), self.metrics)
+        entry = make_entry(["ABC"])
+        entry["expires_at"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+        cache.set("tesco", entry)
+        assert cache.get("tesco") is None
+        assert len(cache) == 0
+        assert self.metrics.snapshot()["memory"]["expirations"] == 1
+
+    def test_memory_ttl_bounds_staleness(self):
+        cache = MemoryCache(CachePolicy(memory_ttl_seconds=60), self.metrics)
+        cache.set("tesco", make_entry(["ABC"]), inserted_at=datetime.now(timezone.utc) - timedelta(minutes=5))
+        assert cache.get("tesco") is None
+
+    def test_evicts_least_recently_used_by_count(self):
+        cache = MemoryCache(CachePolicy(memory_max_entries=2), self.metrics)
+        cache.set("a", make_entry(["A"]))
+        cache.set("b", make_entry(["B"]))
+        cache.get("a")
+        cache.set("c", make_entry(["C"]))
+        assert [key for key, _, _ in cache.items()] == ["a", "c"]
+        assert self.metrics.snapshot()["memory"]["evictions"] == 1
+
+    def test_evicts_by_byte_size(self):
+        cache = MemoryCache(CachePolicy(memory_max_bytes=250), self.metrics)
+        for key in "abcde":
+            cache.set(key, make_entry([key * 20]))
+        assert cache.size_bytes <= 250
+        assert len(cache) < 5
+
+class TestSelectStoreEvictions:
+    def test_expired_then_lru_beyond_limits(self):
+        now = datetime.now(timezone.utc)
+        entries = [
+            {"id": "old", "timestamp": now - timedelta(days=2), "expires_at": now - timedelta(days=1),
+             "last_accessed": now - timedelta(days=2), "size_bytes": 100},
+            {"id": "cold", "timestamp": now, "expires_at": now + timedelta(days=1),
+             "last_accessed": now - timedelta(hours=5), "size_bytes": 100},
+            {"id": "warm", "timestamp": now, "expires_at": now + timedelta(days=1),
+             "last_accessed": now - timedelta(hours=1), "size_bytes": 100},
+            {"id": "hot", "timestamp": now, "expires_at": now + timedelta(days=1),
+             "last_accessed": now, "size_bytes": 100},
+        ]
+        expired, evicted = select_store_evictions(entries, CachePolicy(store_max_entries=2), now)
+        assert [e["id"] for e in expired] == ["old"]
+        assert [e["id"] for e in evicted] == ["cold"]
+
+        _, evicted = select_store_evictions(entries, CachePolicy(store_max_bytes=100), now)
+        assert [e["id"] for e in evicted] == ["cold", "warm"]
+
+class TestTieredLookup:
+    def setup_method(self):
+        self.service = FirestoreService.__new__(FirestoreService)
+        self.service.cache_collection = MagicMock()
+        self.service._init_cache_tiers(CachePolicy())
+        self.doc = self.service.cache_collection.document.return_value.get.return_value
+
+    def test_firestore_hit_populates_memory_tier(self):
+        self.doc.exists = True
+        self.doc.to_dict.return_value = make_entry(["ABC"])
+
+        assert self.service.get_cached_result("Tesco") is not None
+        assert self.service.get_cached_result("Tesco") is not None
+
+        assert self.service.cache_collection.document.return_value.get.call_count == 1
+        tiers = self.service.get_cache_metrics()["tiers"]
+        assert tiers["firestore"]["hits"] == 1
+        assert tiers["memory"]["hits"] == 1
+
+    def test_accesses_are_buffered_and_flushed_in_a_batch(self):
+        self.service.db = MagicMock()
+        self.doc.exists = True
+        self.doc.to_dict.return_value = make_entry(["ABC"])
+
+        self.service.get_cached_result("Tesco")
+        self.service.get_cached_result("Tesco")
+        self.service.get_cached_result("Arla")
+
+        self.doc.reference.update.assert_not_called()
+        assert self.service.flush_cache_accesses() == 2
+        batch = self.service.db.batch.return_value
+        assert batch.update.call_count == 2
+        batch.commit.assert_called_once()
+        assert self.service.flush_cache_accesses() == 0
+
+    def test_adaptive_ttl_reads_previous_entry_from_memory(self):
+        self.doc.exists = False
+        suppliers = [{"name": "ABC", "confidence": 0.9}]
+        self.service.cache_result("Tesco", suppliers, 1.0)
+        self.service.cache_result("Tesco", suppliers, 1.0)
+
+        assert self.service.cache_collection.document.return_value.get.call_count == 1
+        written = self.service.cache_collection.document.return_value.set.call_args[0][0]
+        assert written["stability"] > 0.5
+
+    def test_entry_from_fewer_results_is_a_miss(self):
+        self.service.db = MagicMock()
+        self.doc.exists = True
+        self.doc.to_dict.return_value = make_entry(["ABC"], max_results=10)
+
+        assert self.service.get_cached_result("Tesco", max_results=20) is None
+        assert len(self.service.memory_cache) == 0
+        assert self.service.get_cached_result("Tesco", max_results=10) is not None
+        assert self.service.get_cached_result("Tesco", max_results=20) is None
+
+        tiers = self.service.get_cache_metrics()["tiers"]
+        assert tiers["firestore"] == {**tiers["firestore"], "hits": 1, "misses": 1}
+        assert tiers["memory"]["hits"] == 0
+        assert tiers["memory"]["misses"] == 3
+        # The entry in memory already answers for Firestore, which is not read again
+        assert self.service.cache_collection.document.return_value.get.call_count == 2
+        assert self.service.flush_cache_accesses() == 1
+
+    def test_expired_firestore_entry_is_a_miss(self):
+        self.doc.exists = True
+        self.doc.to_dict.return_value = make_entry(["ABC"], expires_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+
+        assert self.service.get_cached_result("Tesco") is None
+        tiers = self.service.get_cache_metrics()["tiers"]
+        assert tiers["firestore"]["expirations"] == 1
+        assert tiers["firestore"]["misses"] == 1
+
+    def test_cache_result_writes_per_entry_ttl(self):
+        self.doc.exists = False
+
+        self.service.cache_result("Tesco", [{"name": "ABC", "confidence": 0.9}], 1.0)
+
+        written = self.service.cache_collection.document.return_value.set.call_args[0][0]
+        assert written["ttl_seconds"] == 24 * 3600
+        assert written["expires_at"] - written["timestamp"] == timedelta(hours=24)
+        assert written["size_bytes"] > 0
+        assert self.service.get_cached_result("Tesco") is not None
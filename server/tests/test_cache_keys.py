@@ -0,0 +1,67 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from app.services.storage import FirestoreService
+from app.utils.cache_keys import build_cache_key, canonicalize_company_name
+
+class TestCanonicalizeCompanyName:
+    def test_trivial_variants_share_a_name(self):
+        assert canonicalize_company_name("Tesco") == "tesco"
+        assert canonicalize_company_name("Tesco PLC") == "tesco"
+        assert canonicalize_company_name("tesco ") == "tesco"
+        assert canonicalize_company_name("TESCO Stores Ltd.") == "tesco_stores"
+
+    def test_punctuation_and_articles(self):
+        assert canonicalize_company_name("Sainsbury's") == "sainsbury_s"
+        assert canonicalize_company_name("The Co-operative Group") == "co_operative"
+        assert canonicalize_company_name("Marks & Spencer") == "marks_and_spencer"
+
+    def test_suffix_alone_is_kept(self):
+        assert canonicalize_company_name("Group") == "group"
+
+class TestBuildCacheKey:
+    def test_variants_share_a_key(self):
+        assert build_cache_key("Tesco") == build_cache_key("Tesco PLC") == build_cache_key("tesco ")
+
+    def test_params_change_the_key(self):
+        assert build_cache_key("Tesco", deep=True) != build_cache_key("Tesco")
+        assert build_cache_key("Tesco", deep=None) == build_cache_key("Tesco")
+
+    def test_key_starts_with_canonical_name(self):
+        assert build_cache_key("Tesco PLC").startswith("tesco__")
+
+class TestCachedResultLookup:
+    def setup_method(self):
+        self.service = FirestoreService.__new__(FirestoreService)
+        self.service.cache_collection = MagicMock()
+        self.service._init_cache_tiers()
+        self.links = [f"http://example.com/{i}" for i in range(20)]
+        self.entry = {
+            "company_name": "Tesco",
+            "suppliers": [
+                {"name": "Early Supplier", "confidence": 0.9, "source_url": self.links[1]},
+                {"name": "Late Supplier", "confidence": 0.8, "source_url": self.links[15]},
+            ],
+            "total_suppliers": 2,
+            "processing_time": 1.0,
+            "max_results": 20,
+            "source_links": self.links,
+            "timestamp": datetime.now(timezone.utc),
+        }
+        doc = self.service.cache_collection.document.return_value.get.return_value
+        doc.exists = True
+        doc.to_dict.return_value = self.entry
+
+    def test_larger_entry_answers_smaller_request(self):
+        result = self.service.get_cached_result("Tesco PLC", max_results=5)
+        assert [s["name"] for s in result["suppliers"]] == ["Early Supplier"]
+        assert result["total_suppliers"] == 1
+        self.service.cache_collection.document.assert_called_with(build_cache_key("Tesco"))
+
+    def test_same_size_request_returns_entry(self):
+        result = self.service.get_cached_result("Tesco", max_results=20)
+        assert result["total_suppliers"] == 2
+
+    def test_smaller_entry_cannot_answer_larger_request(self):
+        self.entry["max_results"] = 5
+        assert self.service.get_cached_result("Tesco", max_results=20) is None
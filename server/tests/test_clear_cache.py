@@ -0,0 +1,74 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from app.services.storage import FirestoreService
+from clear_cache import select_entries
+
+NOW = datetime(2024, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+def make_entry(doc_id, age_hours, accessed_hours_ago=None):
+    timestamp = NOW - timedelta(hours=age_hours)
+    accessed = NOW - timedelta(hours=accessed_hours_ago) if accessed_hours_ago is not None else timestamp
+    return {"id": doc_id, "reference": MagicMock(name=doc_id), "timestamp": timestamp, "last_accessed": accessed}
+
+class TestSelectEntries:
+    def setup_method(self):
+        self.entries = [
+            make_entry("tesco", 30, accessed_hours_ago=1),
+            make_entry("tesla", 2, accessed_hours_ago=2),
+            make_entry("asda", 50, accessed_hours_ago=40),
+            make_entry("lidl", 5, accessed_hours_ago=5),
+        ]
+
+    def test_no_policy_selects_everything(self):
+        assert len(select_entries(self.entries, now=NOW)) == 4
+
+    def test_older_than(self):
+        selected = select_entries(self.entries, older_than_hours=24, now=NOW)
+        assert {e["id"] for e in selected} == {"tesco", "asda"}
+
+    def test_prefix_is_case_insensitive(self):
+        selected = select_entries(self.entries, prefix="TES", now=NOW)
+        assert {e["id"] for e in selected} == {"tesco", "tesla"}
+
+    def test_lru_orders_by_last_access(self):
+        selected = select_entries(self.entries, lru_count=2, now=NOW)
+        assert [e["id"] for e in selected] == ["asda", "lidl"]
+
+    def test_policies_combine(self):
+        selected = select_entries(self.entries, older_than_hours=24, prefix="tes", now=NOW)
+        assert [e["id"] for e in selected] == ["tesco"]
+
+class TestBulkDelete:
+    def setup_method(self):
+        self.service = FirestoreService.__new__(FirestoreService)
+        self.service.db = MagicMock()
+        # Batches are committed from worker threads; give each its own mock so counts are exact
+        self.batches = []
+        self.service.db.batch.side_effect = self._new_batch
+
+    def _new_batch(self):
+        batch = MagicMock()
+        self.batches.append(batch)
+        return batch
+
+    def test_deletes_in_batches(self):
+        refs = [MagicMock() for _ in range(1234)]
+
+        deleted = self.service.delete_documents(refs, batch_size=500, max_workers=4)
+
+        assert deleted == 1234
+        assert len(self.batches) == 3
+        assert all(b.commit.call_count == 1 for b in self.batches)
+        assert sorted(b.delete.call_count for b in self.batches) == [234, 500, 500]
+
+    def test_batch_size_is_capped_at_firestore_limit(self):
+        refs = [MagicMock() for _ in range(1000)]
+
+        self.service.delete_documents(refs, batch_size=10_000)
+
+        assert len(self.batches) == 2
+
+    def test_nothing_to_delete(self):
+        assert self.service.delete_documents([]) == 0
+        assert self.batches == []
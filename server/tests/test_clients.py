@@ -0,0 +1,53 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from app.services import clients
+from app.services.storage import FirestoreService
+
+class TestFirestoreClientFactory:
+    def setup_method(self):
+        clients.reset_clients()
+
+    def teardown_method(self):
+        clients.reset_clients()
+
+    @patch('app.services.clients.firestore.Client')
+    def test_client_is_shared_across_threads(self, mock_client):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: clients.get_firestore_client("test-project"), range(32)))
+
+        assert mock_client.call_count == 1
+        assert all(r is results[0] for r in results)
+
+    @patch('app.services.clients.firestore.Client')
+    def test_one_client_per_project(self, mock_client):
+        mock_client.side_effect = lambda project: MagicMock(project=project)
+
+        a = clients.get_firestore_client("project-a")
+        b = clients.get_firestore_client("project-b")
+
+        assert a is not b
+        assert mock_client.call_count == 2
+
+    @patch('app.services.clients.firestore.Client')
+    def test_services_share_the_client(self, mock_client):
+        with patch.dict('os.environ', {"GOOGLE_CLOUD_PROJECT": "test-project"}):
+            first = FirestoreService()
+            second = FirestoreService()
+
+        assert first.db is second.db
+        assert mock_client.call_count == 1
+
+    def test_missing_project_raises(self):
+        with patch.dict('os.environ', {}, clear=True):
+            with pytest.raises(ValueError):
+                clients.get_firestore_client()
+
+    @patch('app.services.clients.get_firestore_client')
+    def test_warm_up_reads_one_document(self, mock_get_client):
+        assert clients.warm_up_firestore("test-project") is not None
+        mock_get_client.return_value.collection.return_value.limit.assert_called_with(1)
+
+    @patch('app.services.clients.get_firestore_client', side_effect=Exception("no credentials"))
+    def test_warm_up_failure_is_not_fatal(self, mock_get_client):
+        assert clients.warm_up_firestore("test-project") is None
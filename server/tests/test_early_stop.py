@@ -0,0 +1,106 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import rate_limit
+from app.services.search import GoogleSearchService
+from app.utils.early_stop import EarlyStopPolicy
+
+def page(kwargs):
+    query = kwargs["q"].split()[-1]
+    return {"items": [{"title": f"{query} {kwargs['start'] + i}", "link": f"https://{query}{kwargs['start'] + i}.com/"}
+                      for i in range(10)]}
+
+class TestEarlyStopPolicy:
+    def test_stops_on_target(self):
+        tracker = EarlyStopPolicy(target_suppliers=5, min_new_suppliers=0).tracker()
+        assert not tracker.record_page(3)
+        assert tracker.record_page(5)
+        assert tracker.stop_reason == "target"
+
+    def test_stops_when_yield_drops_after_min_pages(self):
+        policy = EarlyStopPolicy(target_suppliers=0, min_new_suppliers=2, min_pages=2)
+        tracker = policy.tracker()
+        assert not tracker.record_page(0)
+        assert not tracker.record_page(1)
+        assert not tracker.record_page(4)
+        assert tracker.record_page(5)
+        assert tracker.stop_reason == "yield"
+        assert policy.stats()["stopped_on_yield"] == 1
+        assert policy.stats()["pages"] == 4
+
+    def test_disabled(self):
+        tracker = EarlyStopPolicy(target_suppliers=0, min_new_suppliers=0).tracker()
+        assert not any(tracker.record_page(0) for _ in range(5))
+
+class TestLazySearchPages:
+    def setup_method(self):
+        rate_limit.reset_rate_limiters()
+        self.service = GoogleSearchService.__new__(GoogleSearchService)
+        self.service.api_key, self.service.search_engine_id = "key", "cx"
+        self.service.query_templates = ["{company} one", "{company} two"]
+
+    def teardown_method(self):
+        rate_limit.reset_rate_limiters()
+
+    def pages(self, max_results, consume):
+        with patch("app.services.search.build") as build:
+            cse_list = build.return_value.cse.return_value.list
+            cse_list.side_effect = lambda **kwargs: MagicMock(execute=lambda: page(kwargs))
+            pages = []
+            for results in self.service.iter_search_pages("Tesco", max_results):
+                pages.append(results)
+                if len(pages) == consume:
+                    break
+        return pages, cse_list
+
+    def test_rounds_are_split_into_pages(self):
+        pages, calls = self.pages(40, consume=None)
+
+        assert [len(p) for p in pages] == [10, 10, 10, 10]
+        assert calls.call_count == 4
+        links = [r["link"] for p in pages for r in p]
+        assert len(set(links)) == 40
+
+    def test_next_round_is_fetched_only_on_demand(self):
+        pages, calls = self.pages(40, consume=2)
+
+        assert len(pages) == 2
+        assert calls.call_count == 2
+        assert all(c.kwargs["start"] == 1 for c in calls.call_args_list)
+
+    def test_stops_at_max_results(self):
+        pages, calls = self.pages(15, consume=None)
+        assert sum(len(p) for p in pages) == 15
+        assert calls.call_count == 2
+
+class TestEarlyStopPipeline:
+    @patch('app.main.early_stop_policy', EarlyStopPolicy(target_suppliers=2, min_new_suppliers=0))
+    @patch('app.main.search_service')
+    @patch('app.main.extraction_service')
+    @patch('app.main.storage_service')
+    @patch('app.main.deduplicator')
+    def test_stops_fetching_once_target_is_reached(self, mock_dedup, mock_storage, mock_extraction, mock_search):
+        fetched = []
+
+        def pages(company_name, max_results, outcome):
+            for n in range(3):
+                fetched.append(n)
+                yield [{"title": f"Page {n}", "snippet": "", "link": f"https://{n}.com"}]
+
+        mock_storage.get_cached_result.return_value = None
+        mock_search.iter_search_pages.side_effect = pages
+        mock_extraction.extract_suppliers_from_search_results.side_effect = [
+            [{"name": "Moy Park", "confidence": 0.9}],
+            [{"name": "Arla Foods", "confidence": 0.9}],
+        ]
+        mock_dedup.deduplicate_suppliers.side_effect = lambda suppliers, **kwargs: list(suppliers)
+
+        response = TestClient(app).post("/extract-suppliers", json={"company_name": "Tesco"})
+
+        assert response.status_code == 200
+        assert response.json()["total_suppliers"] == 2
+        assert fetched == [0, 1]
+        assert mock_extraction.extract_suppliers_from_search_results.call_count == 2
+        stored_results = mock_storage.store_extraction_result.call_args[0][3]
+        assert [r["link"] for r in stored_results] == ["https://0.com", "https://1.com"]
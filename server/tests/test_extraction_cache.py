@@ -0,0 +1,91 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from app.services.extraction import VertexAIExtractionService
+from app.services.extraction_cache import ExtractionCache
+from app.utils.local_cache import SqliteCache
+
+def model_response(suppliers):
+    return MagicMock(text=json.dumps({"suppliers": suppliers}))
+
+class TestSqliteCache:
+    def test_round_trip(self, tmp_path):
+        cache = SqliteCache(str(tmp_path / "cache.sqlite3"))
+        cache.set("key", [{"name": "ABC"}])
+        assert cache.get("key") == [{"name": "ABC"}]
+        assert cache.get("other") is None
+        assert cache.stats()["hits"] == 1
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        SqliteCache(path).set("key", {"value": 1})
+        reopened = SqliteCache(path)
+        assert reopened.get("key") == {"value": 1}
+        assert len(reopened) == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = SqliteCache(":memory:", max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert len(cache) == 2
+        assert cache.evictions == 1
+
+    def test_expired_entries_are_misses(self):
+        cache = SqliteCache(":memory:", ttl_seconds=-1)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+class TestExtractionCacheKey:
+    def test_key_depends_on_every_component(self):
+        base = ExtractionCache.make_key("model", 1, "Tesco", "snippet")
+        assert base == ExtractionCache.make_key("model", 1, "Tesco PLC", "snippet")
+        assert base != ExtractionCache.make_key("other-model", 1, "Tesco", "snippet")
+        assert base != ExtractionCache.make_key("model", 2, "Tesco", "snippet")
+        assert base != ExtractionCache.make_key("model", 1, "Asda", "snippet")
+        assert base != ExtractionCache.make_key("model", 1, "Tesco", "snippet!")
+
+class TestCachedExtraction:
+    def setup_method(self):
+        self.service = VertexAIExtractionService.__new__(VertexAIExtractionService)
+        self.service.model_name = "test-model"
+        self.service.model = MagicMock()
+        self.service.extraction_cache = ExtractionCache(SqliteCache(":memory:"))
+
+    def test_unchanged_snippet_skips_model(self):
+        self.service.model.generate_content.return_value = model_response([{"name": "ABC", "confidence": 0.9}])
+
+        first = self.service.extract_suppliers_from_text("Tesco", "Tesco buys from ABC")
+        second = self.service.extract_suppliers_from_text("Tesco", "Tesco buys from ABC")
+
+        assert first == second == [{"name": "ABC", "confidence": 0.9}]
+        assert self.service.model.generate_content.call_count == 1
+
+    def test_changed_snippet_calls_model(self):
+        self.service.model.generate_content.return_value = model_response([])
+
+        self.service.extract_suppliers_from_text("Tesco", "Tesco buys from ABC")
+        self.service.extract_suppliers_from_text("Tesco", "Tesco buys from XYZ")
+
+        assert self.service.model.generate_content.call_count == 2
+
+    def test_cached_results_are_not_shared_mutably(self):
+        self.service.model.generate_content.return_value = model_response([{"name": "ABC", "confidence": 0.9}])
+
+        first = self.service.extract_suppliers_from_text("Tesco", "Tesco buys from ABC")
+        first[0]["source_url"] = "http://a.example"
+        second = self.service.extract_suppliers_from_text("Tesco", "Tesco buys from ABC")
+
+        assert "source_url" not in second[0]
+
+    def test_parse_failures_are_not_cached(self):
+        self.service.model.generate_content.return_value = MagicMock(text="not json")
+
+        assert self.service.extract_suppliers_from_text("Tesco", "snippet") == []
+        self.service.extract_suppliers_from_text("Tesco", "snippet")
+
+        assert self.service.model.generate_content.call_count == 2
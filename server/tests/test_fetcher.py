@@ -0,0 +1,163 @@
+import time
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.extraction import VertexAIExtractionService
+from app.services.fetcher import DocumentFetcher, html_to_text
+
+PAGE = """<html><head><title>Ignored head</title><script>var tracking = 1;</script></head>
+<body><nav>Home | About</nav>
+<h1>Our suppliers</h1>
+<p>Tesco works with <b>Moy Park</b> on poultry.</p>
+<p>Arla&nbsp;Foods supplies own-brand milk.</p>
+<style>p { color: red }</style>
+</body></html>"""
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            self._respond()
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def _respond(self):
+        if self.path.startswith("/page"):
+            self._send(200, "text/html; charset=utf-8", PAGE.encode())
+        elif self.path.startswith("/slow"):
+            time.sleep(0.1)
+            self._send(200, "text/html", b"<p>Slow page</p>")
+        elif self.path == "/huge":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            try:
+                for _ in range(1000):
+                    self.wfile.write(b"x" * 16384)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        elif self.path == "/utf8-undeclared":
+            self._send(200, "text/html", "<p>Müller supplies Nestlé – crème fraîche</p>".encode("utf-8"))
+        elif self.path == "/latin1":
+            self._send(200, "text/html; charset=ISO-8859-1", "<p>Müller supplies Nestlé</p>".encode("latin-1"))
+        elif self.path == "/report.pdf":
+            self._send(200, "application/pdf", b"%PDF-1.4")
+        else:
+            self._send(404, "text/html", b"missing")
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+class TestHtmlToText:
+    def test_keeps_visible_text_only(self):
+        text = html_to_text(PAGE)
+        assert "Tesco works with Moy Park on poultry." in text
+        assert "Arla Foods supplies own-brand milk." in text
+        assert "tracking" not in text and "color" not in text and "Ignored head" not in text
+        assert "Home | About" not in text
+
+    def test_truncated_markup(self):
+        assert html_to_text("<p>Moy Park supplies <b>Tes") == "Moy Park supplies Tes"
+
+class TestDocumentFetcher:
+    def test_fetches_html_as_text(self, server):
+        fetcher = DocumentFetcher()
+        assert "Moy Park" in fetcher.fetch(f"{server}/page")
+        fetcher.close()
+
+    def test_decodes_utf8_without_a_declared_charset(self, server):
+        fetcher = DocumentFetcher()
+        assert fetcher.fetch(f"{server}/utf8-undeclared") == "Müller supplies Nestlé – crème fraîche"
+        assert fetcher.fetch(f"{server}/latin1") == "Müller supplies Nestlé"
+        fetcher.close()
+
+    def test_stops_reading_at_byte_cap(self, server):
+        fetcher = DocumentFetcher(max_bytes=64 * 1024)
+        assert len(fetcher.fetch(f"{server}/huge")) == 64 * 1024
+        fetcher.close()
+
+    def test_skips_errors_and_non_text(self, server):
+        fetcher = DocumentFetcher()
+        assert fetcher.fetch(f"{server}/missing") == ""
+        assert fetcher.fetch(f"{server}/report.pdf") == ""
+        assert fetcher.fetch("http://127.0.0.1:1/unreachable") == ""
+        fetcher.close()
+
+    def test_fetch_all_respects_per_host_limit(self, server):
+        FixtureHandler.max_active = 0
+        fetcher = DocumentFetcher(max_workers=8, per_host_limit=2)
+
+        documents = fetcher.fetch_all([f"{server}/slow?{i}" for i in range(6)] + [f"{server}/slow?0"])
+
+        assert len(documents) == 6
+        assert all(text == "Slow page" for text in documents.values())
+        assert FixtureHandler.max_active <= 2
+        fetcher.close()
+
+class TestDeepExtraction:
+    def test_page_text_is_chunked_into_extraction(self):
+        service = VertexAIExtractionService.__new__(VertexAIExtractionService)
+        service.model_name = "test-model"
+        service.model = MagicMock()
+        service.model.generate_content.return_value = MagicMock(spec=["text"], text='{"suppliers": []}')
+        service.extraction_cache = None
+        service.result_deduplicator = MagicMock(deduplicate_results=lambda results: results)
+        service.token_budget = 600
+
+        page = "Tesco works with Moy Park on poultry. " * 200
+        service.extract_suppliers_from_search_results("Tesco", [
+            {"title": "Suppliers", "snippet": "Tesco suppliers", "link": "https://a.com", "content": page}
+        ])
+
+        prompts = [c[0][0] for c in service.model.generate_content.call_args_list]
+        assert len(prompts) > 1
+        assert "Page: Tesco works with Moy Park" in prompts[0]
+
+    @patch('app.main.search_service')
+    @patch('app.main.extraction_service')
+    @patch('app.main.storage_service')
+    @patch('app.main.deduplicator')
+    def test_deep_request_feeds_pages_to_extraction(self, mock_dedup, mock_storage, mock_extraction, mock_search):
+        mock_storage.get_cached_result.return_value = None
+        mock_search.iter_search_pages.return_value = iter([[
+            {"title": "Suppliers", "snippet": "Tesco suppliers", "link": "https://a.com", "displayLink": "a.com"}
+        ]])
+        mock_search.get_documents.return_value = {"https://a.com": "Tesco works with Moy Park."}
+        mock_extraction.extract_suppliers_from_search_results.return_value = []
+        mock_dedup.deduplicate_suppliers.return_value = []
+
+        response = TestClient(app).post("/extract-suppliers", json={"company_name": "Tesco", "deep": True})
+
+        assert response.status_code == 200
+        extraction_input = mock_extraction.extract_suppliers_from_search_results.call_args[0][1]
+        assert extraction_input[0]["content"] == "Tesco works with Moy Park."
+        stored_results = mock_storage.store_extraction_result.call_args[0][3]
+        assert "content" not in stored_results[0]
+        assert mock_storage.get_cached_result.call_args[0][2] is True
@@ -0,0 +1,96 @@
+import sys
+import json
+import queue
+import logging
+import subprocess
+from pathlib import Path
+import pytest
+from unittest.mock import patch
+from app.utils import log
+from app.utils.log import DroppingQueueHandler, JsonFormatter, TextFormatter, configure_logging, debug_payload
+from app.utils.tracing import start_trace
+
+class Unserializable:
+    """Fails the test if anything tries to serialize it."""
+
+    def __str__(self):
+        raise AssertionError("payload was serialized")
+
+@pytest.fixture
+def output(capsys):
+    yield capsys
+    configure_logging(level="INFO")
+
+def lines(capsys):
+    """The JSON records written so far, once the writer thread has caught up."""
+    log.shutdown_logging()
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+class TestDebugPayload:
+    def test_payload_is_not_serialized_when_debug_is_off(self, output):
+        configure_logging(level="INFO", debug_sample_rate=1.0)
+        debug_payload(logging.getLogger("app.test"), "Search results", [Unserializable()])
+        assert lines(output) == []
+
+    def test_sampling(self, output):
+        configure_logging(level="DEBUG", debug_sample_rate=0.5)
+        logger = logging.getLogger("app.test")
+        with patch("app.utils.log.random.random", side_effect=[0.2, 0.7, 0.4]):
+            for n in range(3):
+                debug_payload(logger, "Page", {"page": n})
+
+        assert [entry["payload"] for entry in lines(output)] == [{"page": 0}, {"page": 2}]
+
+    def test_payload_is_captured_when_logged(self, output):
+        configure_logging(level="DEBUG", debug_sample_rate=1.0)
+        suppliers = [{"name": "Moy Park"}]
+        debug_payload(logging.getLogger("app.test"), "Suppliers", suppliers, company_name="Tesco")
+        suppliers.append({"name": "Arla Foods"})
+
+        entry, = lines(output)
+        assert entry["payload"] == [{"name": "Moy Park"}]
+        assert entry["company_name"] == "Tesco"
+        assert entry["level"] == "DEBUG"
+
+class TestFormatting:
+    def test_json_records_carry_trace_id_and_fields(self, output):
+        configure_logging(level="INFO")
+        logger = logging.getLogger("app.test")
+        with start_trace("request") as trace:
+            logger.info("Stopping search for %s after %d pages", "Tesco", 2, extra={"fields": {"pages": 2}})
+        logger.warning("Outside a request")
+
+        inside, outside = lines(output)
+        assert inside["message"] == "Stopping search for Tesco after 2 pages"
+        assert inside["trace_id"] == trace.trace_id
+        assert inside["pages"] == 2
+        assert inside["logger"] == "app.test"
+        assert "trace_id" not in outside
+
+    def test_text_format(self):
+        record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "Loaded %d suppliers", (3,), None)
+        record.fields = {"source": "file"}
+        assert TextFormatter().format(record).endswith("INFO app.test: Loaded 3 suppliers source=file")
+
+    def test_json_payload_is_spliced_in(self):
+        record = logging.LogRecord("app.test", logging.DEBUG, __file__, 1, "Page", (), None)
+        record.payload = '[{"title": "Tesco"}]'
+        assert json.loads(JsonFormatter().format(record))["payload"] == [{"title": "Tesco"}]
+
+class TestQueueHandler:
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = DroppingQueueHandler(queue.Queue(1))
+        for n in range(3):
+            handler.emit(logging.LogRecord("app.test", logging.INFO, __file__, 1, "record %d", (n,), None))
+        assert handler.queue.qsize() == 1
+        assert handler.dropped == 2
+
+class TestStartup:
+    def test_import_time_records_are_written(self):
+        """app.config logs while app.main is being imported, so logging must be configured first."""
+        server_dir = Path(__file__).resolve().parent.parent
+        result = subprocess.run([sys.executable, "-c", "import app.main"], cwd=server_dir,
+                                capture_output=True, text=True, timeout=120)
+
+        messages = [json.loads(line)["message"] for line in result.stdout.splitlines() if line.startswith("{")]
+        assert any(m.startswith("Loaded") and m.endswith("suppliers to ignore") for m in messages)
@@ -0,0 +1,142 @@
+import re
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.cache import CacheMetrics
+from app.utils.deduplication import SupplierDeduplicator
+from app.utils.metrics import OTHER, Counter, Gauge, Histogram, MetricsRegistry, _Metric
+
+def sample(text, name, **labels):
+    """The value of one sample in a Prometheus text exposition, or None."""
+    label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    pattern = "^" + re.escape(f"{name}{{{label_text}}}" if labels else name) + r" (\S+)$"
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+class TestMetricTypes:
+    def test_counter_children_are_pre_registered(self):
+        counter = Counter("calls_total", "Calls.", ["outcome"], [("ok",), ("error",)])
+        ok = counter.labels("ok")
+        ok.inc()
+        ok.inc(2)
+
+        assert counter.labels("ok") is ok
+        rendered = counter.render()
+        assert sample(rendered, "calls_total", outcome="ok") == 3
+        assert sample(rendered, "calls_total", outcome="error") == 0
+
+    def test_unregistered_labels_fall_back_to_other(self):
+        counter = Counter("routes_total", "Routes.", ["route"], [("/health",), (OTHER,)])
+        counter.labels("/unknown").inc()
+        assert counter.labels("/unknown") is counter.labels(OTHER)
+
+        strict = Counter("strict_total", "Strict.", ["kind"], [("a",)])
+        with pytest.raises(KeyError):
+            strict.labels("b")
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        rendered = histogram.render()
+
+        assert sample(rendered, "latency_seconds_bucket", le="0.1") == 2
+        assert sample(rendered, "latency_seconds_bucket", le="1") == 3
+        assert sample(rendered, "latency_seconds_bucket", le="+Inf") == 4
+        assert sample(rendered, "latency_seconds_count") == 4
+        assert sample(rendered, "latency_seconds_sum") == pytest.approx(3.65)
+
+    def test_metric_base_is_abstract(self):
+        with pytest.raises(TypeError):
+            _Metric("test_abstract", "Abstract.")
+
+    def test_registry_renders_help_and_type(self):
+        registry = MetricsRegistry()
+        gauge = registry.add(Gauge("in_flight", "In flight."))
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        assert registry.render() == "# HELP in_flight In flight.\n# TYPE in_flight gauge\nin_flight 1\n"
+
+class TestInstrumentation:
+    def test_cache_tier_events_feed_lookup_counters(self):
+        before = sample(app_metrics(), "cache_lookups_total", tier="memory", result="stale") or 0
+        metrics = CacheMetrics()
+        metrics.record("memory", "expirations")
+        metrics.record("memory", "evictions", 3)
+
+        assert sample(app_metrics(), "cache_lookups_total", tier="memory", result="stale") == before + 1
+
+    def test_dedup_reports_group_sizes(self):
+        group_sizes = []
+        suppliers = SupplierDeduplicator().deduplicate_suppliers([
+            {"name": "Moy Park Ltd", "confidence": 0.9},
+            {"name": "Moy Park", "confidence": 0.8},
+            {"name": "Arla Foods", "confidence": 0.7},
+        ], group_sizes=group_sizes)
+
+        assert len(suppliers) == 2
+        assert sorted(group_sizes) == [1, 2]
+
+class TestMetricsEndpoint:
+    @patch('app.main.search_service')
+    @patch('app.main.extraction_service')
+    @patch('app.main.storage_service')
+    @patch('app.main.deduplicator')
+    def test_requests_and_stages_are_recorded(self, mock_dedup, mock_storage, mock_extraction, mock_search):
+        mock_storage.get_cached_result.return_value = None
+        mock_search.iter_search_pages.side_effect = lambda *args, **kwargs: iter(
+            [[{"title": "Tesco suppliers", "snippet": "", "link": "https://a.com"}]]
+        )
+        mock_extraction.extract_suppliers_from_search_results.return_value = [{"name": "Moy Park", "confidence": 0.9}]
+
+        def deduplicate(suppliers, group_sizes=None):
+            group_sizes.extend([1] * len(suppliers))
+            return list(suppliers)
+
+        mock_dedup.deduplicate_suppliers.side_effect = deduplicate
+        client = TestClient(app)
+        before = client.get("/metrics").text
+
+        assert client.post("/extract-suppliers", json={"company_name": "Tesco"}).status_code == 200
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        after = response.text
+
+        def delta(name, **labels):
+            return (sample(after, name, **labels) or 0) - (sample(before, name, **labels) or 0)
+
+        assert delta("http_requests_total", endpoint="/extract-suppliers", status="2xx") == 1
+        assert delta("http_request_duration_seconds_count", endpoint="/extract-suppliers") == 1
+        assert delta("pipeline_stage_duration_seconds_count", stage="extraction.page") == 1
+        assert delta("pipeline_stage_duration_seconds_count", stage="storage.cache_write") == 1
+        assert delta("dedup_group_size_count") == 1
+        assert sample(after, "http_requests_in_flight") == 1
+
+    def test_routes_are_labelled_by_template(self):
+        client = TestClient(app)
+        client.get("/health")
+        client.get("/no-such-route")
+        text = client.get("/metrics").text
+
+        assert sample(text, "http_requests_total", endpoint="/health", status="2xx") >= 1
+        assert sample(text, "http_requests_total", endpoint="/history/{company_name}", status="2xx") is not None
+        assert sample(text, "http_requests_total", endpoint=OTHER, status="4xx") >= 1
+
+    @patch("app.main.storage_service")
+    def test_server_errors_count_as_5xx(self, mock_storage):
+        mock_storage.get_statistics.side_effect = RuntimeError("boom")
+        before = app_metrics()
+
+        TestClient(app).get("/statistics")
+        after = app_metrics()
+
+        labels = {"endpoint": "/statistics", "status": "5xx"}
+        assert (sample(after, "http_requests_total", **labels) or 0) - (sample(before, "http_requests_total", **labels) or 0) == 1
+
+def app_metrics():
+    return TestClient(app).get("/metrics").text
@@ -0,0 +1,78 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+from app.services.extraction import VertexAIExtractionService
+from app.services.extraction_cache import ExtractionCache
+from app.services.model_cascade import ModelTier, cascade_model_names, should_escalate
+from app.utils.local_cache import SqliteCache
+
+def model_returning(*suppliers, text=None):
+    model = MagicMock()
+    model.generate_content.return_value = MagicMock(
+        spec=["text"], text=text if text is not None else json.dumps({"suppliers": list(suppliers)})
+    )
+    return model
+
+class TestShouldEscalate:
+    def test_rules(self):
+        assert should_escalate(None, False, 0.6)
+        assert should_escalate([{"name": "A", "confidence": 0.9}], False, 0.6)
+        assert should_escalate([{"name": "A", "confidence": 0.9}, {"name": "B", "confidence": 0.4}], True, 0.6)
+        assert not should_escalate([{"name": "A", "confidence": 0.9}], True, 0.6)
+        assert not should_escalate([], True, 0.6)
+
+    def test_names_from_env(self, monkeypatch):
+        monkeypatch.setenv("EXTRACTION_MODEL_CASCADE", " fast , strong ")
+        assert cascade_model_names() == ["fast", "strong"]
+
+class TestCascade:
+    def setup_method(self):
+        self.service = VertexAIExtractionService.__new__(VertexAIExtractionService)
+        self.service.extraction_cache = None
+        self.fast = ModelTier("fast", model_returning({"name": "Moy Park", "confidence": 0.95}))
+        self.strong = ModelTier("strong", model_returning({"name": "Moy Park Ltd", "confidence": 0.9}))
+        self.service.cascade = [self.fast, self.strong]
+
+    def test_confident_results_stay_on_fast_tier(self):
+        suppliers = self.service.extract_suppliers_from_text("Tesco", "Tesco works with Moy Park.")
+
+        assert [s["name"] for s in suppliers] == ["Moy Park"]
+        assert self.strong.model.generate_content.call_count == 0
+        assert self.fast.stats()["calls"] == 1
+        assert self.fast.stats()["escalations"] == 0
+
+    def test_low_confidence_escalates(self):
+        self.fast.model = model_returning({"name": "Moy", "confidence": 0.3})
+
+        suppliers = self.service.extract_suppliers_from_text("Tesco", "Tesco works with Moy Park.")
+
+        assert [s["name"] for s in suppliers] == ["Moy Park Ltd"]
+        assert self.fast.stats()["escalation_rate"] == 1.0
+        assert self.strong.stats()["calls"] == 1
+
+    def test_parse_failure_escalates(self):
+        self.fast.model = model_returning(text="I could not find any JSON")
+        suppliers = self.service.extract_suppliers_from_text("Tesco", "Tesco works with Moy Park.")
+        assert [s["name"] for s in suppliers] == ["Moy Park Ltd"]
+        assert self.fast.stats()["failures"] == 1
+
+    def test_strong_tier_failure_keeps_fast_answer(self):
+        self.fast.model = model_returning({"name": "Moy", "confidence": 0.3})
+        self.strong.model.generate_content.side_effect = RuntimeError("unavailable")
+
+        suppliers = self.service.extract_suppliers_from_text("Tesco", "Tesco works with Moy Park.")
+
+        assert [s["name"] for s in suppliers] == ["Moy"]
+
+    def test_cache_key_covers_the_cascade(self):
+        self.service.extraction_cache = ExtractionCache(SqliteCache(":memory:"))
+        self.service.extract_suppliers_from_text("Tesco", "Tesco works with Moy Park.")
+
+        self.service.cascade = [self.strong]
+        self.service.extract_suppliers_from_text("Tesco", "Tesco works with Moy Park.")
+
+        assert self.strong.model.generate_content.call_count == 1
+
+    def test_latency_is_recorded(self):
+        self.service.extract_suppliers_from_text("Tesco", "Tesco works with Moy Park.")
+        assert self.fast.latency_seconds > 0
@@ -0,0 +1,127 @@
+import json
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock
+from app.services.extraction import VertexAIExtractionService
+from app.utils.prefilter import SupplierPreFilter, evaluate_prefilter
+
+SUPPLIERS_DIR = Path(__file__).parent.parent / "suppliers"
+# COMMON_WORDS was tuned against prefilter_snippets.json; prefilter_heldout.json was labelled
+# separately, for retailers absent from the registry, and is what quality is measured on
+FIXTURES = json.loads((Path(__file__).parent / "fixtures" / "prefilter_snippets.json").read_text(encoding="utf-8"))
+HELD_OUT = json.loads((Path(__file__).parent / "fixtures" / "prefilter_heldout.json").read_text(encoding="utf-8"))
+IGNORED = {"manufacture 2030", "sps commerce", "truecommerce"}
+
+def is_ignored(name):
+    return name.lower() in IGNORED
+
+def registry_names(exclude_source=None):
+    names = []
+    for path in SUPPLIERS_DIR.glob("suppliers_*.json"):
+        if path.name != exclude_source:
+            names.extend(s["name"] for s in json.loads(path.read_text(encoding="utf-8"))["suppliers"])
+    return names
+
+class TestSupplierPreFilter:
+    def setup_method(self):
+        self.prefilter = SupplierPreFilter(["Arla Foods", "ecosio", "Suppliers"], is_ignored)
+
+    @pytest.mark.parametrize("text", [
+        "Tesco works with Moy Park on poultry.",
+        "Kestrel Foods Limited supplies Tesco.",
+        "Tesco has partnered with HSBC on supply chain finance.",
+        "Morrisons' EDI provider is OpenText.",
+        "Virtualstock: Partnership with Tesco to transform supply chain operations.",
+        "Arla Foods supplies own-brand milk.",
+        "Article hosted on ecosio.com about EDI.",
+        "Onboarding runs through ecosio for EDI.",
+    ])
+    def test_keeps_supplier_mentions(self, text):
+        assert self.prefilter.has_candidate(text, "Tesco")
+
+    @pytest.mark.parametrize("text", [
+        "Tesco PLC works in partnership with its suppliers to reduce food waste.",
+        "Provides logistics services to Tesco, contributing to Scope 3 emissions.",
+        "How to become a supplier | Tesco PLC",
+        "Tesco partners with TrueCommerce for EDI.",
+        "Suppliers are eligible for enhanced rates of financing.",
+    ])
+    def test_skips_snippets_without_other_organisations(self, text):
+        assert not self.prefilter.has_candidate(text, "Tesco")
+
+    def test_generic_registry_names_are_dropped(self):
+        assert "suppliers" not in self.prefilter.registry
+
+    def test_counts_skips(self):
+        self.prefilter.has_candidate("Tesco works with Moy Park.", "Tesco")
+        self.prefilter.has_candidate("Tesco works with its suppliers.", "Tesco")
+        assert self.prefilter.stats()["checked"] == 2
+        assert self.prefilter.stats()["skip_rate"] == 0.5
+
+    def test_registry_loads_from_directory(self):
+        prefilter = SupplierPreFilter.from_directory(str(SUPPLIERS_DIR), is_ignored)
+        assert "moy park" in prefilter.registry
+        assert "truecommerce" not in prefilter.registry
+
+    def test_default_registry_does_not_depend_on_working_directory(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        assert "moy park" in SupplierPreFilter.from_directory(is_ignored=is_ignored).registry
+
+class TestHeldOutFixture:
+    def test_skip_rate_and_recall(self):
+        report = evaluate_prefilter(SupplierPreFilter(registry_names(), is_ignored), HELD_OUT)
+        assert report["recall"] >= 0.95
+        assert report["skip_rate"] >= 0.25
+
+class TestTuningFixture:
+    """Regression guards on the snippets the filter was tuned on; not a measure of its quality."""
+
+    def test_skip_rate_and_recall(self):
+        # Hold each retailer's file out of the registry so known names do not inflate recall
+        results = []
+        for source in sorted({s["source"] for s in FIXTURES}):
+            prefilter = SupplierPreFilter(registry_names(exclude_source=source), is_ignored)
+            results.append((prefilter, [s for s in FIXTURES if s["source"] == source]))
+
+        snippets = [s for _, group in results for s in group]
+        report = {"skipped": 0, "positives": 0, "kept_positives": 0}
+        for prefilter, group in results:
+            for snippet in group:
+                kept = prefilter.has_candidate(snippet["text"], snippet["company"])
+                report["skipped"] += not kept
+                report["positives"] += snippet["has_supplier"]
+                report["kept_positives"] += kept and snippet["has_supplier"]
+
+        skip_rate = report["skipped"] / len(snippets)
+        recall = report["kept_positives"] / report["positives"]
+        assert recall >= 0.95
+        assert skip_rate >= 0.3
+
+    def test_full_registry_recall(self):
+        report = evaluate_prefilter(SupplierPreFilter(registry_names(), is_ignored), FIXTURES)
+        assert report["recall"] == 1.0
+        assert report["negatives_skipped"] >= 0.9
+
+class TestExtractionPreFilter:
+    def setup_method(self):
+        self.service = VertexAIExtractionService.__new__(VertexAIExtractionService)
+        self.service.model_name = "test-model"
+        self.service.model = MagicMock()
+        self.service.model.generate_content.return_value = MagicMock(
+            spec=["text"], text=json.dumps({"suppliers": [{"name": "Moy Park", "confidence": 0.9}]})
+        )
+        self.service.extraction_cache = None
+        self.service.result_deduplicator = MagicMock(deduplicate_results=lambda results: results)
+        self.service.prefilter = SupplierPreFilter([], is_ignored)
+
+    def test_snippets_without_candidates_skip_the_model(self):
+        results = [
+            {"title": "Tesco suppliers", "snippet": "Tesco works with Moy Park on poultry.", "link": "https://a.com"},
+            {"title": "Become a supplier", "snippet": "Tesco works closely with its suppliers.", "link": "https://b.com"},
+        ]
+
+        suppliers = self.service.extract_suppliers_from_search_results("Tesco", results)
+
+        assert self.service.model.generate_content.call_count == 1
+        assert [s["source_url"] for s in suppliers] == ["https://a.com"]
+        assert self.service.prefilter.stats()["skipped"] == 1
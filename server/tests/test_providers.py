@@ -0,0 +1,182 @@
+import json
+from types import SimpleNamespace
+import pytest
+from unittest.mock import patch, MagicMock
+from app.services import providers, rate_limit
+from app.services.extraction import VertexAIExtractionService
+from app.services.providers import (
+    CallRecording, FaultInjector, InjectedError, RecordingModel, ReplayModel, call_key, MODEL
+)
+from app.services.rate_limit import is_throttle_error
+from app.services.search import GoogleSearchService
+from app.utils.tokens import TokenUsage
+
+SEARCH_RESPONSE = {"items": [{"title": "Tesco suppliers", "snippet": "Tesco works with Moy Park.",
+                              "link": "https://a.com", "displayLink": "a.com"}]}
+
+@pytest.fixture
+def replay_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROVIDER_RECORDING_PATH", str(tmp_path / "calls.jsonl"))
+    monkeypatch.setenv("SEARCH_CACHE_PATH", "")
+    monkeypatch.setenv("SEARCH_DAILY_QUOTA", "0")
+    monkeypatch.setenv("SEARCH_QUERY_TEMPLATES", '"{company}" suppliers')
+    monkeypatch.setenv("EXTRACTION_CACHE_PATH", "")
+    monkeypatch.setenv("EXTRACTION_PREFILTER", "false")
+    monkeypatch.setenv("EXTRACTION_STREAMING", "false")
+    monkeypatch.setenv("EXTRACTION_MODEL_CASCADE", "test-model")
+    providers.reset_providers()
+    rate_limit.reset_rate_limiters()
+    yield monkeypatch
+    providers.reset_providers()
+    rate_limit.reset_rate_limiters()
+
+class TestCallRecording:
+    def test_reloads_from_disk(self, tmp_path):
+        path = str(tmp_path / "calls.jsonl")
+        CallRecording(path).record("search", "k", {"q": "x"}, {"items": []}, 0.25)
+
+        reopened = CallRecording(path)
+        assert reopened.get("k")["response"] == {"items": []}
+        assert reopened.get("missing") is None
+        assert reopened.stats() == {"entries": 1, "hits": 1, "misses": 1, "recorded": 0}
+
+class TestFaultInjector:
+    def test_latency_from_recording_or_override(self):
+        sleeps = []
+        FaultInjector(latency_scale=2.0, sleep=sleeps.append).before_call(0.1)
+        FaultInjector(latency_seconds=0.05, sleep=sleeps.append).before_call(0.1)
+        assert sleeps == [0.2, 0.05]
+
+    def test_latency_spread_around_the_median(self):
+        sleeps = []
+        faults = FaultInjector(latency_seconds=0.1, latency_sigma=0.5, seed=3, sleep=sleeps.append)
+        for _ in range(200):
+            faults.before_call()
+
+        sleeps.sort()
+        assert 0.08 < sleeps[100] < 0.12
+        assert sleeps[-1] > 0.2
+        assert faults.stats()["calls"] == 200
+
+    def test_injected_errors(self):
+        with pytest.raises(InjectedError) as throttled:
+            FaultInjector(throttle_rate=1.0).before_call(0)
+        assert is_throttle_error(throttled.value)
+
+        faults = FaultInjector(error_rate=1.0)
+        with pytest.raises(InjectedError) as failed:
+            faults.before_call(0)
+        assert failed.value.code == 500
+        assert not is_throttle_error(failed.value)
+        assert faults.stats()["injected_errors"] == 1
+
+    def test_seeded_injection_is_deterministic(self):
+        def outcomes():
+            faults = FaultInjector(error_rate=0.5, seed=7)
+            results = []
+            for _ in range(20):
+                try:
+                    faults.before_call(0)
+                    results.append(True)
+                except InjectedError:
+                    results.append(False)
+            return results
+
+        assert outcomes() == outcomes()
+        assert not all(outcomes())
+
+class TestModelRecording:
+    def test_replays_text_and_usage(self, tmp_path):
+        recording = CallRecording(str(tmp_path / "calls.jsonl"))
+        live = MagicMock()
+        live.generate_content.return_value = MagicMock(
+            text='{"suppliers": []}',
+            usage_metadata=MagicMock(prompt_token_count=120, candidates_token_count=8, cached_content_token_count=0)
+        )
+        RecordingModel(live, "m", recording).generate_content("prompt")
+
+        replayed = ReplayModel("m", recording, FaultInjector()).generate_content("prompt")
+        assert replayed.text == '{"suppliers": []}'
+        assert replayed.usage_metadata.prompt_token_count == 120
+
+    def test_streamed_calls_are_recorded_whole(self, tmp_path):
+        recording = CallRecording(str(tmp_path / "calls.jsonl"))
+        live = MagicMock()
+        live.generate_content.return_value = iter([
+            MagicMock(text='{"suppliers": ', usage_metadata=None),
+            MagicMock(text="[]}", usage_metadata=MagicMock(prompt_token_count=5, candidates_token_count=3,
+                                                          cached_content_token_count=None)),
+        ])
+        chunks = list(RecordingModel(live, "m", recording).generate_content("prompt", stream=True))
+
+        assert len(chunks) == 2
+        entry = recording.get(call_key(MODEL, "m", "prompt"))
+        assert entry["response"] == {"text": '{"suppliers": []}', "usage": {"prompt_token_count": 5, "candidates_token_count": 3}}
+        streamed = list(ReplayModel("m", recording, FaultInjector()).generate_content("prompt", stream=True))
+        assert streamed[0].text == '{"suppliers": []}'
+
+    def test_usage_only_final_chunk_is_recorded(self, tmp_path):
+        class Chunk(SimpleNamespace):
+            @property
+            def text(self):
+                if not self.candidates:
+                    raise ValueError("Response has no parts")
+                return self.candidates[0].content.parts[0].text
+
+        def chunk(text=None, usage=None):
+            candidates = [SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]))] if text else []
+            return Chunk(candidates=candidates, usage_metadata=usage)
+
+        recording = CallRecording(str(tmp_path / "calls.jsonl"))
+        live = MagicMock()
+        live.generate_content.return_value = iter([
+            chunk('{"suppliers": []}'),
+            chunk(usage=SimpleNamespace(prompt_token_count=5, candidates_token_count=3, cached_content_token_count=0)),
+        ])
+        chunks = list(RecordingModel(live, "m", recording).generate_content("prompt", stream=True))
+
+        assert len(chunks) == 2
+        entry = recording.get(call_key(MODEL, "m", "prompt"))
+        assert entry["response"]["text"] == '{"suppliers": []}'
+        assert entry["response"]["usage"]["prompt_token_count"] == 5
+
+    def test_unrecorded_prompt_finds_nothing(self, tmp_path):
+        replayed = ReplayModel("m", CallRecording(str(tmp_path / "calls.jsonl")), FaultInjector()).generate_content("p")
+        assert json.loads(replayed.text) == {"suppliers": []}
+
+class TestRecordThenReplay:
+    def test_real_services_replay_a_recorded_run(self, replay_env):
+        replay_env.setenv("PROVIDER_MODE", "record")
+        replay_env.setenv("CUSTOM_SEARCH_API_KEY", "key")
+        replay_env.setenv("CUSTOM_SEARCH_ENGINE_ID", "cx")
+        replay_env.setenv("GOOGLE_CLOUD_PROJECT", "project")
+        live_model = MagicMock()
+        live_model.generate_content.return_value = MagicMock(
+            text=json.dumps({"suppliers": [{"name": "Moy Park", "confidence": 0.9}]}), usage_metadata=None
+        )
+
+        with patch("app.services.search.build") as build, \
+                patch("app.services.extraction.aiplatform"), \
+                patch("app.services.extraction.GenerativeModel", return_value=live_model):
+            build.return_value.cse.return_value.list.return_value.execute.return_value = SEARCH_RESPONSE
+            recorded = self.run_pipeline()
+
+        providers.reset_providers()
+        for name in ("CUSTOM_SEARCH_API_KEY", "CUSTOM_SEARCH_ENGINE_ID", "GOOGLE_CLOUD_PROJECT"):
+            replay_env.delenv(name)
+        replay_env.setenv("PROVIDER_MODE", "replay")
+        replay_env.setenv("REPLAY_LATENCY_MS", "0")
+
+        with patch("app.services.search.build") as build:
+            replayed = self.run_pipeline()
+        build.assert_not_called()
+
+        assert replayed == recorded == ["Moy Park"]
+        assert providers.provider_stats()["recording"]["misses"] == 0
+
+    def run_pipeline(self):
+        search = GoogleSearchService()
+        extraction = VertexAIExtractionService()
+        results = search.search_company_suppliers("Tesco", 10)
+        suppliers = extraction.extract_suppliers_from_search_results("Tesco", results, usage=TokenUsage())
+        return [s["name"] for s in suppliers]
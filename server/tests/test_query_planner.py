@@ -0,0 +1,179 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from app.services import rate_limit
+from app.services.query_planner import merge_query_results, plan_queries, query_templates_from_env
+from app.services.rate_limit import RateLimiter, ThrottledError
+from app.services.search import GoogleSearchService
+
+def result(link, title="Result"):
+    return {"title": title, "snippet": "", "link": link, "displayLink": ""}
+
+class TestPlanQueries:
+    def test_fills_company_and_drops_repeats(self):
+        queries = plan_queries("Tesco", ['"{company}" suppliers', '"supplier to {company}"', '"{company}" suppliers'])
+        assert queries == ['"Tesco" suppliers', '"supplier to Tesco"']
+
+    def test_templates_from_env(self, monkeypatch):
+        monkeypatch.setenv("SEARCH_QUERY_TEMPLATES", ' {company} vendors ; ;"{company}" sourcing')
+        assert query_templates_from_env() == ["{company} vendors", '"{company}" sourcing']
+
+    def test_default_templates_include_the_original_query(self, monkeypatch):
+        monkeypatch.delenv("SEARCH_QUERY_TEMPLATES", raising=False)
+        assert plan_queries("Tesco", query_templates_from_env())[0] == '"Tesco" suppliers vendors partners supply chain'
+
+class TestMergeQueryResults:
+    def test_ranks_by_number_of_queries(self):
+        merged = merge_query_results([
+            [result("https://a.com"), result("https://b.com")],
+            [result("https://c.com"), result("http://www.b.com/?utm_source=x")],
+            [result("https://b.com/")],
+        ], 10)
+
+        assert [r["link"] for r in merged] == ["https://b.com", "https://a.com", "https://c.com"]
+        assert [r["query_count"] for r in merged] == [3, 1, 1]
+
+    def test_ties_break_on_best_position_then_query_order(self):
+        merged = merge_query_results([
+            [result("https://a.com"), result("https://b.com")],
+            [result("https://c.com"), result("https://d.com")],
+        ], 3)
+        assert [r["link"] for r in merged] == ["https://a.com", "https://c.com", "https://b.com"]
+
+    def test_repeats_within_one_query_count_once(self):
+        merged = merge_query_results([[result("https://a.com"), result("https://a.com/#top")]], 10)
+        assert len(merged) == 1
+        assert merged[0]["query_count"] == 1
+
+    def test_results_without_links_are_kept(self):
+        merged = merge_query_results([[result(""), result("")]], 10)
+        assert len(merged) == 2
+
+class TestConcurrentSearch:
+    def setup_method(self):
+        rate_limit.reset_rate_limiters()
+        rate_limit._limiters["custom_search"] = RateLimiter(
+            "custom_search", rate=1000.0, burst=1000, concurrency=4, max_retries=0, sleep=lambda s: None
+        )
+        self.service = GoogleSearchService.__new__(GoogleSearchService)
+        self.service.api_key, self.service.search_engine_id = "key", "cx"
+        self.service.query_templates = ["{company} one", "{company} two"]
+
+    def teardown_method(self):
+        rate_limit.reset_rate_limiters()
+
+    def test_merges_every_query(self):
+        pages = {
+            "Tesco one": {"items": [result("https://a.com"), result("https://b.com")]},
+            "Tesco two": {"items": [result("https://b.com"), result("https://c.com")]},
+        }
+        with patch("app.services.search.build") as build:
+            build.return_value.cse.return_value.list.side_effect = \
+                lambda **kwargs: MagicMock(execute=lambda: pages[kwargs["q"]] if kwargs["start"] == 1 else {})
+            results = self.service.search_company_suppliers("Tesco", 20)
+
+        assert [r["link"] for r in results] == ["https://b.com", "https://a.com", "https://c.com"]
+
+    def test_variants_scale_with_max_results(self):
+        self.service.query_templates = ["{company} one", "{company} two", "{company} three"]
+        with patch("app.services.search.build") as build:
+            calls = build.return_value.cse.return_value.list
+            calls.side_effect = lambda **kwargs: MagicMock(execute=lambda: {"items": [
+                result(f"https://{kwargs['q'].split()[-1]}{i}.com") for i in range(10)
+            ]})
+            small = self.service.search_company_suppliers("Tesco", 5)
+            small_calls = [(c.kwargs["q"], c.kwargs["start"]) for c in calls.call_args_list]
+            calls.reset_mock()
+            large = self.service.search_company_suppliers("Tesco", 20)
+
+        assert len(small) == 5
+        assert small_calls == [("Tesco one", 1)]
+        # Two variants fill 20 results in one round, so no second round is fetched
+        assert len(large) == 20
+        assert sorted((c.kwargs["q"], c.kwargs["start"]) for c in calls.call_args_list) == [("Tesco one", 1), ("Tesco two", 1)]
+
+    def test_one_failing_query_keeps_the_others(self):
+        def execute_for(q):
+            if q == "Tesco two":
+                raise RuntimeError("backend error")
+            return {"items": [result("https://a.com")]}
+
+        with patch("app.services.search.build") as build:
+            build.return_value.cse.return_value.list.side_effect = \
+                lambda **kwargs: MagicMock(execute=lambda: execute_for(kwargs["q"]))
+            results = self.service.search_company_suppliers("Tesco", 1)
+
+        assert [r["link"] for r in results] == ["https://a.com"]
+
+    def test_throttled_queries_raise_when_nothing_was_found(self):
+        def execute_for(q):
+            if q == "Tesco two":
+                raise ThrottledError("custom_search", retry_after=5)
+            return {}
+
+        with patch("app.services.search.build") as build:
+            build.return_value.cse.return_value.list.side_effect = \
+                lambda **kwargs: MagicMock(execute=lambda: execute_for(kwargs["q"]))
+            with pytest.raises(ThrottledError):
+                self.service.search_company_suppliers("Tesco", 20)
+
+class TestDomainDiversity:
+    def setup_method(self):
+        rate_limit.reset_rate_limiters()
+        self.service = GoogleSearchService.__new__(GoogleSearchService)
+        self.service.api_key, self.service.search_engine_id = "key", "cx"
+        self.service.query_templates = ["{company} suppliers"]
+        self.service.max_results_per_domain = 2
+
+    def teardown_method(self):
+        rate_limit.reset_rate_limiters()
+
+    @staticmethod
+    def execute(kwargs):
+        # The first page is dominated by one trade site; the second has other sites
+        if kwargs["start"] == 1:
+            return {"items": [result(f"https://trade.com/{i}") for i in range(8)] +
+                             [result("https://a.com"), result("https://b.com")]}
+        return {"items": [result(f"https://site{i}.com") for i in range(10)]}
+
+    def test_lazy_search_backfills_from_the_next_page(self):
+        with patch("app.services.search.build") as build:
+            calls = build.return_value.cse.return_value.list
+            calls.side_effect = lambda **kwargs: MagicMock(execute=lambda: self.execute(kwargs))
+            pages = list(self.service.iter_search_pages("Tesco", 10))
+
+        links = [r["link"] for page in pages for r in page]
+        assert len(links) == 10
+        assert sum("trade.com" in link for link in links) == 2
+        assert [c.kwargs["start"] for c in calls.call_args_list] == [1, 11]
+
+    def test_no_backfill_round_when_nothing_was_held_back(self):
+        with patch("app.services.search.build") as build:
+            calls = build.return_value.cse.return_value.list
+            calls.side_effect = lambda **kwargs: MagicMock(execute=lambda: {"items": [
+                result(f"https://site{i}.com") for i in range(6)
+            ]})
+            pages = list(self.service.iter_search_pages("Tesco", 10))
+
+        assert sum(len(page) for page in pages) == 6
+        assert calls.call_count == 1
+
+    def test_held_back_results_fill_a_short_search(self):
+        self.service.domain_backfill_pages = 0
+        with patch("app.services.search.build") as build:
+            build.return_value.cse.return_value.list.side_effect = \
+                lambda **kwargs: MagicMock(execute=lambda: self.execute(kwargs))
+            pages = list(self.service.iter_search_pages("Tesco", 10))
+
+        links = [r["link"] for page in pages for r in page]
+        assert links[:4] == ["https://trade.com/0", "https://trade.com/1", "https://a.com", "https://b.com"]
+        assert len(links) == 10
+
+    def test_eager_search_caps_sites(self):
+        self.service.query_templates = ["{company} one", "{company} two"]
+        with patch("app.services.search.build") as build:
+            build.return_value.cse.return_value.list.side_effect = \
+                lambda **kwargs: MagicMock(execute=lambda: self.execute(kwargs))
+            results = self.service.search_company_suppliers("Tesco", 10)
+
+        assert len(results) == 10
+        assert sum("trade.com" in r["link"] for r in results) == 2
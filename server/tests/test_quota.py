@@ -0,0 +1,156 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from googleapiclient.errors import HttpError
+from app.main import app
+from app.services import rate_limit
+from app.services.quota import (
+    BATCH, INTERACTIVE, QUOTA_TIMEZONE, QuotaExhaustedError, QuotaScheduler, SearchOutcome, is_daily_quota_error
+)
+from app.services.search import GoogleSearchService
+
+NOON = datetime(2026, 3, 2, 12, 0, tzinfo=QUOTA_TIMEZONE).timestamp()
+
+def quota_error(status=429, reason="dailyLimitExceeded"):
+    resp = MagicMock(status=status)
+    resp.get.return_value = None
+    return HttpError(resp, f'{{"error": {{"errors": [{{"reason": "{reason}"}}]}}}}'.encode())
+
+class Clock:
+    def __init__(self, now=NOON):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class TestQuotaScheduler:
+    def test_batch_jobs_leave_the_interactive_reserve(self):
+        scheduler = QuotaScheduler(10, interactive_reserve=3, clock=Clock())
+
+        assert sum(scheduler.try_consume(BATCH) for _ in range(10)) == 7
+        assert scheduler.try_consume(INTERACTIVE)
+        assert scheduler.stats()["remaining"] == 2
+        assert scheduler.stats()["remaining_for_batch"] == 0
+        assert scheduler.stats()["denied"][BATCH] == 3
+
+    def test_counter_resets_at_pacific_midnight(self):
+        clock = Clock()
+        scheduler = QuotaScheduler(2, interactive_reserve=0, clock=clock)
+        scheduler.try_consume()
+        scheduler.mark_exhausted()
+        assert scheduler.available() == 0
+        assert scheduler.seconds_until_reset() == 12 * 3600
+
+        clock.now += 12 * 3600
+        assert scheduler.available() == 2
+        assert not scheduler.stats()["exhausted"]
+
+    def test_plan_degrades_with_the_budget(self):
+        scheduler = QuotaScheduler(100, interactive_reserve=0, clock=Clock())
+        assert scheduler.plan(4, 2) == (4, 2)
+
+        for _ in range(80):
+            scheduler.try_consume()
+        assert scheduler.plan(4, 2) == (4, 1)
+
+        for _ in range(18):
+            scheduler.try_consume()
+        assert scheduler.plan(4, 2) == (2, 1)
+
+        scheduler.mark_exhausted()
+        assert scheduler.plan(4, 2) == (1, 1)
+        assert scheduler.stats()["degraded_searches"] == 3
+
+    def test_daily_quota_errors(self):
+        assert is_daily_quota_error(quota_error())
+        assert is_daily_quota_error(quota_error(403))
+        assert not is_daily_quota_error(quota_error(429, "rateLimitExceeded"))
+        assert not is_daily_quota_error(RuntimeError("boom"))
+
+class TestQuotaAwareSearch:
+    def setup_method(self):
+        rate_limit.reset_rate_limiters()
+        self.service = GoogleSearchService.__new__(GoogleSearchService)
+        self.service.api_key, self.service.search_engine_id = "key", "cx"
+        self.service.query_templates = ["{company} one", "{company} two"]
+        self.service.max_results_per_domain = 0
+        self.service.quota_scheduler = QuotaScheduler(100, interactive_reserve=0, clock=Clock())
+
+    def teardown_method(self):
+        rate_limit.reset_rate_limiters()
+
+    def search(self, execute, max_results=20):
+        outcome = SearchOutcome()
+        with patch("app.services.search.build") as build:
+            cse_list = build.return_value.cse.return_value.list
+            cse_list.side_effect = lambda **kwargs: MagicMock(execute=lambda: execute(kwargs))
+            results = self.service.search_company_suppliers("Tesco", max_results, outcome=outcome)
+        return results, outcome, cse_list
+
+    @staticmethod
+    def page(kwargs):
+        return {"items": [{"link": f"https://{kwargs['q'][-3:]}.com/{kwargs['start'] + i}"} for i in range(10)]}
+
+    def test_full_budget_is_not_limited(self):
+        results, outcome, calls = self.search(self.page)
+
+        assert len(results) == 20
+        assert calls.call_count == 2
+        assert not outcome.quota_limited
+        assert self.service.quota_scheduler.stats()["used"] == 2
+
+    def test_low_budget_fetches_one_page_per_query(self):
+        for _ in range(90):
+            self.service.quota_scheduler.try_consume()
+
+        results, outcome, calls = self.search(self.page)
+
+        assert calls.call_count == 2
+        assert all(c.kwargs["start"] == 1 for c in calls.call_args_list)
+        assert len(results) == 20
+        assert outcome.quota_limited
+
+    def test_api_quota_error_marks_the_day_exhausted(self):
+        def execute(kwargs):
+            raise quota_error()
+
+        with pytest.raises(QuotaExhaustedError):
+            self.search(execute)
+
+        assert self.service.quota_scheduler.stats()["exhausted"]
+        assert rate_limit.get_rate_limiter("custom_search").stats()["retries"] == 0
+
+class TestQuotaLimitedRequests:
+    @patch('app.main.search_service')
+    @patch('app.main.extraction_service')
+    @patch('app.main.storage_service')
+    @patch('app.main.deduplicator')
+    def test_quota_limited_results_are_not_cached(self, mock_dedup, mock_storage, mock_extraction, mock_search):
+        def search(company_name, max_results, outcome):
+            outcome.quota_limited = True
+            return iter([[{"title": "Suppliers", "snippet": "Tesco suppliers", "link": "https://a.com"}]])
+
+        mock_storage.get_cached_result.return_value = None
+        mock_search.iter_search_pages.side_effect = search
+        mock_extraction.extract_suppliers_from_search_results.return_value = []
+        mock_dedup.deduplicate_suppliers.return_value = []
+
+        response = TestClient(app).post("/extract-suppliers", json={"company_name": "Tesco"})
+
+        assert response.status_code == 200
+        mock_storage.store_extraction_result.assert_called_once()
+        mock_storage.cache_result.assert_not_called()
+
+    @patch('app.main.search_service')
+    @patch('app.main.storage_service')
+    def test_exhausted_quota_returns_503(self, mock_storage, mock_search):
+        mock_storage.get_cached_result.return_value = None
+        mock_search.iter_search_pages.side_effect = QuotaExhaustedError("custom_search", retry_after=5400.4)
+
+        with patch('app.main.extraction_service'), patch('app.main.deduplicator'):
+            response = TestClient(app).post("/extract-suppliers", json={"company_name": "Tesco"})
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "5400"
+        mock_storage.cache_result.assert_not_called()
@@ -0,0 +1,149 @@
+import json
+import httplib2
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+from googleapiclient.errors import HttpError
+from app.main import app
+from app.services import rate_limit
+from app.services.rate_limit import (
+    AIMDLimiter, RateLimiter, ThrottledError, TokenBucket, is_throttle_error, retry_after_seconds
+)
+
+def http_error(status, retry_after=None, reason=None):
+    headers = {"status": status}
+    if retry_after is not None:
+        headers["retry-after"] = retry_after
+    content = json.dumps({"error": {"code": status, "errors": [{"reason": reason or "rateLimitExceeded"}]}})
+    return HttpError(httplib2.Response(headers), content.encode())
+
+class FakeUpstream:
+    """Rejects the first `throttle` calls with 429, then succeeds."""
+
+    def __init__(self, throttle, retry_after=None):
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.throttle:
+            raise http_error(429, self.retry_after)
+        return {"items": []}
+
+def make_limiter(**kwargs):
+    sleeps = []
+    options = {"rate": 1000.0, "burst": 1000, "concurrency": 4, "max_retries": 3}
+    options.update(kwargs)
+    limiter = RateLimiter("test", sleep=sleeps.append, **options)
+    return limiter, sleeps
+
+class TestThrottleDetection:
+    def test_classifies_errors(self):
+        assert is_throttle_error(http_error(429))
+        assert is_throttle_error(http_error(403, reason="userRateLimitExceeded"))
+        assert is_throttle_error(ResourceExhausted("quota"))
+        assert not is_throttle_error(http_error(403, reason="forbidden"))
+        assert not is_throttle_error(ServiceUnavailable("down"))
+        assert not is_throttle_error(ValueError("bad"))
+
+    def test_retry_after(self):
+        assert retry_after_seconds(http_error(429, "3")) == 3.0
+        assert retry_after_seconds(http_error(429)) is None
+        assert retry_after_seconds(ResourceExhausted("quota")) is None
+
+class TestRateLimiter:
+    def test_retries_until_upstream_recovers(self):
+        limiter, sleeps = make_limiter()
+        upstream = FakeUpstream(throttle=2)
+
+        assert limiter.call(upstream) == {"items": []}
+        assert upstream.calls == 3
+        assert len(sleeps) == 2
+        assert limiter.stats()["throttled"] == 2
+
+    def test_honours_retry_after(self):
+        limiter, sleeps = make_limiter()
+        limiter.call(FakeUpstream(throttle=1, retry_after="7"))
+        assert sleeps == [7.0]
+
+    def test_backoff_is_jittered_and_capped(self):
+        limiter, sleeps = make_limiter(max_retries=6, base_delay=1.0, max_delay=4.0)
+        with pytest.raises(ThrottledError):
+            limiter.call(FakeUpstream(throttle=100))
+        assert len(sleeps) == 6
+        assert all(0 <= s <= 4.0 for s in sleeps)
+
+    def test_raises_when_retries_exhausted(self):
+        limiter, _ = make_limiter(max_retries=2)
+        upstream = FakeUpstream(throttle=100, retry_after="5")
+
+        with pytest.raises(ThrottledError) as exc:
+            limiter.call(upstream)
+
+        assert upstream.calls == 3
+        assert exc.value.retry_after == 5.0
+        assert limiter.stats()["exhausted"] == 1
+
+    def test_other_errors_are_not_retried(self):
+        limiter, sleeps = make_limiter()
+        with pytest.raises(ValueError):
+            limiter.call(MagicMock(side_effect=ValueError("bad request")))
+        assert sleeps == []
+
+    def test_throttling_shrinks_concurrency(self):
+        limiter, _ = make_limiter(concurrency=8)
+        limiter.call(FakeUpstream(throttle=2))
+        assert limiter.concurrency.limit < 8
+
+    def test_token_bucket_waits_when_empty(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: now[0])
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == pytest.approx(0.5)
+        now[0] += 0.5
+        assert bucket.try_acquire() == 0
+
+    def test_aimd_recovers_additively(self):
+        limiter = AIMDLimiter(4, maximum=8)
+        limiter.on_throttle()
+        assert limiter.limit == 2
+        for _ in range(10):
+            limiter.on_success()
+        assert 2 < limiter.limit <= 8
+
+class TestThrottledRequest:
+    def setup_method(self):
+        rate_limit.reset_rate_limiters()
+
+    def teardown_method(self):
+        rate_limit.reset_rate_limiters()
+
+    @patch('app.main.search_service')
+    @patch('app.main.extraction_service')
+    @patch('app.main.storage_service')
+    @patch('app.main.deduplicator')
+    def test_exhausted_retries_return_503_without_caching(self, mock_dedup, mock_storage, mock_extraction, mock_search):
+        mock_storage.get_cached_result.return_value = None
+        mock_search.iter_search_pages.side_effect = ThrottledError("custom_search", retry_after=12)
+
+        response = TestClient(app).post("/extract-suppliers", json={"company_name": "Tesco"})
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "12"
+        mock_storage.cache_result.assert_not_called()
+
+    def test_search_service_propagates_throttling(self):
+        from app.services.search import GoogleSearchService
+
+        service = GoogleSearchService.__new__(GoogleSearchService)
+        service.api_key, service.search_engine_id = "key", "cx"
+        limiter, _ = make_limiter(max_retries=1)
+        rate_limit._limiters["custom_search"] = limiter
+
+        with patch("app.services.search.build") as build:
+            build.return_value.cse.return_value.list.return_value.execute.side_effect = http_error(429)
+            with pytest.raises(ThrottledError):
+                service.search_company_suppliers("Tesco", 10)
@@ -0,0 +1,58 @@
+import json
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock
+from app.services.extraction import VertexAIExtractionService
+from app.services.extraction_cache import ExtractionCache
+from app.utils.local_cache import SqliteCache
+from app.utils.response_parser import parse_supplier_response, validate_suppliers
+
+FIXTURES = json.loads((Path(__file__).parent / "fixtures" / "extraction_responses.json").read_text(encoding="utf-8"))
+
+class TestParseSupplierResponse:
+    @pytest.mark.parametrize("case", FIXTURES, ids=[c["description"] for c in FIXTURES])
+    def test_fixture(self, case):
+        suppliers, complete = parse_supplier_response(case["response"])
+        if case["expected"] is None:
+            assert suppliers is None
+        else:
+            assert [s["name"] for s in suppliers] == case["expected"]
+            assert complete == case["complete"]
+
+    def test_recoverable_fixture_success_rate(self):
+        recoverable = [c for c in FIXTURES if c["expected"] is not None]
+        parsed = [c for c in recoverable
+                  if [s["name"] for s in parse_supplier_response(c["response"])[0] or []] == c["expected"]]
+        assert len(parsed) / len(recoverable) >= 0.99
+
+    def test_confidence_is_normalized(self):
+        suppliers, _ = parse_supplier_response('{"suppliers": [{"name": "Moy Park", "confidence": "85%"}]}')
+        assert suppliers == [{"name": "Moy Park", "confidence": 0.85}]
+
+    def test_bulk_validation_fast_path(self):
+        items = [{"name": f"Supplier {i}", "confidence": 0.5} for i in range(500)]
+        assert len(validate_suppliers(items)) == 500
+
+class TestExtractionParsing:
+    def setup_method(self):
+        self.service = VertexAIExtractionService.__new__(VertexAIExtractionService)
+        self.service.model_name = "test-model"
+        self.service.model = MagicMock()
+        self.service.extraction_cache = ExtractionCache(SqliteCache(":memory:"))
+
+    def test_partial_recovery_is_returned_but_not_cached(self):
+        truncated = next(c for c in FIXTURES if c["description"] == "truncated array mid-object")
+        self.service.model.generate_content.return_value = MagicMock(text=truncated["response"])
+
+        suppliers = self.service.extract_suppliers_from_text("Tesco", "snippet")
+        self.service.extract_suppliers_from_text("Tesco", "snippet")
+
+        assert [s["name"] for s in suppliers] == ["Arla Foods"]
+        assert self.service.model.generate_content.call_count == 2
+
+    def test_blocked_response_returns_empty(self):
+        response = MagicMock()
+        type(response).text = property(lambda self: (_ for _ in ()).throw(ValueError("blocked")))
+        self.service.model.generate_content.return_value = response
+
+        assert self.service.extract_suppliers_from_text("Tesco", "snippet") == []
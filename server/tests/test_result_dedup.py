@@ -0,0 +1,133 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+from app.services.extraction import VertexAIExtractionService
+from app.utils.deduplication import SupplierDeduplicator
+from app.utils.result_dedup import DomainDiversifier, SearchResultDeduplicator, result_domain
+from app.utils.urls import canonicalize_url, site_domain
+
+PRESS_RELEASE = "Tesco today announced a new partnership with Acme Foods Ltd to supply own-brand ready meals across its UK stores"
+
+class TestCanonicalizeUrl:
+    def test_equivalent_urls_match(self):
+        canonical = canonicalize_url("https://example.com/news/article")
+        assert canonicalize_url("http://www.example.com/news/article/") == canonical
+        assert canonicalize_url("https://EXAMPLE.com/news/article#comments") == canonical
+        assert canonicalize_url("https://example.com/news/article?utm_source=x&utm_medium=y&gclid=z") == canonical
+
+    def test_meaningful_query_params_are_kept_and_sorted(self):
+        assert canonicalize_url("https://example.com/p?id=2&page=1") == canonicalize_url("https://example.com/p?page=1&id=2")
+        assert canonicalize_url("https://example.com/p?id=2") != canonicalize_url("https://example.com/p?id=3")
+
+    def test_empty(self):
+        assert canonicalize_url("") == ""
+
+    def test_mobile_and_amp_variants_match(self):
+        canonical = canonicalize_url("https://example.com/news/story")
+        assert canonicalize_url("https://m.example.com/news/story") == canonical
+        assert canonicalize_url("https://amp.example.com/news/story?amp=1") == canonical
+        assert canonicalize_url("https://example.com/news/story/amp/") == canonical
+        assert canonicalize_url("https://example.com/amp/news/story?outputType=amp") == canonical
+        assert canonicalize_url("https://example-com.cdn.ampproject.org/c/s/example.com/news/story") == canonical
+        assert canonicalize_url("https://www.google.com/amp/s/www.example.com/news/story") == canonical
+        assert canonicalize_url("https://example.com/news/story.amp.html") == canonicalize_url("https://example.com/news/story.html")
+
+    def test_variant_rules_leave_other_urls_alone(self):
+        assert canonicalize_url("https://m.co/amplifier") == "https://m.co/amplifier"
+        assert canonicalize_url("https://example.com/p?m=2") != canonicalize_url("https://example.com/p")
+
+class TestSiteDomain:
+    def test_registrable_domain(self):
+        assert site_domain("https://m.news.example.com/a") == "example.com"
+        assert site_domain("https://www.bbc.co.uk/news") == "bbc.co.uk"
+        assert site_domain("http://localhost:8000/x") == "localhost"
+
+    def test_result_domain_falls_back_to_display_link(self):
+        assert result_domain({"link": "", "displayLink": "www.grocer.co.uk"}) == "grocer.co.uk"
+        assert result_domain({"link": "https://shop.grocer.co.uk/a", "displayLink": "other.com"}) == "grocer.co.uk"
+
+class TestDomainDiversifier:
+    def test_caps_each_site_and_backfills_in_order(self):
+        results = [{"link": f"https://{host}/{i}"} for i, host in enumerate(
+            ["a.com", "m.a.com", "b.com", "a.com", "www.a.com"]
+        )]
+        diversifier = DomainDiversifier(2)
+
+        assert [r["link"] for r in diversifier.admit(results)] == ["https://a.com/0", "https://m.a.com/1", "https://b.com/2"]
+        assert [r["link"] for r in diversifier.backfill(1)] == ["https://a.com/3"]
+        assert [r["link"] for r in diversifier.backfill(5)] == ["https://www.a.com/4"]
+
+    def test_results_past_the_limit_are_kept_for_backfill(self):
+        results = [{"link": f"https://{host}/{i}"} for i, host in enumerate(["a.com", "a.com", "b.com", "c.com"])]
+        diversifier = DomainDiversifier(1)
+
+        assert [r["link"] for r in diversifier.admit(results, 2)] == ["https://a.com/0", "https://b.com/2"]
+        assert [r["link"] for r in diversifier.surplus] == ["https://c.com/3"]
+        assert [r["link"] for r in diversifier.backfill(5)] == ["https://c.com/3", "https://a.com/1"]
+
+    def test_cap_of_zero_disables(self):
+        results = [{"link": "https://a.com/1"}, {"link": "https://a.com/2"}]
+        assert DomainDiversifier(0).admit(results) == results
+
+class TestSearchResultDeduplicator:
+    def setup_method(self):
+        self.deduplicator = SearchResultDeduplicator()
+
+    def test_same_canonical_url_collapses(self):
+        results = [
+            {"title": "A", "snippet": "first", "link": "https://example.com/a?utm_source=feed"},
+            {"title": "Different title", "snippet": "other words", "link": "http://www.example.com/a/"},
+        ]
+        collapsed = self.deduplicator.deduplicate_results(results)
+        assert len(collapsed) == 1
+        assert collapsed[0]["title"] == "A"
+        assert collapsed[0]["source_urls"] == [r["link"] for r in results]
+
+    def test_syndicated_press_release_collapses(self):
+        results = [
+            {"title": "Tesco partners with Acme", "snippet": PRESS_RELEASE, "link": "https://news-one.com/tesco"},
+            {"title": "Unrelated", "snippet": "Asda opens a new distribution centre in Leeds", "link": "https://other.com/asda"},
+            {"title": "Tesco partners with Acme | Wire", "snippet": PRESS_RELEASE + " ...", "link": "https://wire.com/123"},
+        ]
+        collapsed = self.deduplicator.deduplicate_results(results)
+        assert [r["link"] for r in collapsed] == ["https://news-one.com/tesco", "https://other.com/asda"]
+        assert collapsed[0]["source_urls"] == ["https://news-one.com/tesco", "https://wire.com/123"]
+
+    def test_distinct_results_are_kept(self):
+        results = [
+            {"title": "One", "snippet": "Tesco sources milk from Arla", "link": "https://a.com"},
+            {"title": "Two", "snippet": "Tesco signs logistics deal with Wincanton", "link": "https://b.com"},
+        ]
+        assert len(self.deduplicator.deduplicate_results(results)) == 2
+
+    def test_empty(self):
+        assert self.deduplicator.deduplicate_results([]) == []
+
+class TestPreExtractionDedup:
+    def test_duplicates_cost_one_model_call_and_keep_attribution(self):
+        service = VertexAIExtractionService.__new__(VertexAIExtractionService)
+        service.model_name = "test-model"
+        service.model = MagicMock()
+        service.model.generate_content.return_value = MagicMock(
+            text=json.dumps({"suppliers": [{"name": "Acme Foods", "confidence": 0.9}]})
+        )
+        service.extraction_cache = None
+        service.result_deduplicator = SearchResultDeduplicator()
+        results = [
+            {"title": "Tesco partners with Acme", "snippet": PRESS_RELEASE, "link": "https://news-one.com/tesco"},
+            {"title": "Tesco partners with Acme", "snippet": PRESS_RELEASE, "link": "https://wire.com/123"},
+        ]
+
+        suppliers = service.extract_suppliers_from_search_results("Tesco", results)
+
+        assert service.model.generate_content.call_count == 1
+        assert suppliers[0]["source_url"] == "https://news-one.com/tesco"
+        assert suppliers[0]["source_urls"] == ["https://news-one.com/tesco", "https://wire.com/123"]
+
+    def test_merged_suppliers_keep_all_source_urls(self):
+        merged = SupplierDeduplicator()._merge_supplier_group([
+            {"name": "Acme", "confidence": 0.8, "source_url": "https://a.com", "source_urls": ["https://a.com", "https://b.com"]},
+            {"name": "Acme Ltd", "confidence": 0.9, "source_url": "https://c.com"},
+        ])
+        assert merged["source_url"] == "https://a.com"
+        assert merged["source_urls"] == ["https://a.com", "https://b.com", "https://c.com"]
@@ -0,0 +1,80 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from app.services import rate_limit
+from app.services.search import GoogleSearchService
+from app.services.search_cache import SearchCache
+from app.utils.local_cache import SqliteCache
+
+def page(start, count=10):
+    return {"items": [
+        {"title": f"Result {i}", "snippet": "Tesco suppliers", "link": f"https://example.com/{i}",
+         "displayLink": "example.com", "kind": "customsearch#result"}
+        for i in range(start, start + count)
+    ]}
+
+def make_service(cache):
+    service = GoogleSearchService.__new__(GoogleSearchService)
+    service.api_key, service.search_engine_id = "key", "cx"
+    service.search_cache = cache
+    service.query_templates = ['"{company}" suppliers']
+    service.max_results_per_domain = 0
+    return service
+
+class TestSearchCacheKey:
+    def test_key_depends_on_every_component(self):
+        base = SearchCache.make_key("cx", "query", 1, 10)
+        assert base == SearchCache.make_key("cx", "query", 1, 10)
+        assert base != SearchCache.make_key("other", "query", 1, 10)
+        assert base != SearchCache.make_key("cx", "query 2", 1, 10)
+        assert base != SearchCache.make_key("cx", "query", 11, 10)
+        assert base != SearchCache.make_key("cx", "query", 1, 5)
+
+class TestCachedSearch:
+    def setup_method(self):
+        rate_limit.reset_rate_limiters()
+        self.cache = SearchCache(SqliteCache(":memory:"))
+        self.service = make_service(self.cache)
+
+    def teardown_method(self):
+        rate_limit.reset_rate_limiters()
+
+    def search(self, max_results=20):
+        with patch("app.services.search.build") as build:
+            cse_list = build.return_value.cse.return_value.list
+            cse_list.side_effect = lambda **kwargs: MagicMock(execute=lambda: page(kwargs["start"]))
+            results = self.service.search_company_suppliers("Tesco", max_results)
+        return results, cse_list
+
+    def test_repeat_search_replays_cached_pages(self):
+        first, first_calls = self.search()
+        second, second_calls = self.search()
+
+        assert first_calls.call_count == 2
+        assert second_calls.call_count == 0
+        assert second == first
+        assert self.cache.stats()["quota_calls_saved"] == 2
+
+    def test_cached_items_keep_only_result_fields(self):
+        results, _ = self.search(10)
+        assert set(results[0]) - {"query_count"} == {"title", "snippet", "link", "displayLink"}
+
+    def test_more_results_reuse_the_pages_already_cached(self):
+        self.search(10)
+        results, calls = self.search(20)
+
+        assert len(results) == 20
+        assert [c.kwargs["start"] for c in calls.call_args_list] == [11]
+
+    def test_errors_are_not_cached(self):
+        with patch("app.services.search.build") as build:
+            build.return_value.cse.return_value.list.return_value.execute.side_effect = RuntimeError("boom")
+            assert self.service.search_company_suppliers("Tesco", 10) == []
+
+        assert len(self.cache.store) == 0
+
+    def test_works_without_a_cache(self):
+        self.service.search_cache = None
+        first, _ = self.search(10)
+        _, calls = self.search(10)
+        assert len(first) == 10
+        assert calls.call_count == 1
@@ -0,0 +1,125 @@
+import json
+import pytest
+from unittest.mock import patch
+import app.main as api
+import load_test
+from app.services import rate_limit
+from app.services.providers import FaultInjector
+from app.services.search import GoogleSearchService
+from app.services.storage import FirestoreService
+from app.utils.urls import site_domain
+from simulated_backends import InMemoryFirestore, SimulatedModel, SimulatedSearchProvider, faults_from_spec
+
+class TestFaultSpec:
+    def test_parse(self):
+        faults = faults_from_spec("250:0.5:0.01:0.02")
+        assert (faults.latency_seconds, faults.latency_sigma, faults.error_rate, faults.throttle_rate) == (0.25, 0.5, 0.01, 0.02)
+        assert faults_from_spec("40").latency_sigma == 0
+        with pytest.raises(ValueError):
+            faults_from_spec("1:2:3:4:5")
+
+    def test_constant_latency_without_spread(self):
+        faults = faults_from_spec("2")
+        faults.before_call()
+        faults.before_call()
+        assert faults.stats() == {"calls": 2, "injected_errors": 0, "injected_throttles": 0, "mean_latency_ms": 2.0}
+
+class TestSimulatedBackends:
+    def test_search_pages_are_deterministic(self):
+        provider = SimulatedSearchProvider(FaultInjector(), results_available=15)
+        page = provider.search('"Tesco" suppliers', 11, 10)
+
+        assert len(page["items"]) == 5
+        assert page == provider.search('"Tesco" suppliers', 11, 10)
+        assert "Tesco" in page["items"][0]["snippet"]
+        assert len({site_domain(item["link"]) for item in page["items"]}) == 5
+
+    @pytest.mark.parametrize("max_results, expected_calls", [(5, 1), (20, 2)])
+    def test_uncached_search_costs_one_call_per_page(self, simulated_env, max_results, expected_calls):
+        faults = FaultInjector()
+        search = GoogleSearchService()
+        search.search_provider = SimulatedSearchProvider(faults)
+        results = search.search_company_suppliers("Tesco", max_results)
+
+        assert len(results) == max_results
+        assert faults.calls == expected_calls
+
+    def test_model_names_suppliers_in_the_text(self):
+        model = SimulatedModel(FaultInjector())
+        prompt = 'TARGET COMPANY: "Tesco"\n\nTEXT TO ANALYZE:\nTesco buys from Moy Park and Arla Foods.\n'
+
+        response = model.generate_content(prompt)
+        names = [s["name"] for s in json.loads(response.text)["suppliers"]]
+        assert names == ["Moy Park", "Arla Foods"]
+        assert response.usage_metadata.prompt_token_count > 0
+        chunks = list(model.generate_content(prompt, stream=True))
+        assert chunks[-1].text == response.text
+
+    def test_firestore_service_round_trip(self):
+        store = FirestoreService(client=InMemoryFirestore())
+        suppliers = [{"name": "Moy Park", "confidence": 0.9}]
+        store.store_extraction_result("Tesco", suppliers, 1.0, [])
+        store.store_extraction_result("Tesco", suppliers, 2.0, [])
+        store.cache_result("Tesco", suppliers, 1.0, source_links=["https://a.example.com"])
+
+        assert store.get_cached_result("Tesco")["suppliers"] == suppliers
+        history = store.get_extraction_history("Tesco")
+        assert [entry["processing_time"] for entry in history] == [2.0, 1.0]
+        assert store.get_statistics()["total_extractions"] == 2
+
+    def test_batched_updates_are_applied_on_commit(self):
+        client = InMemoryFirestore()
+        documents = client.collection("cache")
+        documents.document("tesco").set({"company": "Tesco"})
+
+        batch = client.batch()
+        batch.update(documents.document("tesco"), {"last_accessed": 1})
+        assert "last_accessed" not in documents.document("tesco").get().to_dict()
+        batch.commit()
+        assert documents.document("tesco").get().to_dict()["last_accessed"] == 1
+
+        batch = client.batch()
+        batch.update(documents.document("gone"), {"last_accessed": 2})
+        with pytest.raises(KeyError):
+            batch.commit()
+
+@pytest.fixture
+def simulated_env(monkeypatch):
+    monkeypatch.setenv("GOOGLE_CLOUD_PROJECT", "simulated")
+    monkeypatch.setenv("CUSTOM_SEARCH_API_KEY", "simulated")
+    monkeypatch.setenv("CUSTOM_SEARCH_ENGINE_ID", "simulated")
+    monkeypatch.setenv("SEARCH_CACHE_PATH", "")
+    monkeypatch.setenv("EXTRACTION_CACHE_PATH", "")
+    monkeypatch.setenv("SEARCH_DAILY_QUOTA", "0")
+    monkeypatch.setenv("CUSTOM_SEARCH_RATE_LIMIT_QPS", "1000")
+    monkeypatch.setenv("CUSTOM_SEARCH_RATE_LIMIT_BURST", "1000")
+    rate_limit.reset_rate_limiters()
+    yield monkeypatch
+    rate_limit.reset_rate_limiters()
+
+class TestLoadTest:
+    def test_percentile(self):
+        values = [float(n) for n in range(1, 101)]
+        assert load_test.percentile(values, 0.5) == 50
+        assert load_test.percentile(values, 0.99) == 99
+        assert load_test.percentile([], 0.5) == 0
+
+    def test_run_reports_hits_and_misses(self, simulated_env):
+        args = load_test.parse_args(["--requests", "12", "--concurrency", "3", "--hot-companies", "2",
+                                     "--max-results", "10"])
+        faults = {name: FaultInjector() for name in ("search", "model", "store")}
+
+        with patch.multiple(api, search_service=None, extraction_service=None, storage_service=None,
+                            deduplicator=None):
+            load_test.build_services(api, faults)
+            transport = load_test.InProcessTransport(api.app)
+            try:
+                report = load_test.run_load(transport, args)
+            finally:
+                transport.close()
+
+        assert report["statuses"] == {"200": 12}
+        assert report["hit"]["requests"] + report["miss"]["requests"] == 12
+        assert report["overall"]["p50_ms"] <= report["overall"]["p99_ms"]
+        assert report["memory_mb"]["rss_after"] > 0
+        assert faults["model"].calls > 0
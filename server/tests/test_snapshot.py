@@ -0,0 +1,120 @@
+import os
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import Config
+from app.services.cache import CachePolicy
+from app.services.snapshot import export_snapshot, read_snapshot, restore_snapshot
+from app.services.storage import FirestoreService
+from app.utils import cache_keys
+
+def make_storage():
+    service = FirestoreService.__new__(FirestoreService)
+    service.cache_collection = MagicMock()
+    service._init_cache_tiers(CachePolicy())
+    return service
+
+def make_config(tmp_path, names):
+    ignore_file = tmp_path / "ignore.txt"
+    ignore_file.write_text("\n".join(names) + "\n")
+    config = Config.__new__(Config)
+    config.ignore_list_file = str(ignore_file)
+    config._ignored_suppliers = {n.lower() for n in names}
+    return config
+
+class TestSnapshotRoundTrip:
+    def test_restores_cache_entries_and_memo(self, tmp_path):
+        now = datetime.now(timezone.utc)
+        storage = make_storage()
+        storage.memory_cache.set("tesco__v1", {
+            "suppliers": [{"name": "ABC", "confidence": 0.9}],
+            "timestamp": now,
+            "expires_at": now + timedelta(hours=1),
+        })
+        storage.memory_cache.set("asda__v1", {
+            "suppliers": [],
+            "timestamp": now - timedelta(days=2),
+            "expires_at": now - timedelta(seconds=1),
+        })
+        cache_keys.canonicalize_company_name("Tesco PLC")
+        path = tmp_path / "snapshot.json"
+
+        assert export_snapshot(path, storage, make_config(tmp_path, ["Foo"])) == 2
+
+        cache_keys._canonical_names.clear()
+        restored_storage = make_storage()
+        restored = restore_snapshot(read_snapshot(path), restored_storage, make_config(tmp_path, ["Foo"]))
+
+        assert restored == 1
+        entry = restored_storage.memory_cache.get("tesco__v1")
+        assert entry["suppliers"][0]["name"] == "ABC"
+        assert entry["expires_at"] == now + timedelta(hours=1)
+        assert cache_keys._canonical_names["Tesco PLC"] == "tesco"
+
+    def test_restored_entries_keep_their_insertion_time(self, tmp_path):
+        now = datetime.now(timezone.utc)
+        policy = CachePolicy()
+        entry = {"suppliers": [], "timestamp": now, "expires_at": now + timedelta(days=1)}
+        storage = make_storage()
+        storage.memory_cache.set("fresh__v1", entry)
+        storage.memory_cache.set("stale__v1", entry, inserted_at=now - policy.memory_ttl - timedelta(seconds=1))
+        path = tmp_path / "snapshot.json"
+        export_snapshot(path, storage, make_config(tmp_path, []))
+
+        restored_storage = make_storage()
+        assert restore_snapshot(read_snapshot(path), restored_storage, make_config(tmp_path, [])) == 1
+        (key, _, inserted_at), = restored_storage.memory_cache.items()
+        assert key == "fresh__v1"
+        assert inserted_at == storage.memory_cache.items()[0][2]
+
+    def test_newer_snapshot_ignore_list_wins(self, tmp_path):
+        path = tmp_path / "snapshot.json"
+        config = make_config(tmp_path, ["Foo"])
+        config.load_ignored_suppliers(["Foo", "Added At Runtime"])
+        old = (datetime.now(timezone.utc) - timedelta(hours=1)).timestamp()
+        os.utime(config.ignore_list_file, (old, old))
+        export_snapshot(path, make_storage(), config)
+
+        fresh_config = make_config(tmp_path, ["Foo"])
+        os.utime(fresh_config.ignore_list_file, (old, old))
+        restore_snapshot(read_snapshot(path), make_storage(), fresh_config)
+
+        assert fresh_config.is_supplier_ignored("Added At Runtime")
+
+    def test_newer_ignore_file_wins(self, tmp_path):
+        path = tmp_path / "snapshot.json"
+        config = make_config(tmp_path, ["Foo"])
+        config.load_ignored_suppliers(["Foo", "Stale Entry"])
+        export_snapshot(path, make_storage(), config)
+
+        fresh_config = make_config(tmp_path, ["Foo"])
+        restore_snapshot(read_snapshot(path), make_storage(), fresh_config)
+
+        assert not fresh_config.is_supplier_ignored("Stale Entry")
+
+    def test_missing_or_empty_snapshot(self, tmp_path):
+        assert read_snapshot(tmp_path / "missing.json") is None
+        empty = tmp_path / "empty.json"
+        empty.write_text("")
+        assert read_snapshot(empty) is None
+
+class TestAppLifespan:
+    def test_snapshot_is_restored_on_startup_and_saved_on_shutdown(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CACHE_SNAPSHOT_PATH", str(tmp_path / "snapshot.json"))
+        monkeypatch.setenv("FIRESTORE_WARM_UP", "false")
+        storage = make_storage()
+        now = datetime.now(timezone.utc)
+        storage.memory_cache.set("tesco__v1", {"suppliers": [], "timestamp": now, "expires_at": now + timedelta(hours=1)})
+        storage.flush_cache_accesses = MagicMock(return_value=0)
+
+        with patch("app.main.storage_service", storage):
+            with TestClient(app):
+                pass
+            storage.flush_cache_accesses.assert_called_once()
+            assert (tmp_path / "snapshot.json").exists()
+
+            restored = make_storage()
+            with patch("app.main.storage_service", restored), TestClient(app):
+                assert restored.memory_cache.peek("tesco__v1") is not None
@@ -0,0 +1,165 @@
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from app.services.extraction import VertexAIExtractionService, EXTRACTION_SYSTEM_INSTRUCTION
+from app.utils.tokens import (
+    TokenUsage, estimate_tokens, split_sentences, chunk_text, truncate_to_budget, usage_from_response
+)
+
+PARAGRAPH = (
+    "Tesco works with Acme Ltd. and Partners on dairy. "
+    "It also sources produce from J. Smith Co. in Leeds! "
+    "Arla Foods supplies own-brand milk. "
+)
+
+class TestSentences:
+    def test_abbreviations_do_not_split_company_names(self):
+        assert split_sentences(PARAGRAPH) == [
+            "Tesco works with Acme Ltd. and Partners on dairy.",
+            "It also sources produce from J. Smith Co. in Leeds!",
+            "Arla Foods supplies own-brand milk.",
+        ]
+
+    def test_estimate(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("abcd" * 10) == 10
+
+class TestChunking:
+    def test_short_text_is_one_chunk(self):
+        assert chunk_text(PARAGRAPH, 1000) == [PARAGRAPH]
+
+    def test_chunks_respect_budget_and_sentence_boundaries(self):
+        text = PARAGRAPH * 20
+        chunks = chunk_text(text, 60, overlap_tokens=20)
+        assert len(chunks) > 1
+        sentences = set(split_sentences(PARAGRAPH))
+        for chunk in chunks:
+            assert estimate_tokens(chunk) <= 60
+            assert all(s in sentences for s in split_sentences(chunk))
+
+    def test_chunks_overlap(self):
+        chunks = chunk_text(PARAGRAPH * 20, 60, overlap_tokens=20)
+        assert split_sentences(chunks[0])[-1] == split_sentences(chunks[1])[0]
+
+    def test_overlong_sentence_splits_on_words(self):
+        chunks = chunk_text("word " * 400, 50, overlap_tokens=0)
+        assert all(estimate_tokens(c) <= 50 for c in chunks)
+        assert " ".join(chunks).split() == ["word"] * 400
+
+    def test_truncate_ends_on_sentence(self):
+        truncated = truncate_to_budget(PARAGRAPH * 20, 30)
+        assert truncated.endswith(".") or truncated.endswith("!")
+        assert estimate_tokens(truncated) <= 30
+
+    def test_truncate_long_unpunctuated_text(self):
+        text = "word " * 100_000
+        truncated = truncate_to_budget(text, 1000)
+        assert estimate_tokens(truncated) <= 1000
+        assert estimate_tokens(truncated) > 990
+        assert truncated == chunk_text(text, 1000, overlap_tokens=0)[0]
+
+class TestTokenUsage:
+    def test_uses_reported_counts(self):
+        response = MagicMock()
+        response.usage_metadata.prompt_token_count = 120
+        response.usage_metadata.candidates_token_count = 30
+        response.usage_metadata.cached_content_token_count = 80
+        assert usage_from_response(response, "prompt", "out") == {
+            "prompt_tokens": 120, "output_tokens": 30, "cached_prompt_tokens": 80, "estimated": False
+        }
+
+    def test_falls_back_to_estimates(self):
+        response = MagicMock(spec=["text"])
+        usage = usage_from_response(response, "abcd" * 25, "abcd" * 5)
+        assert usage == {"prompt_tokens": 25, "output_tokens": 5, "cached_prompt_tokens": 0, "estimated": True}
+
+    def test_accumulates(self):
+        usage = TokenUsage()
+        usage.record_call(100, 20, cached_prompt_tokens=60, first_token_seconds=0.2)
+        usage.record_call(50, 10, estimated=True, first_token_seconds=0.4)
+        usage.record_call(50, 10)
+        usage.record_cached()
+        assert usage.as_dict() == {
+            "calls": 3, "cached_calls": 1, "prompt_tokens": 200, "output_tokens": 40,
+            "total_tokens": 240, "cached_prompt_tokens": 60, "estimated": True,
+            "avg_time_to_first_token_ms": 300.0
+        }
+
+class TestBudgetedExtraction:
+    def setup_method(self):
+        self.service = VertexAIExtractionService.__new__(VertexAIExtractionService)
+        self.service.model_name = "test-model"
+        self.service.model = MagicMock()
+        self.service.model.generate_content.return_value = MagicMock(
+            spec=["text"], text=json.dumps({"suppliers": [{"name": "Arla Foods", "confidence": 0.9}]})
+        )
+        self.service.extraction_cache = None
+
+    def test_long_text_is_chunked_within_budget(self):
+        self.service.token_budget = 600
+        usage = TokenUsage()
+
+        suppliers = self.service.extract_suppliers_from_text("Tesco", PARAGRAPH * 100, usage=usage)
+
+        calls = self.service.model.generate_content.call_args_list
+        assert len(calls) > 1
+        assert len(suppliers) == len(calls)
+        assert all(estimate_tokens(c[0][0]) <= 600 for c in calls)
+        assert usage.as_dict()["calls"] == len(calls)
+
+    def test_short_text_is_one_call(self):
+        self.service.extract_suppliers_from_text("Tesco", PARAGRAPH)
+        assert self.service.model.generate_content.call_count == 1
+
+def streamed_chunk(text=None):
+    """A streamed response chunk shaped like the SDK's: text lives in the first candidate's parts."""
+    parts = [SimpleNamespace(text=text)] if text is not None else []
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))] if parts else [],
+                           usage_metadata=None)
+
+class TestSystemInstruction:
+    def setup_method(self):
+        self.service = VertexAIExtractionService.__new__(VertexAIExtractionService)
+        self.service.model_name = "test-model"
+        self.service.model = MagicMock()
+        self.service.extraction_cache = None
+
+    def test_prompt_carries_only_request_fields(self):
+        prompt = self.service._build_extraction_prompt("Tesco", "Arla Foods supplies milk.", "https://a.com")
+        assert '"Tesco"' in prompt and "Arla Foods supplies milk." in prompt and "https://a.com" in prompt
+        assert "INSTRUCTIONS" not in prompt
+        assert estimate_tokens(prompt) * 4 < estimate_tokens(EXTRACTION_SYSTEM_INSTRUCTION)
+        assert "Tesco" not in EXTRACTION_SYSTEM_INSTRUCTION
+
+    def test_streamed_call_records_time_to_first_token(self):
+        self.service.stream_responses = True
+        body = json.dumps({"suppliers": [{"name": "Arla Foods", "confidence": 0.9}]})
+        chunks = [MagicMock(spec=["text"], text=body[:20]), MagicMock(text=body[20:])]
+        chunks[1].usage_metadata.prompt_token_count = 400
+        chunks[1].usage_metadata.candidates_token_count = 20
+        chunks[1].usage_metadata.cached_content_token_count = 0
+        self.service.model.generate_content.return_value = iter(chunks)
+        usage = TokenUsage()
+
+        suppliers = self.service.extract_suppliers_from_text("Tesco", PARAGRAPH, usage=usage)
+
+        assert [s["name"] for s in suppliers] == ["Arla Foods"]
+        assert self.service.model.generate_content.call_args[1] == {"stream": True}
+        summary = usage.as_dict()
+        assert summary["prompt_tokens"] == 400
+        assert summary["avg_time_to_first_token_ms"] is not None
+
+    def test_metadata_only_final_chunk_is_not_a_failure(self):
+        self.service.stream_responses = True
+        body = json.dumps({"suppliers": [{"name": "Arla Foods", "confidence": 0.9}]})
+        final = streamed_chunk()
+        final.usage_metadata = SimpleNamespace(prompt_token_count=400, candidates_token_count=20,
+                                               cached_content_token_count=0)
+        self.service.model.generate_content.return_value = iter([streamed_chunk(body[:20]), streamed_chunk(body[20:]), final])
+        usage = TokenUsage()
+
+        suppliers = self.service.extract_suppliers_from_text("Tesco", PARAGRAPH, usage=usage)
+
+        assert [s["name"] for s in suppliers] == ["Arla Foods"]
+        assert usage.as_dict()["prompt_tokens"] == 400
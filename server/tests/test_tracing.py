@@ -0,0 +1,145 @@
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils import tracing
+from app.utils.tracing import (
+    BackgroundSpanExporter, current_span, otlp_json, span, start_trace, submit_in_context
+)
+
+@pytest.fixture(autouse=True)
+def no_exporter(monkeypatch):
+    monkeypatch.setenv("TRACING_EXPORTER", "none")
+    tracing.reset_span_exporter()
+    yield
+    tracing.reset_span_exporter()
+
+class TestSpans:
+    def test_spans_outside_a_trace_are_no_ops(self):
+        with span("dedup") as s:
+            assert s is None
+        assert current_span() is None
+
+    def test_nested_spans_record_parents(self):
+        with start_trace("request") as trace:
+            with span("search.page", start=1) as outer:
+                with span("parse"):
+                    pass
+        spans = {s.name: s for s in trace.spans}
+
+        assert spans["request"].parent_id is None
+        assert spans["search.page"].parent_id == spans["request"].span_id
+        assert spans["parse"].parent_id == outer.span_id
+        assert spans["search.page"].attributes == {"start": 1}
+        assert current_span() is None
+
+    def test_errors_mark_the_span_and_propagate(self):
+        with pytest.raises(ValueError):
+            with start_trace("request") as trace:
+                with span("llm.call"):
+                    raise ValueError("boom")
+        assert [s.error for s in trace.spans] == ["ValueError: boom", "ValueError: boom"]
+
+    def test_context_follows_submitted_work(self):
+        with start_trace("request") as trace:
+            root = current_span()
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [submit_in_context(executor, self.traced_work, n) for n in range(3)]
+                [f.result() for f in futures]
+
+        pages = [s for s in trace.spans if s.name == "search.page"]
+        assert len(pages) == 3
+        assert all(s.parent_id == root.span_id for s in pages)
+
+    @staticmethod
+    def traced_work(n):
+        with span("search.page", start=n):
+            pass
+
+    def test_stage_timings_aggregate_by_name(self):
+        with start_trace("request") as trace:
+            for _ in range(3):
+                with span("llm.call"):
+                    pass
+        stages = trace.stage_timings()
+        assert stages["llm.call"]["count"] == 3
+        assert stages["request"]["count"] == 1
+
+class TestExport:
+    def test_otlp_json_shape(self):
+        with start_trace("request", company_name="Tesco", deep=False) as trace:
+            with span("llm.call", prompt_tokens=120, score=0.5):
+                pass
+        payload = otlp_json(trace)
+        scope = payload["resourceSpans"][0]["scopeSpans"][0]
+        spans = {s["name"]: s for s in scope["spans"]}
+
+        assert len(spans["request"]["traceId"]) == 32
+        assert "parentSpanId" not in spans["request"]
+        assert spans["llm.call"]["parentSpanId"] == spans["request"]["spanId"]
+        assert int(spans["llm.call"]["endTimeUnixNano"]) >= int(spans["llm.call"]["startTimeUnixNano"])
+        assert {a["key"]: a["value"] for a in spans["llm.call"]["attributes"]} == {
+            "prompt_tokens": {"intValue": "120"}, "score": {"doubleValue": 0.5}
+        }
+        assert spans["request"]["attributes"][1]["value"] == {"boolValue": False}
+
+    def test_file_exporter_writes_one_line_per_trace(self, tmp_path, monkeypatch):
+        path = tmp_path / "spans.jsonl"
+        monkeypatch.setenv("TRACING_EXPORTER", "file")
+        monkeypatch.setenv("TRACING_FILE_PATH", str(path))
+        tracing.reset_span_exporter()
+
+        for _ in range(2):
+            with start_trace("request"):
+                with span("dedup"):
+                    pass
+        tracing.get_span_exporter().flush()
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == 2
+        assert len(json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]) == 2
+
+    def test_failed_exports_are_counted_not_raised(self):
+        sink = MagicMock()
+        sink.send.side_effect = ConnectionError("collector down")
+        exporter = BackgroundSpanExporter(sink)
+        with start_trace("request") as trace:
+            pass
+        exporter.export(trace)
+        exporter.flush()
+        assert exporter.stats() == {"exported": 0, "failed": 1, "dropped": 0}
+
+class TestRequestTimings:
+    @patch('app.main.search_service')
+    @patch('app.main.extraction_service')
+    @patch('app.main.storage_service')
+    @patch('app.main.deduplicator')
+    def test_timings_only_when_requested(self, mock_dedup, mock_storage, mock_extraction, mock_search):
+        mock_storage.get_cached_result.return_value = None
+        mock_search.iter_search_pages.side_effect = lambda *args, **kwargs: iter(
+            [[{"title": "Tesco suppliers", "snippet": "", "link": "https://a.com"}]]
+        )
+        mock_extraction.extract_suppliers_from_search_results.return_value = [{"name": "Moy Park", "confidence": 0.9}]
+        mock_dedup.deduplicate_suppliers.side_effect = lambda suppliers, **kwargs: list(suppliers)
+        client = TestClient(app)
+
+        plain = client.post("/extract-suppliers", json={"company_name": "Tesco"})
+        timed = client.post("/extract-suppliers", json={"company_name": "Tesco", "include_timings": True})
+
+        assert plain.json()["timings"] is None
+        stages = timed.json()["timings"]["stages"]
+        assert {"extract_suppliers", "cache_lookup", "extraction.page", "dedup",
+                "storage.audit_write", "storage.cache_write"} <= set(stages)
+        assert stages["extraction.page"]["count"] == 1
+
+    @patch('app.main.search_service')
+    @patch('app.main.extraction_service')
+    @patch('app.main.storage_service')
+    @patch('app.main.deduplicator')
+    def test_trace_start_errors_are_not_masked(self, mock_dedup, mock_storage, mock_extraction, mock_search):
+        client = TestClient(app)
+        with patch("app.main.start_trace", side_effect=RuntimeError("exporter down")):
+            with pytest.raises(RuntimeError, match="exporter down"):
+                client.post("/extract-suppliers", json={"company_name": "Tesco"})